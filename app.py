@@ -17,6 +17,12 @@ import streamlit as st
 from typing import Tuple
 from data_handling import load_plants, add_feedback, sql_connect
 from rule_engine import RuleEngine
+from retrain_counter import pending_feedback
+from retrain_worker import enqueue_retrain, spawn_worker
+from model_registry import current_release, load_release as load_registry_release
+from online_learner import get_online_learner, online_score
+import tracing
+import profiling
 
 import sys
 import logging
@@ -31,9 +37,21 @@ logger = logging.getLogger(__name__)
 
 from sklearn.compose import ColumnTransformer
 
-feedback_model = joblib.load("models/feedback_model.pkl")
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_release(release_id: str | None) -> Tuple[object, ColumnTransformer, str]:
+    """Load model, preprocessor and KB path of one release as a single unit."""
+    logger.info("Release yükleniyor: %s", release_id or "legacy models/")
+    model, vec, kb = load_registry_release(release_id)
+    return model, vec, str(kb)
 
-preprocessor:ColumnTransformer = joblib.load("models/feedback_vec.pkl")
+
+# Her rerun'da yalnızca CURRENT işaretçisi okunur; worker yeni release'i
+# terfi ettirdiğinde model + preprocessor + KB birlikte değişir
+feedback_model, preprocessor, kb_path = load_release(current_release())
+
+# Hibrit skor ağırlıkları; çevrimiçi öğrenici yeterli örnek gördükten sonra devreye girer
+ML_WEIGHT, FP_WEIGHT, ONLINE_WEIGHT = 0.55, 0.25, 0.20
+ONLINE_MIN_UPDATES = 50
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -125,54 +143,31 @@ st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 #  Automatic retrain helper - KEEPING ORIGINAL CODE
 # --------------------------------------------------------------
 
+@profiling.profiled("check_and_retrain")
 def check_and_retrain_if_needed(threshold: int =3)-> bool:
-    """Retrain model when accepted‑feedback count is divisible by *threshold*."""
+    """Queue a background retrain once *threshold* new positive feedback arrived since the last train."""
     logger.debug("Retrain ihtiyacı kontrol ediliyor (threshold: %d)", threshold)
+    conn = None
     try:
         conn = sql_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM Feedback WHERE user_feedback = 1")
-        count = cur.fetchone()[0]
-        conn.close()
-        logger.info("Toplam pozitif feedback: %s", count)
-
-        if count and count % threshold == 0:
-            st.info(f"🔁 Retraining ML model… (total positive feedback: {count})")
-            logger.warning("Retrain başlatıldı.")
-            
-    
-             
-            subprocess.run([sys.executable, "learning_engine.py"], check=True)
-            logger.info("learning_engine.py çalıştırıldı.")
-            
-            subprocess.run([
-                                sys.executable,
-                                "learning_engine_v2.py",
-                                "--min-support", "0.01",
-                                "--min-confidence", "0.01",
-                                "--output", "parsed_rules.json"
-                            ], check=True)
-
-            logger.info("learning_engine_v2.py çalıştırıldı.")
-
-           
-
+        state = pending_feedback(conn)
+        logger.info("Son eğitimden beri pozitif feedback: %s (model v%d)", state.new_positive, state.model_version)
+
+        if state.new_positive >= threshold:
+            # Eğitim retrain_worker.py sürecinde çalışır; istek hemen döner
+            queued = enqueue_retrain({"model_version": state.model_version, "new_positive": state.new_positive})
+            spawn_worker()
+            if queued:
+                logger.warning("Retrain kuyruğa alındı.")
+                st.info("🔁 Model retraining queued – the new model is used automatically once it is ready.")
+            return queued
 
-               # 4. KB güncelle
-            from kb_updater import update_knowledge_base
-            update_knowledge_base("parsed_rules.json", "knowledge_base.json")
-            logger.info("Bilgi tabanı güncellendi.")
-
-            st.success("✅ Model retrained & rules updated.")
-            return True
-
-
-            
-
-            
     except Exception as exc:  # pragma: no cover
-        logger.error("Retrain sırasında hata: %s", exc)
+        logger.error("Retrain kontrolünde hata: %s", exc)
         st.error(f"❌ Retrain check failed: {exc}")
+    finally:
+        if conn is not None:
+            conn.close()
     return False
 
 # --------------------------------------------------------------
@@ -233,19 +228,28 @@ with col2:
 # Eğer kullanıcı Öner butonuna bastıysa
 if recommend_clicked:
     logger.info(" Öner butonuna tıklandı.")
-    df = load_plants()
+    tracing.start_trace("recommend", kb=kb_path)
+    profiling.begin_request("recommend")
+    with tracing.span("load_plants"):
+        df = load_plants()
 
     if df.empty:
         logger.error(" Bitki verisi yüklenemedi.")
         st.error("Could not load plant data — check DB connection.")
+        tracing.end_trace("no_plants")
+        profiling.end_request()
         st.stop()
 
-    rule_engine = RuleEngine(df)
-    candidates = rule_engine.get_candidates(user_input, top_n=5)
+    with tracing.span("rule_engine_init"):
+        rule_engine = RuleEngine(df, kb_path=kb_path)
+    with tracing.span("get_candidates"):
+        candidates = rule_engine.get_candidates(user_input, top_n=5)
+    tracing.count("candidates", len(candidates))
     logger.info(" RuleEngine aday bitkiler: %s", candidates)
 
     logger.info(" ML skorlama başlatılıyor. %d aday değerlendirilecek.", len(candidates))
     scores: list[tuple[str, float]] = []
+    profiling.start("scoring")
 
     # -------------------------------------------------
     # 1) Hiç aday bulunamazsa: tüm veri kümesi üzerinde ML-fallback
@@ -256,6 +260,7 @@ if recommend_clicked:
     if not candidates:
         logger.warning("Kural tabanlı eşleşme bulunamadı, ML fallback başlatılıyor.")
         st.info("No rule-based match found. Trying best guess with ML...")
+        tracing.count("ml_fallback")
 
         for _, row in df.iterrows():
             record = {**user_input, "suggested_plant": row["plant_name"]}
@@ -263,8 +268,10 @@ if recommend_clicked:
                 record["watering_frequency"] = record.pop("waterring_frequency")
 
             try:
-                record_encoded = preprocessor.transform(pd.DataFrame([record]))
-                proba = feedback_model.predict_proba(record_encoded)[0, 1]
+                with tracing.span("transform"):
+                    record_encoded = preprocessor.transform(pd.DataFrame([record]))
+                with tracing.span("predict_proba"):
+                    proba = feedback_model.predict_proba(record_encoded)[0, 1]
                 scores.append((row["plant_name"], proba))
                 logger.debug("ML skor: %s → %.3f", row["plant_name"], proba)
             except Exception as e:
@@ -274,27 +281,37 @@ if recommend_clicked:
     # 2) Aday varsa → adaylar üzerinde skorla
     # -------------------------------------------------
     else:
-        
+        # Profille eşleşen pozitif kurallar bir kez alınır (JSON ve SQLite KB için aynı arayüz)
+        matched_rules = rule_engine.kb.matching_rules(user_input)
         for plant in candidates:
             record = {**user_input, "suggested_plant": plant}
 
             try:
                 # ML tahmini (proba)
-                record_encoded = preprocessor.transform(pd.DataFrame([record]))
-                ml_score = feedback_model.predict_proba(record_encoded)[0, 1]
+                with tracing.span("transform"):
+                    record_encoded = preprocessor.transform(pd.DataFrame([record]))
+                with tracing.span("predict_proba"):
+                    ml_score = feedback_model.predict_proba(record_encoded)[0, 1]
 
                 # FP-Growth confidence skoru
                 fp_score = 0.0  # varsayılan değer
-                for rule in rule_engine.kb.positive_rules:
-                    if rule.suggested_plant == plant and rule.matches(user_input):
+                for rule in matched_rules:
+                    if rule.suggested_plant == plant:
                         fp_score = rule.confidence  # veya rule.lift kullanılabilir
                         break
 
-                # Hibrit skor: ağırlıklandırılmış ortalama
-                hybrid_score = 0.7 * ml_score + 0.3 * fp_score
+                # Hibrit skor: ağırlıklandırılmış ortalama (+ son geri bildirimlerden öğrenen çevrimiçi skor)
+                if get_online_learner().updates >= ONLINE_MIN_UPDATES:
+                    with tracing.span("online_score"):
+                        online = online_score(record)
+                    hybrid_score = ML_WEIGHT * ml_score + FP_WEIGHT * fp_score + ONLINE_WEIGHT * online
+                else:
+                    online = float("nan")
+                    hybrid_score = 0.7 * ml_score + 0.3 * fp_score
 
                 scores.append((plant, hybrid_score))
-                logger.debug("ML: %.3f | FP: %.3f → Hybrid: %.3f (%s)", ml_score, fp_score, hybrid_score, plant)
+                logger.debug("ML: %.3f | FP: %.3f | Online: %.3f → Hybrid: %.3f (%s)",
+                             ml_score, fp_score, online, hybrid_score, plant)
 
             except Exception as e:
                 logger.error("Hibrit skorlamada hata (%s): %s", plant, str(e))
@@ -311,22 +328,29 @@ if recommend_clicked:
             else:
                 # fallback'e geri dön
                 st.info("⚠️ Candidates not in DB. ML fallback triggered.")
+                tracing.count("ml_fallback")
                 scores.clear()
                 for _, row in df.iterrows():
                     record = {**user_input, "suggested_plant": row["plant_name"]}
                     try:
-                        record_encoded = preprocessor.transform(pd.DataFrame([record]))
-                        proba = feedback_model.predict_proba(record_encoded)[0, 1]
+                        with tracing.span("transform"):
+                            record_encoded = preprocessor.transform(pd.DataFrame([record]))
+                        with tracing.span("predict_proba"):
+                            proba = feedback_model.predict_proba(record_encoded)[0, 1]
                         scores.append((row["plant_name"], proba))
                         logger.debug("🔢 ML skor: %s → %.3f", row["plant_name"], proba)
                     except Exception as e:
                         logger.error("ML skorlamasında hata: %s", str(e))
 
+    profiling.stop("scoring")
+
     # -------------------------------------------------
     # 3) En yüksek skorlu adayı seç ve UI'da göster
     # -------------------------------------------------
     if not scores:
         st.error("❌ Herhangi bir öneri üretilemedi.")
+        tracing.end_trace("no_scores")
+        profiling.end_request()
         st.stop()
 
     scores.sort(key=lambda x: x[1], reverse=True)
@@ -348,6 +372,8 @@ if recommend_clicked:
     match = df[df["plant_name"].str.strip().str.lower() == best_plant.strip().lower()]
     if match.empty:
         st.error(f"'{best_plant}' için bitki detayları bulunamadı.")
+        tracing.end_trace("plant_not_found")
+        profiling.end_request()
         st.stop()
 
     row = match.iloc[0]
@@ -359,6 +385,8 @@ if recommend_clicked:
         "image_url": row["image_url"],
     }
     st.session_state["user_input"] = user_input
+    tracing.end_trace(plant=best_plant, scored=len(scores))
+    profiling.end_request()
 
 # Eğer tavsiye varsa göster
 plant_dict = st.session_state.get("recommended_plant")
@@ -391,16 +419,24 @@ if plant_dict:
         st.markdown("</div>", unsafe_allow_html=True)
 
     if submit:
+        tracing.start_trace("feedback")
+        profiling.begin_request("feedback")
         try:
             feedback_val = 1 if fb_choice == "Yes" else 0
-            add_feedback(
-                st.session_state["user_input"],
-                plant_dict["plant_name"],
-                feedback_val,
-            )
+            with tracing.span("add_feedback"):
+                add_feedback(
+                    st.session_state["user_input"],
+                    plant_dict["plant_name"],
+                    feedback_val,
+                )
             st.success(" Feedback saved. Thank you!")
-            check_and_retrain_if_needed()
+            with tracing.span("check_and_retrain"):
+                check_and_retrain_if_needed()
             st.session_state.pop("recommended_plant", None)
             st.session_state.pop("user_input", None)
+            tracing.end_trace(feedback=feedback_val)
         except Exception as exc:
+            tracing.end_trace("error")
             st.error(f" Failed to save feedback: {exc}")
+        finally:
+            profiling.end_request()
@@ -0,0 +1,142 @@
+# bench_data_handling.py – Memory / time benchmark for the feedback feature pipeline
+# --------------------------------------------------------------
+# Compares the old string-chain pipeline (fillna→astype(str)→strip→title per
+# cell, per-row _time_of_day, full-frame copies) against the Categorical
+# pipeline in data_handling on synthetic Feedback frames.
+#
+#   python bench_data_handling.py                      # 1M ve 10M satır
+#   python bench_data_handling.py --rows 200000 --json bench_dh.json
+#
+# Peak memory is measured with tracemalloc (numpy/pandas buffers included).
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OrdinalEncoder
+
+from data_handling import CAT_COLS, ENC_COLS, add_time_features, clean_feedback_data, encode_categorical
+
+# Realistic value pools; a share of values gets whitespace / casing noise
+_POOLS: Dict[str, List[str]] = {
+    "area_size": ["Mini", "Small", "Medium", "Large"],
+    "sunlight_need": ["Can live in shade", "1-2 hours daily", "Bright indirect light", "6+ hours"],
+    "environment_type": ["Indoor", "Outdoor", "Semi-outdoor"],
+    "climate_type": ["All seasons", "Spring", "Summer", "Winter"],
+    "watering_frequency": ["Daily", "Weekly", "Bi-weekly", "Every 2-3 days", "Monthly"],
+    "fertilizer_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "pesticide_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "has_pet": ["Yes", "No"],
+    "has_child": ["Yes", "No"],
+    "suggested_plant": [f"Plant {i}" for i in range(400)],
+}
+
+
+def make_feedback_frame(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic raw Feedback frame with object columns, as returned by read_sql."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col, pool in _POOLS.items():
+        noisy = pool + [f" {v.lower()} " for v in pool] + [""]
+        values = np.array(noisy + [None], dtype=object)
+        weights = np.r_[np.full(len(pool), 0.9 / len(pool)), np.full(len(pool), 0.08 / len(pool)), 0.01, 0.01]
+        data[col] = values[rng.choice(len(values), size=n_rows, p=weights)]
+    data["user_feedback"] = rng.integers(0, 2, size=n_rows)
+    start = np.datetime64("2024-01-01T00:00:00")
+    data["created_at"] = start + rng.integers(0, 365 * 24 * 3600, size=n_rows).astype("timedelta64[s]")
+    return pd.DataFrame(data)
+
+
+# --------------------------------------------------------------
+# Eski pipeline (referans)
+# --------------------------------------------------------------
+def _legacy_pipeline(df: pd.DataFrame, encoder_path: str) -> pd.DataFrame:
+    df_clean = df.drop_duplicates().copy()
+    for col in CAT_COLS:
+        df_clean[col] = (
+            df_clean[col].fillna("Unknown").astype(str).str.strip().replace("", "Unknown").str.title()
+        )
+    df_clean["user_feedback"] = pd.to_numeric(df_clean["user_feedback"], errors="coerce").fillna(0).astype(int).clip(0, 1)
+
+    df_time = df_clean.copy()
+    df_time["created_at"] = pd.to_datetime(df_time["created_at"], errors="coerce")
+    df_time["hour"] = df_time["created_at"].dt.hour
+
+    def _time_of_day(h):
+        if pd.isna(h):
+            return "Unknown"
+        if 6 <= h < 12:
+            return "Morning"
+        elif 12 <= h < 18:
+            return "Afternoon"
+        elif 18 <= h < 24:
+            return "Evening"
+        return "Night"
+
+    df_time["time_of_day"] = df_time["hour"].apply(_time_of_day)
+    df_time["is_weekend"] = df_time["created_at"].dt.weekday.isin([5, 6]).astype(int)
+
+    df_enc = df_time.copy()
+    encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    df_enc[ENC_COLS] = encoder.fit_transform(df_enc[ENC_COLS])
+    return df_enc
+
+
+def _categorical_pipeline(df: pd.DataFrame, encoder_path: str) -> pd.DataFrame:
+    return encode_categorical(add_time_features(clean_feedback_data(df)), encoder_path)
+
+
+def _measure(fn: Callable[[pd.DataFrame, str], pd.DataFrame], df: pd.DataFrame) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        out = fn(df, os.path.join(tmp, "encoder.pkl"))
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_mb": round((peak - base) / 2**20, 1),
+        "result_mb": round(out.memory_usage(deep=True).sum() / 2**20, 1),
+    }
+
+
+def run(rows: List[int], include_legacy: bool = True) -> List[Dict]:
+    results = []
+    for n in rows:
+        df = make_feedback_frame(n)
+        input_mb = round(df.memory_usage(deep=True).sum() / 2**20, 1)
+        pipelines = [("categorical", _categorical_pipeline)]
+        if include_legacy:
+            pipelines.insert(0, ("legacy", _legacy_pipeline))
+        for name, fn in pipelines:
+            stats = _measure(fn, df)
+            results.append({"rows": n, "pipeline": name, "input_mb": input_mb, **stats})
+            print(f"{n:>10,} rows | {name:<11} | {stats['seconds']:>8.2f} s | "
+                  f"peak {stats['peak_mb']:>8.1f} MB | result {stats['result_mb']:>7.1f} MB")
+        del df
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the feedback cleaning/encoding pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the Categorical pipeline")
+    parser.add_argument("--json", help="Optional path to write results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.rows, include_legacy=not args.skip_legacy)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
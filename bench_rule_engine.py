@@ -0,0 +1,233 @@
+# bench_rule_engine.py – Rule-engine microbenchmark on synthetic knowledge bases
+# --------------------------------------------------------------
+# Generates knowledge bases of 1k … 1M rules whose shape (positive/negative
+# share, conditions per rule, attribute and value frequencies) is drawn from
+# the real knowledge_base.json, plus random questionnaire profiles, and
+# measures per backend (JSON KnowledgeBase / indexed SQLite):
+#   • load time (RuleEngine construction) and memory per rule (tracemalloc)
+#   • p50 / p99 latency of RuleEngine.get_candidates and _apply_meta_rules
+#
+#   python bench_rule_engine.py                              # 1k, 10k, 100k, 1M
+#   python bench_rule_engine.py --rules 1000 100000 --backend json --json bench_re.json
+#
+# The JSON output carries the git commit so runs can be compared across commits.
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from kb_journal import load_kb
+from kb_sqlite import import_json
+from rule_engine import RuleEngine
+
+# Anketteki seçenekler (app.py ile aynı)
+QUESTIONNAIRE: Dict[str, List[str]] = {
+    "area_size": ["Mini", "Small", "Medium", "Large"],
+    "sunlight_need": ["Can live in shade", "1-2 hours daily", "Bright indirect light", "6+ hours"],
+    "environment_type": ["Indoor", "Outdoor", "Semi-outdoor"],
+    "climate_type": ["All seasons", "Spring", "Summer", "Winter"],
+    "watering_frequency": ["Daily", "Weekly", "Bi-weekly", "Every 2-3 days", "Monthly"],
+    "fertilizer_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "pesticide_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "has_pet": ["Yes", "No"],
+    "has_child": ["Yes", "No"],
+}
+N_PLANTS = 400
+N_FRAMES = 20
+N_META_RULES = 50
+
+
+# --------------------------------------------------------------
+# KB şekli + sentetik üretim
+# --------------------------------------------------------------
+def kb_shape(kb_path: str = "knowledge_base.json") -> Dict:
+    """Empirical distributions of the real KB (falls back to uniform questionnaire values)."""
+    try:
+        kb = load_kb(kb_path)                    # snapshot + journal
+    except FileNotFoundError:
+        kb = {}
+    rules = kb.get("positive_rules", []) + kb.get("negative_rules", [])
+    sizes = Counter(len(r["conditions"]) for r in rules) or Counter({2: 1, 3: 1})
+    attrs = Counter(a for r in rules for a in r["conditions"] if a in QUESTIONNAIRE)
+    values = {a: Counter() for a in QUESTIONNAIRE}
+    for r in rules:
+        for a, v in r["conditions"].items():
+            if a in values and isinstance(v, str):
+                values[a][v] += 1
+    return {
+        "positive_share": len(kb.get("positive_rules", [])) / len(rules) if rules else 0.2,
+        "sizes": dict(sizes),
+        "attributes": {a: attrs.get(a, 0) + 1 for a in QUESTIONNAIRE},   # +1: hiç görülmeyen de seçilebilsin
+        "values": {a: dict(values[a]) if values[a] else {v: 1 for v in pool} for a, pool in QUESTIONNAIRE.items()},
+    }
+
+
+def _weighted(counter: Dict) -> tuple:
+    keys = list(counter)
+    weights = np.array([counter[k] for k in keys], dtype=float)
+    return keys, weights / weights.sum()
+
+
+def make_synthetic_kb(n_rules: int, shape: Dict, seed: int = 42) -> Dict:
+    rng = np.random.default_rng(seed)
+    size_keys, size_p = _weighted(shape["sizes"])
+    attr_keys, attr_p = _weighted(shape["attributes"])
+    value_tables = {a: _weighted(v) for a, v in shape["values"].items()}
+    plants = [f"Plant {i}" for i in range(N_PLANTS)]
+
+    sizes = np.minimum(rng.choice(size_keys, size=n_rules, p=size_p), len(attr_keys))
+    positive = rng.random(n_rules) < shape["positive_share"]
+    plant_idx = rng.integers(0, N_PLANTS, size=n_rules)
+    confidence = rng.uniform(0.05, 1.0, size=n_rules)
+    lift = rng.lognormal(mean=1.0, sigma=1.0, size=n_rules)
+
+    kb: Dict = {"positive_rules": [], "negative_rules": []}
+    for i in range(n_rules):
+        chosen = rng.choice(len(attr_keys), size=int(sizes[i]), replace=False, p=attr_p)
+        conditions = {}
+        for j in chosen:
+            attr = attr_keys[j]
+            keys, p = value_tables[attr]
+            conditions[attr] = keys[rng.choice(len(keys), p=p)]
+        kb["positive_rules" if positive[i] else "negative_rules"].append({
+            "conditions": conditions,
+            "suggested_plant": plants[plant_idx[i]],
+            "feedback": int(positive[i]),
+            "support": round(float(confidence[i]) * 0.05, 6),
+            "confidence": round(float(confidence[i]), 6),
+            "lift": round(float(lift[i]), 6),
+        })
+
+    frames = {f"frame_{k}": list(rng.choice(plants, size=15, replace=False)) for k in range(N_FRAMES)}
+    frame_names = list(frames)
+    kb["frames"] = frames
+    kb["meta_rules"] = []
+    for _ in range(N_META_RULES):
+        attr = attr_keys[rng.choice(len(attr_keys), p=attr_p)]
+        kb["meta_rules"].append({
+            "conditions": {attr: str(rng.choice(QUESTIONNAIRE[attr]))},
+            "suggested_types": list(rng.choice(frame_names, size=2, replace=False)),
+            "excluded_types": list(rng.choice(frame_names, size=1)),
+        })
+    return kb
+
+
+def make_profiles(n: int, seed: int = 7) -> List[Dict[str, str]]:
+    rng = np.random.default_rng(seed)
+    return [{attr: str(rng.choice(pool)) for attr, pool in QUESTIONNAIRE.items()} for _ in range(n)]
+
+
+# --------------------------------------------------------------
+# Ölçüm
+# --------------------------------------------------------------
+def _latency(fn: Callable[[Dict[str, str]], object], profiles: List[Dict[str, str]]) -> Dict[str, float]:
+    times = np.empty(len(profiles))
+    for i, profile in enumerate(profiles):
+        t0 = time.perf_counter()
+        fn(profile)
+        times[i] = time.perf_counter() - t0
+    return {
+        "p50_ms": round(float(np.percentile(times, 50)) * 1e3, 4),
+        "p99_ms": round(float(np.percentile(times, 99)) * 1e3, 4),
+        "mean_ms": round(float(times.mean()) * 1e3, 4),
+    }
+
+
+def bench_backend(kb_path: str, n_rules: int, plants_df: pd.DataFrame,
+                  profiles: List[Dict[str, str]]) -> Dict:
+    t0 = time.perf_counter()
+    engine = RuleEngine(plants_df, kb_path=kb_path)
+    load_s = time.perf_counter() - t0
+    del engine
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    engine = RuleEngine(plants_df, kb_path=kb_path)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    engine.get_candidates(profiles[0])           # ısınma
+    return {
+        "load_s": round(load_s, 4),
+        "memory_mb": round((held - base) / 2**20, 2),
+        "bytes_per_rule": round((held - base) / max(n_rules, 1), 1),
+        "get_candidates": _latency(lambda p: engine.get_candidates(p, top_n=5), profiles),
+        "apply_meta_rules": _latency(lambda p: engine._apply_meta_rules(p, [], 5), profiles),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(rule_counts: List[int], backends: List[str], n_profiles: int = 1000,
+        kb_path: str = "knowledge_base.json", seed: int = 42) -> Dict:
+    logging.disable(logging.INFO)                # kural eşleşme logları ölçümü bozmasın
+    shape = kb_shape(kb_path)
+    profiles = make_profiles(n_profiles, seed=seed + 1)
+    plants_df = pd.DataFrame({"plant_name": [f"Plant {i}" for i in range(N_PLANTS)]})
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in rule_counts:
+            t0 = time.perf_counter()
+            kb = make_synthetic_kb(n, shape, seed=seed)
+            json_path = Path(tmp) / f"kb_{n}.json"
+            with json_path.open("w", encoding="utf-8") as f:
+                json.dump(kb, f, ensure_ascii=False)
+            del kb
+            gen_s = time.perf_counter() - t0
+            paths = {"json": json_path}
+            if "sqlite" in backends:
+                paths["sqlite"] = import_json(json_path, Path(tmp) / f"kb_{n}.sqlite")
+            for backend in backends:
+                stats = bench_backend(str(paths[backend]), n, plants_df, profiles)
+                results.append({"rules": n, "backend": backend, "generate_s": round(gen_s, 2),
+                                "file_mb": round(paths[backend].stat().st_size / 2**20, 2), **stats})
+                gc_ = stats["get_candidates"]
+                print(f"{n:>9,} rules | {backend:<6} | load {stats['load_s']:>8.3f} s | "
+                      f"{stats['bytes_per_rule']:>7.0f} B/rule | get_candidates p50 {gc_['p50_ms']:>8.3f} ms "
+                      f"p99 {gc_['p99_ms']:>8.3f} ms")
+    logging.disable(logging.NOTSET)
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "profiles": n_profiles,
+        "kb_shape": shape,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark RuleEngine on synthetic knowledge bases")
+    parser.add_argument("--rules", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--backend", nargs="+", choices=["json", "sqlite"], default=["json", "sqlite"])
+    parser.add_argument("--profiles", type=int, default=1000, help="Random questionnaire profiles per KB")
+    parser.add_argument("--kb", default="knowledge_base.json", help="Real KB the synthetic shape is drawn from")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Optional path to write results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.rules, args.backend, n_profiles=args.profiles, kb_path=args.kb, seed=args.seed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,195 @@
+# bench_training_scale.py – Training-pipeline scale benchmark on synthetic feedback
+# --------------------------------------------------------------
+# For each scale (10k … 10M rows) a synthetic Feedback snapshot is generated
+# with dbye_ekle.generate_feedback (known class balance + hidden plant
+# preferences), then every stage runs in a fresh subprocess so its peak RSS
+# (ru_maxrss) is its own:
+#   • train : learning_engine.main(snapshot=…) → wall time, peak RSS,
+#             accuracy / weighted F1 / class-1 recall from metrics.json
+#   • mine  : learning_engine_v2.mine_association_rules → wall time, peak RSS,
+#             rule count, mean confidence / lift and how often positive rule
+#             conditions agree with the hidden plant preferences (vs. chance)
+#
+#   python bench_training_scale.py                                   # 10k, 100k, 1M, 10M
+#   python bench_training_scale.py --rows 10000 100000 --stages train --json bench_train.json
+#   python bench_training_scale.py --window-minutes 60               # fits_window per stage
+#
+# The JSON output carries the git commit so runs can be compared across commits.
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dbye_ekle import FORM_OPTIONS, generate_feedback, plant_preferences, write_feedback
+
+STAGES = ("train", "mine")
+
+
+# --------------------------------------------------------------
+# Aşamalar (alt süreçte çalışır)
+# --------------------------------------------------------------
+def _peak_rss_mb() -> float:
+    # Linux: KiB, macOS: bayt
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _train_stage(snapshot: str, workdir: Path) -> Dict:
+    from learning_engine import main
+
+    main(snapshot=snapshot, output_dir=str(workdir / "models"), report_dir=str(workdir))
+    with (workdir / "models" / "metrics.json").open("r", encoding="utf-8") as f:
+        metrics = json.load(f)
+    return {
+        "accuracy": round(metrics["accuracy"], 4),
+        "f1_weighted": round(metrics["weighted avg"]["f1-score"], 4),
+        "recall_1": round(metrics["1"]["recall"], 4),
+        "precision_1": round(metrics["1"]["precision"], 4),
+    }
+
+
+def _mine_stage(snapshot: str, workdir: Path, plants: List[str], seed: int) -> Dict:
+    from feedback_store import read_feedback_snapshot
+    from learning_engine_v2 import ITEM_COLS, mine_association_rules
+
+    df = read_feedback_snapshot(snapshot, columns=ITEM_COLS + ["user_feedback"])
+    output = workdir / "parsed_rules.json"
+    mine_association_rules(df, output_path=str(output))
+    with output.open("r", encoding="utf-8") as f:
+        rules = json.load(f)
+
+    prefs = plant_preferences(plants, seed)
+    positive = [r for r in rules if r.get("feedback") == 1]
+    hits = [
+        sum(prefs.get(r["suggested_plant"], {}).get(a) in (v if isinstance(v, list) else [v])
+            for a, v in r["conditions"].items())
+        / len(r["conditions"])
+        for r in positive if r["conditions"]
+    ]
+    chance = sum(1 / len(v) for v in FORM_OPTIONS.values()) / len(FORM_OPTIONS)
+    return {
+        "rules": len(rules),
+        "positive_rules": len(positive),
+        "mean_confidence": round(sum(r["confidence"] for r in rules) / len(rules), 4) if rules else None,
+        "mean_lift": round(sum(r["lift"] for r in rules) / len(rules), 4) if rules else None,
+        "preference_agreement": round(sum(hits) / len(hits), 4) if hits else None,
+        "chance_agreement": round(chance, 4),
+    }
+
+
+def _run_stage(stage: str, snapshot: str, workdir: str, plants: int, seed: int) -> None:
+    """Entry point of the stage subprocess: one JSON line on stdout."""
+    import logging
+
+    logging.disable(logging.INFO)
+    plant_names = [f"Plant {i}" for i in range(plants)]
+    workdir = Path(workdir)
+    t0 = time.perf_counter()
+    quality = _train_stage(snapshot, workdir) if stage == "train" else _mine_stage(snapshot, workdir, plant_names, seed)
+    wall_s = time.perf_counter() - t0
+    print(json.dumps({"wall_s": round(wall_s, 3), "peak_rss_mb": _peak_rss_mb(), "quality": quality}))
+
+
+# --------------------------------------------------------------
+# Ölçüm
+# --------------------------------------------------------------
+def bench_stage(stage: str, snapshot: str, workdir: str, plants: int, seed: int) -> Dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "_stage", stage,
+           "--snapshot", snapshot, "--workdir", workdir, "--plants", str(plants), "--seed", str(seed)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}",
+                "process_s": round(elapsed, 3)}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_s"] = round(elapsed, 3)          # import + yorumlayıcı açılışı dahil
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(row_counts: List[int], stages: List[str], *, plants: int = 100, positive_rate: float = 0.3,
+        preference_strength: float = 1.5, seed: int = 42,
+        window_minutes: Optional[float] = None) -> Dict:
+    plant_names = [f"Plant {i}" for i in range(plants)]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in row_counts:
+            snapshot = str(Path(tmp) / f"snapshot_{n}")
+            t0 = time.perf_counter()
+            write_feedback(snapshot, generate_feedback(n, plant_names, positive_rate=positive_rate,
+                                                       preference_strength=preference_strength, seed=seed),
+                           fmt="snapshot")
+            gen_s = time.perf_counter() - t0
+            for stage in stages:
+                workdir = Path(tmp) / f"{stage}_{n}"
+                workdir.mkdir()
+                stats = bench_stage(stage, snapshot, str(workdir), plants, seed)
+                if window_minutes is not None and "wall_s" in stats:
+                    stats["fits_window"] = stats["wall_s"] <= window_minutes * 60
+                results.append({"rows": n, "stage": stage, "generate_s": round(gen_s, 2), **stats})
+                if "error" in stats:
+                    print(f"{n:>11,} rows | {stage:<5} | FAILED: {stats['error']}")
+                    continue
+                print(f"{n:>11,} rows | {stage:<5} | {stats['wall_s']:>9.2f} s | "
+                      f"peak RSS {stats['peak_rss_mb']:>8.1f} MB | {stats['quality']}")
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "generator": {"plants": plants, "positive_rate": positive_rate,
+                      "preference_strength": preference_strength, "seed": seed},
+        "window_minutes": window_minutes,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if len(sys.argv) > 1 and sys.argv[1] == "_stage":
+        stage_parser = argparse.ArgumentParser()
+        stage_parser.add_argument("stage", choices=STAGES)
+        stage_parser.add_argument("--snapshot", required=True)
+        stage_parser.add_argument("--workdir", required=True)
+        stage_parser.add_argument("--plants", type=int, required=True)
+        stage_parser.add_argument("--seed", type=int, required=True)
+        stage_args = stage_parser.parse_args(sys.argv[2:])
+        _run_stage(stage_args.stage, stage_args.snapshot, stage_args.workdir, stage_args.plants, stage_args.seed)
+        raise SystemExit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark training + rule mining on synthetic feedback")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--plants", type=int, default=100)
+    parser.add_argument("--positive-rate", type=float, default=0.3)
+    parser.add_argument("--preference-strength", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--window-minutes", type=float, help="Nightly window; adds fits_window per stage")
+    parser.add_argument("--json", help="Optional path to write results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.stages, plants=args.plants, positive_rate=args.positive_rate,
+                 preference_strength=args.preference_strength, seed=args.seed,
+                 window_minutes=args.window_minutes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
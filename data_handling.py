@@ -1,9 +1,13 @@
+import numpy as np
 import pandas as pd
 import pyodbc
 import logging
 import datetime
 import joblib
 from sklearn.preprocessing import OrdinalEncoder
+from retrain_counter import ensure_counter_table, record_feedback
+from online_learner import record_online_feedback
+import tracing
 
 # Profiling library import: try pandas_profiling, fallback to ydata_profiling
 try:
@@ -20,12 +24,13 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # --------------------------------------------------------------
 def sql_connect():
     try:
-        conn = pyodbc.connect(
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            "SERVER=LAPTOP-7GK6MUOG\\SQLEXPRESS;"
-            "DATABASE=Smart_Plant_Recomandation_System;"
-            "Trusted_Connection=yes;"
-        )
+        with tracing.span("sql_connect"):
+            conn = pyodbc.connect(
+                "DRIVER={ODBC Driver 17 for SQL Server};"
+                "SERVER=LAPTOP-7GK6MUOG\\SQLEXPRESS;"
+                "DATABASE=Smart_Plant_Recomandation_System;"
+                "Trusted_Connection=yes;"
+            )
         logging.info(" Database connection established.")
         return conn
     except Exception as e:
@@ -42,7 +47,9 @@ def load_plants() -> pd.DataFrame:
     conn = None
     try:
         conn = sql_connect()
-        df = pd.read_sql("SELECT * FROM plants", conn)
+        with tracing.span("plants_query"):
+            df = pd.read_sql("SELECT * FROM plants", conn)
+        tracing.count("plants_loaded", len(df))
         logging.info(f" {len(df)} plant records loaded.")
 
         # Basic cleaning: lowercase columns, strip whitespace\ n        df.columns = df.columns.str.strip().str.lower()
@@ -63,10 +70,15 @@ def load_plants() -> pd.DataFrame:
 # --------------------------------------------------------------
 # Feedback Data Handling
 # --------------------------------------------------------------
-def fetch_feedback_data() -> pd.DataFrame:
+def fetch_feedback_data(snapshot: str | None = None) -> pd.DataFrame:
     """
     Fetch feedback records including timestamp.
+    If *snapshot* is given, read the local Parquet snapshot instead of ODBC.
     """
+    if snapshot:
+        from feedback_store import FEEDBACK_COLS, read_feedback_snapshot
+        return read_feedback_snapshot(snapshot, columns=[c for c in FEEDBACK_COLS if c != "id"])
+
     conn = sql_connect()
     query = '''
         SELECT
@@ -81,57 +93,80 @@ def fetch_feedback_data() -> pd.DataFrame:
     return df
 
 
+# Categorical columns for cleaning / encoding
+CAT_COLS = [
+    'area_size', 'sunlight_need', 'environment_type', 'climate_type',
+    'watering_frequency', 'fertilizer_frequency', 'pesticide_frequency',
+    'has_pet', 'has_child', 'suggested_plant'
+]
+ENC_COLS = CAT_COLS + ['time_of_day']
+
+# [0,6) Night · [6,12) Morning · [12,18) Afternoon · [18,24) Evening
+_HOUR_BINS = [0, 6, 12, 18, 24]
+_TIME_OF_DAY = ['Night', 'Morning', 'Afternoon', 'Evening']
+
+
+def _as_categorical(col: pd.Series) -> pd.Series:
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col
+    return col.astype('category')
+
+
+def _normalise_categories(col: pd.Series) -> pd.Series:
+    """
+    Apply fillna/strip/title to the category table only, then remap codes.
+
+    Work is proportional to the number of distinct values, not rows; the
+    per-row step is a single integer take over the codes array.
+    """
+    labels = pd.Index(col.cat.categories.astype(str)).str.strip().str.title()
+    labels = labels.where(labels != '', 'Unknown')
+
+    codes = col.cat.codes.to_numpy()
+    new_cats = set(labels)
+    if (codes == -1).any():
+        new_cats.add('Unknown')
+    new_cats = pd.Index(sorted(new_cats))
+
+    # old code → new code; the extra last slot catches NaN (code -1)
+    lookup = np.append(new_cats.get_indexer(labels), new_cats.get_loc('Unknown') if 'Unknown' in new_cats else -1)
+    cat = pd.Categorical.from_codes(lookup.astype(np.int32)[codes], categories=new_cats)
+    return pd.Series(cat, index=col.index, name=col.name).cat.remove_unused_categories()
+
+
 def clean_feedback_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Remove duplicates, handle nulls, strip whitespace, ensure correct types.
+    Categorical columns are returned as pandas Categorical.
     """
-    df_clean = df.drop_duplicates().copy()
+    # dtype change is lossless, so de-duplicating on category codes gives
+    # the same rows as de-duplicating the raw strings – just much cheaper
+    cat_cols = [col for col in CAT_COLS if col in df.columns]
+    df_clean = pd.DataFrame(
+        {col: _as_categorical(df[col]) if col in cat_cols else df[col] for col in df.columns},
+        copy=False,
+    ).drop_duplicates()
 
-    # Categorical columns for cleaning
-    cat_cols = [
-        'area_size', 'sunlight_need', 'environment_type', 'climate_type',
-        'watering_frequency', 'fertilizer_frequency', 'pesticide_frequency',
-        'has_pet', 'has_child', 'suggested_plant'
-    ]
     for col in cat_cols:
-        if col in df_clean.columns:
-                df_clean[col] = (
-                df_clean[col]
-                  .fillna('Unknown')                
-                  .astype(str)
-                  .str.strip()                     
-                  .replace('', 'Unknown')           
-                  .str.title()                     
-            )
+        df_clean[col] = _normalise_categories(df_clean[col])
 
-    
-    df_clean['user_feedback'] = pd.to_numeric(df_clean['user_feedback'], errors='coerce').fillna(0).astype(int).clip(0,1)
+    df_clean['user_feedback'] = pd.to_numeric(df_clean['user_feedback'], errors='coerce').fillna(0).clip(0, 1).astype('int8')
     return df_clean
 
 
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Add time_of_day and is_weekend features based on created_at.
+    Columns are added to *df* in place (no frame copy); *df* is returned.
     """
-    df_time = df.copy()
-    df_time['created_at'] = pd.to_datetime(df_time['created_at'], errors='coerce')
-    df_time['hour'] = df_time['created_at'].dt.hour
+    created = pd.to_datetime(df['created_at'], errors='coerce')
+    df['created_at'] = created
+    df['hour'] = created.dt.hour
 
-    def _time_of_day(h: int) -> str:
-        if pd.isna(h):
-            return 'Unknown'
-        if 6 <= h < 12:
-            return 'Morning'
-        elif 12 <= h < 18:
-            return 'Afternoon'
-        elif 18 <= h < 24:
-            return 'Evening'
-        else:
-            return 'Night'
-
-    df_time['time_of_day'] = df_time['hour'].apply(_time_of_day)
-    df_time['is_weekend'] = df_time['created_at'].dt.weekday.isin([5,6]).astype(int)
-    return df_time
+    time_of_day = pd.cut(df['hour'], bins=_HOUR_BINS, right=False, labels=_TIME_OF_DAY)
+    df['time_of_day'] = time_of_day.cat.add_categories('Unknown').fillna('Unknown')
+    df['is_weekend'] = (created.dt.weekday >= 5).astype('int8')
+    return df
 
 
 def generate_data_profile(df: pd.DataFrame, output_path: str = 'feedback_profile.html'):
@@ -145,20 +180,28 @@ def generate_data_profile(df: pd.DataFrame, output_path: str = 'feedback_profile
 
 def encode_categorical(df: pd.DataFrame, encoder_path: str = 'models/encoder.pkl') -> pd.DataFrame:
     """
-    Encode categorical features using OrdinalEncoder and save encoder.
+    Encode categorical features as ordinal codes and save the encoder.
+
+    Codes are taken straight from the Categorical dtypes, so the
+    OrdinalEncoder is only fitted on the (tiny) category tables. Columns are
+    replaced in *df* in place; *df* is returned.
     """
-    enc_cols = [
-        'area_size', 'sunlight_need', 'environment_type', 'climate_type',
-        'watering_frequency', 'fertilizer_frequency', 'pesticide_frequency',
-        'has_pet', 'has_child', 'suggested_plant', 'time_of_day'
-    ]
-    df_enc = df.copy()
-    encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
-    df_enc[enc_cols] = encoder.fit_transform(df_enc[enc_cols])
+    categories = []
+    for col in ENC_COLS:
+        cat_col = _as_categorical(df[col]).cat.remove_unused_categories()
+        cats = cat_col.cat.categories
+        if not cats.is_monotonic_increasing:         # OrdinalEncoder sıralı kategori bekler
+            cat_col = cat_col.cat.reorder_categories(cats.sort_values())
+        # sklearn boş kategori listesi kabul etmez: değeri olmayan sütun tek 'Unknown' kategorisi alır
+        categories.append(list(cat_col.cat.categories) or ['Unknown'])
+        df[col] = cat_col.cat.codes                  # NaN → -1, same as unknown_value
+
+    encoder = OrdinalEncoder(categories=categories, handle_unknown='use_encoded_value', unknown_value=-1)
+    encoder.fit(pd.DataFrame({col: cats[:1] for col, cats in zip(ENC_COLS, categories)}))
     # Persist encoder
     joblib.dump(encoder, encoder_path)
     logging.info(f"OrdinalEncoder saved to {encoder_path}")
-    return df_enc
+    return df
 
 # --------------------------------------------------------------
 
@@ -170,6 +213,7 @@ def add_feedback(user_input: dict, suggested_plant: str, user_feedback: int) ->
     user_feedback: int, 1=beğendi, 0=beğenmedi
     """
     conn = sql_connect()
+    ensure_counter_table(conn)
     cursor = conn.cursor()
 
   
@@ -203,7 +247,17 @@ def add_feedback(user_input: dict, suggested_plant: str, user_feedback: int) ->
         user_feedback
     )
 
-    cursor.execute(insert_sql, params)
-    conn.commit()
+    with tracing.span("feedback_insert"):
+        cursor.execute(insert_sql, params)
+        # retrain sayacı aynı transaction içinde artırılır
+        record_feedback(cursor, user_feedback)
+        conn.commit()
     cursor.close()
     conn.close()
+
+    # Çevrimiçi öğrenici: skorlar bir sonraki öneride güncellenir (retrain beklenmez)
+    try:
+        with tracing.span("online_update"):
+            record_online_feedback({**user_input, "suggested_plant": suggested_plant}, user_feedback)
+    except Exception as e:
+        logging.error(f" Online learner update failed: {e}")
@@ -1,5 +1,31 @@
+# dbye_ekle.py – Simulated questionnaire feedback (single forms → large synthetic sets)
+# --------------------------------------------------------------
+# • simulate_user_feedback_form(): one random form, as before
+# • generate_feedback(): 10k … 10M rows, vectorised and chunked, with
+#     - class balance        : positive_rate (share of user_feedback == 1)
+#     - plant popularity     : Zipf-like, plant_skew (0 = uniform)
+#     - plant preferences    : every plant has a hidden preferred value per
+#       questionnaire attribute (plant_preferences); the more a profile
+#       matches them, the likelier a positive label. preference_strength = 0
+#       gives labels independent of the profile
+# • write_feedback(): CSV, Parquet or a feedback_store snapshot directory
+#
+#   python dbye_ekle.py                                        # 5 form (DB bitkileriyle)
+#   python dbye_ekle.py --rows 1000000 --output data/synthetic.parquet
+#   python dbye_ekle.py --rows 10000000 --output data/synthetic_snapshot --format snapshot
+# --------------------------------------------------------------
+
 import random
-import pyodbc
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyodbc
+except ImportError:  # sentetik üretim için DB bağlantısı şart değil
+    pyodbc = None
 
 # MSSQL bağlantısı
 conn_str = (
@@ -9,6 +35,20 @@ conn_str = (
     "Trusted_Connection=yes;"
 )
 
+FORM_OPTIONS: Dict[str, List[str]] = {
+    "area_size": ["Mini", "Small", "Medium", "Large"],
+    "sunlight_need": ["6+ hours", "1-2 hours daily", "Can live in shade", "Bright indirect light"],
+    "environment_type": ["Indoor", "Outdoor", "Semi-outdoor"],
+    "climate_type": ["Spring", "Summer", "Winter", "All seasons"],
+    "watering_frequency": ["Daily", "Weekly", "Bi-weekly", "Every 2-3 days"],
+    "fertilizer_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "pesticide_frequency": ["Monthly", "1-2 times a year", "Never needed"],
+    "has_pet": ["Yes", "No"],
+    "has_child": ["Yes", "No"],
+}                                    # sütun sırası feedback_store.PROFILE_COLS ile aynı
+CHUNK_ROWS = 1_000_000
+
+
 def get_all_suggested_plants():
     conn = pyodbc.connect(conn_str)
     cursor = conn.cursor()
@@ -35,9 +75,151 @@ def simulate_user_feedback_form(plants_from_db):
     }
     return form_data
 
+
+# --------------------------------------------------------------
+# Büyük ölçekli sentetik geri bildirim
+# --------------------------------------------------------------
+def plant_preferences(plants: List[str], seed: int = 42) -> Dict[str, Dict[str, str]]:
+    """Hidden preferred answer per attribute for every plant (the structure a model can learn)."""
+    rng = np.random.default_rng(seed)
+    return {
+        plant: {attr: options[rng.integers(len(options))] for attr, options in FORM_OPTIONS.items()}
+        for plant in plants
+    }
+
+
+def _label_bias(strength: float, positive_rate: float, rng: np.random.Generator) -> float:
+    """Logit offset so that E[sigmoid(strength * z + bias)] == positive_rate."""
+    # eşleşen özellik sayısı ~ bağımsız Bernoulli(1/k) toplamı; z merkezlenmiş hali
+    p = np.array([1 / len(o) for o in FORM_OPTIONS.values()])
+    matches = (rng.random((200_000, len(p))) < p).sum(axis=1)
+    z = (matches - p.sum()) / np.sqrt((p * (1 - p)).sum())
+    lo, hi = -20.0, 20.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if (1 / (1 + np.exp(-(strength * z + mid)))).mean() < positive_rate:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def generate_feedback(
+    n_rows: int,
+    plants: Optional[List[str]] = None,
+    *,
+    positive_rate: float = 0.3,
+    preference_strength: float = 1.5,
+    plant_skew: float = 1.0,
+    days: int = 365,
+    seed: int = 42,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Yield synthetic Feedback rows (id, form columns, suggested_plant, user_feedback, created_at) in chunks."""
+    plants = plants or [f"Plant {i}" for i in range(100)]
+    rng = np.random.default_rng(seed)
+    prefs = plant_preferences(plants, seed)
+    attrs = list(FORM_OPTIONS)
+    # tercih edilen cevap kodları: (bitki, özellik)
+    pref_codes = np.array([[FORM_OPTIONS[a].index(prefs[p][a]) for a in attrs] for p in plants])
+    p_match = np.array([1 / len(FORM_OPTIONS[a]) for a in attrs])
+    mu, sigma = p_match.sum(), np.sqrt((p_match * (1 - p_match)).sum())
+    bias = _label_bias(preference_strength, positive_rate, rng)
+
+    popularity = 1 / np.arange(1, len(plants) + 1) ** plant_skew
+    popularity = rng.permutation(popularity / popularity.sum())
+    start = np.datetime64("now", "s") - np.timedelta64(days * 24 * 3600, "s")
+
+    next_id = 1
+    for offset in range(0, n_rows, chunk_rows):
+        n = min(chunk_rows, n_rows - offset)
+        codes = np.column_stack([rng.integers(len(FORM_OPTIONS[a]), size=n) for a in attrs])
+        plant_idx = rng.choice(len(plants), size=n, p=popularity)
+        z = ((codes == pref_codes[plant_idx]).sum(axis=1) - mu) / sigma
+        proba = 1 / (1 + np.exp(-(preference_strength * z + bias)))
+
+        chunk = {"id": np.arange(next_id, next_id + n, dtype=np.int64)}
+        for j, attr in enumerate(attrs):
+            chunk[attr] = pd.Categorical.from_codes(codes[:, j], categories=FORM_OPTIONS[attr])
+        chunk["suggested_plant"] = pd.Categorical.from_codes(plant_idx, categories=plants)
+        chunk["user_feedback"] = (rng.random(n) < proba).astype(np.int8)
+        # id sırası zaman sırasıdır: satırlar [start, now) aralığına eşit yayılır
+        seconds = np.arange(offset, offset + n, dtype=np.int64) * (days * 24 * 3600) // n_rows
+        chunk["created_at"] = start + seconds.astype("timedelta64[s]")
+        next_id += n
+        yield pd.DataFrame(chunk)
+
+
+def write_feedback(path: str, chunks: Iterator[pd.DataFrame], fmt: Optional[str] = None) -> int:
+    """
+    Write generated chunks as csv / parquet (fmt from the .csv / .parquet
+    suffix by default) or as a feedback_store snapshot – only with
+    fmt="snapshot", since that replaces the directory at *path*.
+    """
+    fmt = fmt or {".csv": "csv", ".parquet": "parquet"}.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Cannot infer the format of {path!r}: use a .csv / .parquet suffix or fmt='snapshot'")
+    if fmt == "snapshot":
+        from feedback_store import write_feedback_snapshot
+
+        return write_feedback_snapshot(chunks, path)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    if fmt == "csv":
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            rows += len(chunk)
+        return rows
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
 # === Ana kullanım ===
-plants_from_db = get_all_suggested_plants()
-for i in range(5):
-    print(f"📝 Simulated Form #{i+1}")
-    print(simulate_user_feedback_form(plants_from_db))
-    print("-" * 50)
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated questionnaire feedback")
+    parser.add_argument("--rows", type=int, help="Generate this many rows instead of printing 5 forms")
+    parser.add_argument("--output", help="CSV / Parquet file, or snapshot directory with --format snapshot")
+    parser.add_argument("--format", choices=["csv", "parquet", "snapshot"])
+    parser.add_argument("--plants", type=int, default=100, help="Synthetic plant count (ignored with --db-plants)")
+    parser.add_argument("--db-plants", action="store_true", help="Use the distinct plants of the Feedback table")
+    parser.add_argument("--positive-rate", type=float, default=0.3)
+    parser.add_argument("--preference-strength", type=float, default=1.5)
+    parser.add_argument("--plant-skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.rows is not None and not args.output:
+        parser.error("--output is required with --rows")
+
+    if args.rows is None:
+        plants_from_db = get_all_suggested_plants()
+        for i in range(5):
+            print(f"📝 Simulated Form #{i+1}")
+            print(simulate_user_feedback_form(plants_from_db))
+            print("-" * 50)
+    else:
+        plant_names = get_all_suggested_plants() if args.db_plants else [f"Plant {i}" for i in range(args.plants)]
+        written = write_feedback(
+            args.output,
+            generate_feedback(args.rows, plant_names, positive_rate=args.positive_rate,
+                              preference_strength=args.preference_strength,
+                              plant_skew=args.plant_skew, seed=args.seed),
+            fmt=args.format,
+        )
+        print(f"✅ {written} synthetic feedback rows → {args.output}")
@@ -0,0 +1,308 @@
+# feedback_store.py – Local columnar snapshot of the Feedback table
+# --------------------------------------------------------------
+# • Pulls only rows newer than the stored `id` watermark over ODBC
+# • Appends them as Parquet part files, hive-partitioned by user_feedback
+# • Profile columns + suggested_plant are dictionary-encoded
+#   (pandas Categorical → Arrow dictionary) so each value is stored once
+# • Readers get column projection + memory-mapped IO instead of a full
+#   ODBC pull into pandas
+#
+#   Kullanım:
+#     python feedback_store.py sync            # yeni kayıtları ekle
+#     python feedback_store.py sync --rebuild  # sıfırdan oluştur
+#     python feedback_store.py info
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
+
+try:
+    import pyodbc
+except ImportError:  # snapshot okumak için DB bağlantısı şart değil
+    pyodbc = None
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# --------------------------------------------------------------
+# Config
+# --------------------------------------------------------------
+SCHEMA_VERSION = 1
+SNAPSHOT_DIR = os.getenv("FEEDBACK_SNAPSHOT_DIR", "data/feedback_snapshot")
+META_FILE = "_snapshot_meta.json"
+SYNC_BATCH_ROWS = 100_000
+
+PROFILE_COLS = [
+    "area_size", "sunlight_need", "environment_type", "climate_type",
+    "watering_frequency", "fertilizer_frequency", "pesticide_frequency",
+    "has_pet", "has_child",
+]
+DICT_COLS = PROFILE_COLS + ["suggested_plant"]
+FEEDBACK_COLS = ["id"] + DICT_COLS + ["user_feedback", "created_at"]
+
+# user_feedback is the partition key → it lives in the directory name, not the file
+_FILE_SCHEMA = pa.schema(
+    [("id", pa.int64())]
+    + [(col, pa.dictionary(pa.int32(), pa.string())) for col in DICT_COLS]
+    + [("created_at", pa.timestamp("ms"))]
+)
+_PARTITIONING = ds.partitioning(pa.schema([("user_feedback", pa.int8())]), flavor="hive")
+
+
+# --------------------------------------------------------------
+# Database Connection
+# --------------------------------------------------------------
+def sql_connect(conn_str: str | None = None):
+    """ODBC connection helper. conn_str None → env → default."""
+    if not pyodbc:
+        raise RuntimeError("pyodbc is not installed – cannot sync the feedback snapshot.")
+
+    conn_str = (
+        conn_str
+        or os.getenv("SQLSERVER_CONN")
+        or r"DRIVER={ODBC Driver 17 for SQL Server};SERVER=LAPTOP-7GK6MUOG\SQLEXPRESS;DATABASE=Smart_Plant_Recomandation_System;Trusted_Connection=yes;"
+    )
+    return pyodbc.connect(conn_str, timeout=5)
+
+
+# --------------------------------------------------------------
+# Metadata helpers
+# --------------------------------------------------------------
+def _meta_path(root: str | Path) -> Path:
+    return Path(root) / META_FILE
+
+
+def _load_meta(root: str | Path) -> Dict:
+    path = _meta_path(root)
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _clear_snapshot(root: Path) -> None:
+    """Delete an old snapshot; refuses a non-empty directory that has no snapshot metadata."""
+    if not root.exists():
+        return
+    if not root.is_dir() or (any(root.iterdir()) and not _meta_path(root).exists()):
+        raise FileExistsError(f"{root} exists and is not a feedback snapshot (no {META_FILE}) – refusing to delete it")
+    shutil.rmtree(root)
+
+
+def _save_meta(root: str | Path, meta: Dict) -> None:
+    """Atomically replace the metadata file (temp file + rename)."""
+    path = _meta_path(root)
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _empty_meta() -> Dict:
+    return {"schema_version": SCHEMA_VERSION, "watermark": 0, "rows": 0, "parts": []}
+
+
+# --------------------------------------------------------------
+# Writing
+# --------------------------------------------------------------
+def _to_file_table(chunk: pd.DataFrame) -> pa.Table:
+    chunk = chunk.copy()
+    chunk["id"] = chunk["id"].astype("int64")
+    for col in DICT_COLS:
+        chunk[col] = chunk[col].fillna("Unknown").astype(str).str.strip().astype("category")
+    chunk["created_at"] = pd.to_datetime(chunk["created_at"], errors="coerce").astype("datetime64[ms]")
+    return pa.Table.from_pandas(chunk[_FILE_SCHEMA.names], schema=_FILE_SCHEMA, preserve_index=False)
+
+
+def _append_part(root: Path, chunk: pd.DataFrame, seq: int) -> List[str]:
+    """Write one chunk as a part file per user_feedback partition; return relative paths."""
+    flags = pd.to_numeric(chunk["user_feedback"], errors="coerce").fillna(0).astype(int).clip(0, 1)
+    written: List[str] = []
+    for flag, part in chunk.groupby(flags):
+        rel = f"user_feedback={flag}/part-{seq:06d}.parquet"
+        dest = root / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_suffix(".parquet.tmp")
+        pq.write_table(_to_file_table(part), tmp)
+        os.replace(tmp, dest)
+        written.append(rel)
+    return written
+
+
+def sync_feedback_snapshot(
+    root: str | Path = SNAPSHOT_DIR,
+    *,
+    conn=None,
+    rebuild: bool = False,
+    batch_rows: int = SYNC_BATCH_ROWS,
+) -> int:
+    """
+    Append Feedback rows with id > watermark to the snapshot; return rows added.
+
+    A part file only becomes visible to readers once it is listed in the
+    metadata file, so a crash mid-sync never exposes a half-written batch.
+    """
+    root = Path(root)
+    meta = _load_meta(root)
+    if rebuild or meta.get("schema_version") != SCHEMA_VERSION:
+        if root.exists():
+            logger.info("Snapshot schema changed or rebuild requested – recreating %s", root)
+            _clear_snapshot(root)
+        meta = _empty_meta()
+    root.mkdir(parents=True, exist_ok=True)
+    _save_meta(root, meta)                           # dizin, ilk part'tan önce snapshot olarak işaretlenir
+
+    own_conn = conn is None
+    conn = conn or sql_connect()
+    query = f"SELECT {', '.join(FEEDBACK_COLS)} FROM Feedback WHERE id > ? ORDER BY id"
+
+    added = 0
+    try:
+        for chunk in pd.read_sql(query, conn, params=[meta["watermark"]], chunksize=batch_rows):
+            if chunk.empty:
+                continue
+            seq = len(meta["parts"])
+            meta["parts"].extend(_append_part(root, chunk, seq))
+            meta["watermark"] = int(chunk["id"].max())
+            meta["rows"] += len(chunk)
+            _save_meta(root, meta)
+            added += len(chunk)
+    finally:
+        if own_conn:
+            conn.close()
+
+    logger.info("Snapshot sync → +%d rows (total %d, watermark id=%d)", added, meta["rows"], meta["watermark"])
+    return added
+
+
+def write_feedback_snapshot(chunks: Iterable[pd.DataFrame], root: str | Path) -> int:
+    """
+    Build a fresh snapshot from DataFrames with FEEDBACK_COLS (no ODBC) –
+    e.g. synthetic feedback. Returns the number of rows written.
+    """
+    root = Path(root)
+    _clear_snapshot(root)
+    root.mkdir(parents=True)
+    meta = _empty_meta()
+    _save_meta(root, meta)
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        meta["parts"].extend(_append_part(root, chunk, len(meta["parts"])))
+        meta["watermark"] = max(meta["watermark"], int(chunk["id"].max()))
+        meta["rows"] += len(chunk)
+        _save_meta(root, meta)
+    logger.info("Snapshot written → %d rows in %s", meta["rows"], root)
+    return meta["rows"]
+
+
+# --------------------------------------------------------------
+# Reading
+# --------------------------------------------------------------
+def snapshot_exists(root: str | Path = SNAPSHOT_DIR) -> bool:
+    meta = _load_meta(root)
+    return meta.get("schema_version") == SCHEMA_VERSION and bool(meta.get("parts"))
+
+
+def open_feedback_snapshot(root: str | Path = SNAPSHOT_DIR) -> ds.Dataset:
+    """Return a memory-mapped Arrow dataset over the committed part files."""
+    meta = _load_meta(root)
+    if meta.get("schema_version") != SCHEMA_VERSION:
+        raise FileNotFoundError(f"No feedback snapshot (schema v{SCHEMA_VERSION}) at {root}")
+
+    base = os.path.abspath(root)
+    return ds.dataset(
+        [os.path.join(base, rel) for rel in meta["parts"]],
+        schema=_FILE_SCHEMA.append(pa.field("user_feedback", pa.int8())),
+        format="parquet",
+        partitioning=_PARTITIONING,
+        partition_base_dir=base,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _scan_args(columns: Optional[List[str]], feedback: Optional[int], min_id: Optional[int] = None) -> Dict:
+    args: Dict = {"columns": columns}
+    predicates = []
+    if feedback is not None:
+        predicates.append(ds.field("user_feedback") == feedback)  # partition pruning
+    if min_id is not None:
+        predicates.append(ds.field("id") > min_id)                # row-group statistics pruning
+    if predicates:
+        expr = predicates[0]
+        for pred in predicates[1:]:
+            expr = expr & pred
+        args["filter"] = expr
+    return args
+
+
+def read_feedback_snapshot(
+    root: str | Path = SNAPSHOT_DIR,
+    *,
+    columns: Optional[List[str]] = None,
+    feedback: Optional[int] = None,
+    min_id: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Load the snapshot into pandas.
+
+    Only *columns* are read from disk; dictionary columns come back as
+    pandas Categorical. *feedback* (0/1) restricts the scan to one partition,
+    *min_id* to rows with id > min_id.
+    """
+    dataset = open_feedback_snapshot(root)
+    table = dataset.to_table(**_scan_args(columns, feedback, min_id))
+    df = table.to_pandas()
+    logger.info("Read %d feedback rows from snapshot %s", len(df), root)
+    return df
+
+
+def iter_feedback_snapshot(
+    root: str | Path = SNAPSHOT_DIR,
+    *,
+    columns: Optional[List[str]] = None,
+    feedback: Optional[int] = None,
+    min_id: Optional[int] = None,
+    batch_rows: int = SYNC_BATCH_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Yield the snapshot as DataFrames of at most *batch_rows* rows."""
+    dataset = open_feedback_snapshot(root)
+    for batch in dataset.to_batches(batch_size=batch_rows, **_scan_args(columns, feedback, min_id)):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+# --------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Maintain the local Parquet snapshot of Feedback")
+    parser.add_argument("command", choices=["sync", "info"])
+    parser.add_argument("--root", default=SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument("--rebuild", action="store_true", help="Drop and re-pull the whole table")
+    parser.add_argument("--batch-rows", type=int, default=SYNC_BATCH_ROWS)
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        sync_feedback_snapshot(args.root, rebuild=args.rebuild, batch_rows=args.batch_rows)
+    else:
+        print(json.dumps(_load_meta(args.root) or {"status": "missing"}, indent=2))
@@ -0,0 +1,403 @@
+# incremental_miner.py – Incremental association-rule mining over the full Feedback history
+# --------------------------------------------------------------
+# • Replaces the CHUNK_SIZE=250 cyclic window of learning_engine_v2: support
+#   counts are kept per feedback class in models/itemset_counts.json and
+#   updated with the rows newer than the stored id watermark. Only itemsets
+#   a rule can use are counted – at most MAX_ITEMSET_LEN − 1 conditions,
+#   with or without the plant – so counting costs O(new rows); loading and
+#   saving the JSON state still costs O(state size) per run
+# • Counting is done per column combination with a categorical groupby, so a
+#   chunk is never one-hot expanded
+# • Optional lossy counting (Manku & Motwani): with epsilon > 0 itemsets whose
+#   count can no longer reach epsilon·N are pruned, bounding memory; reported
+#   supports are then underestimated by at most epsilon
+# • Rules are generated from the counts as antecedent → suggested_plant and
+#   written in the same parsed_rules.json format kb_updater consumes
+# • Time decay (forward decay over created_at): every row also adds
+#   exp(λ·(t − landmark)) to a decayed sum, λ = ln 2 / half-life. Support,
+#   confidence and lift are ratios, so the common exp(−λ·(now − landmark))
+#   factor cancels and a batch costs O(batch); the landmark is moved (one
+#   rescale of the stored sums) before the exponent could overflow
+# • The count file is plain JSON (item vocabulary + [item ids, count, error,
+#   decayed sum] per itemset), not a pickle of the class, so counts saved by
+#   `python incremental_miner.py` load in the retrain worker and vice versa
+#
+#   Kullanım:
+#     python incremental_miner.py --snapshot data/feedback_snapshot
+#     python incremental_miner.py --rebuild --min-support 0.01
+#     python learning_engine_v2.py --incremental   # aynı yol
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from learning_engine_v2 import ITEM_COLS, _rule_sort_key, sql_connect
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+COUNTS_PATH = os.path.join("models", "itemset_counts.json")
+LEGACY_COUNTS_PATH = os.path.join("models", "itemset_counts.pkl")
+COUNTS_FORMAT = 1
+MAX_ITEMSET_LEN = 4          # en fazla 3 koşul + bitki
+CONDITION_COLS = [col for col in ITEM_COLS if col != "suggested_plant"]
+EPSILON = 0.0                # 0 → kesin sayım
+TOP_N_RULES = 20
+ROW_LOOP_MAX = 20_000      # küçük parçalar satır satır sayılır (groupby sabit maliyeti yok)
+HALF_LIFE_DAYS = 90.0      # 0 → zaman ağırlığı yok
+MAX_EXPONENT = 500.0       # exp(500) < float64 sınırı; aşılmadan landmark kaydırılır
+
+Itemset = Tuple[Tuple[str, str], ...]
+
+
+class ItemsetCounter:
+    """Persistent per-class itemset support counts (raw and time-decayed) with an id watermark."""
+
+    def __init__(self, max_len: int = MAX_ITEMSET_LEN, epsilon: float = EPSILON,
+                 half_life_days: float = HALF_LIFE_DAYS) -> None:
+        self.max_len = max_len
+        self.max_conditions = max_len - 1          # koşul sayısı; bitki her zaman ayrıca
+        self.epsilon = epsilon
+        self.counts: Dict[int, Dict[Itemset, List[int]]] = {0: {}, 1: {}}   # itemset → [count, max_error]
+        self.n_rows: Dict[int, int] = {0: 0, 1: 0}
+        self.watermark = 0
+        self._init_decay(half_life_days)
+
+    def _init_decay(self, half_life_days: float) -> None:
+        self.half_life_days = half_life_days
+        self.decayed: Dict[int, Dict[Itemset, float]] = {0: {}, 1: {}}     # itemset → Σ exp(λ(t − landmark))
+        self.decayed_rows: Dict[int, float] = {0: 0.0, 1: 0.0}
+        self.landmark: Optional[float] = None                               # epoch saniye
+        self.latest: Optional[float] = None
+
+    @property
+    def decay_rate(self) -> float:
+        return math.log(2) / (self.half_life_days * 86400.0) if self.half_life_days else 0.0
+
+    def _row_weights(self, created_at: pd.Series) -> np.ndarray:
+        """Forward-decay weights exp(λ·(t − landmark)); rescales stored sums if the landmark must move."""
+        ts = pd.to_datetime(created_at, errors="coerce")
+        if ts.dt.tz is not None:
+            ts = ts.dt.tz_convert(None)
+        secs = (ts - pd.Timestamp(0)).dt.total_seconds().to_numpy(dtype=float)
+        if np.isnan(secs).all():
+            secs[:] = self.latest if self.latest is not None else pd.Timestamp.now().timestamp()
+        else:
+            secs = np.where(np.isnan(secs), np.nanmax(secs), secs)     # tarihsiz satır → parçanın en yenisi
+        if self.landmark is None:
+            self.landmark = float(secs.min())
+        self.latest = max(self.latest or secs.max(), float(secs.max()))
+
+        rate = self.decay_rate
+        if rate * (secs.max() - self.landmark) > MAX_EXPONENT:
+            self._rebase(float(secs.max()))
+        return np.exp(rate * (secs - self.landmark))
+
+    def _rebase(self, new_landmark: float) -> None:
+        factor = math.exp(-self.decay_rate * (new_landmark - self.landmark))
+        for flag, table in self.decayed.items():
+            for key in table:
+                table[key] *= factor
+            self.decayed_rows[flag] *= factor
+        logger.info("Decay landmark moved by %.1f days", (new_landmark - self.landmark) / 86400.0)
+        self.landmark = new_landmark
+
+    # ----------------------------------------------------------
+    # Counting
+    # ----------------------------------------------------------
+    def update(self, df: pd.DataFrame) -> int:
+        """Add the itemsets of *df* (ITEM_COLS + user_feedback [+ id]) to the counts."""
+        if df.empty:
+            return 0
+        items = df[ITEM_COLS].astype(str).astype("category")
+        flags = pd.to_numeric(df["user_feedback"], errors="coerce").fillna(0).astype(int).clip(0, 1).to_numpy()
+        weights = (self._row_weights(df["created_at"])
+                   if self.half_life_days and "created_at" in df.columns else None)
+        for flag in (0, 1):
+            mask = flags == flag
+            sub = items[mask]
+            if sub.empty:
+                continue
+            self._count(flag, sub, None if weights is None else weights[mask])
+        if "id" in df.columns:
+            self.watermark = max(self.watermark, int(df["id"].max()))
+        return len(df)
+
+    def _count(self, flag: int, sub: pd.DataFrame, weights: Optional[np.ndarray] = None) -> None:
+        table = self.counts[flag]
+        decayed = self.decayed[flag]
+        prior_error = int(self.epsilon * self.n_rows[flag])
+
+        def add(key: Itemset, count: int, weight: float) -> None:
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [count, prior_error]
+            else:
+                entry[0] += count
+            if weights is not None:
+                decayed[key] = decayed.get(key, 0.0) + weight
+
+        # sayılan itemset'ler: ≤ max_conditions koşul (öncül) ve aynı koşullar + bitki;
+        # bitki ITEM_COLS'ta son sütun, anahtarlar combinations(ITEM_COLS, k) sırasını korur
+        if len(sub) <= ROW_LOOP_MAX:
+            row_weights = weights.tolist() if weights is not None else [0.0] * len(sub)
+            plants = sub["suggested_plant"].tolist()
+            for row, plant, weight in zip(zip(*(sub[col].tolist() for col in CONDITION_COLS)), plants, row_weights):
+                pairs = tuple(zip(CONDITION_COLS, row))
+                plant_item = (("suggested_plant", plant),)
+                for k in range(self.max_conditions + 1):
+                    for key in combinations(pairs, k):
+                        if k:
+                            add(key, 1, weight)
+                        add(key + plant_item, 1, weight)
+        else:
+            framed = sub.assign(_w=weights if weights is not None else 0.0)
+            for k in range(self.max_conditions + 1):
+                for conds in combinations(CONDITION_COLS, k):
+                    for cols in ([conds] if k else []) + [conds + ("suggested_plant",)]:
+                        grouped = framed.groupby(list(cols), observed=True, sort=False)["_w"].agg(["size", "sum"])
+                        for values, count, weight in zip(grouped.index, grouped["size"].tolist(),
+                                                         grouped["sum"].tolist()):
+                            add(tuple(zip(cols, values if len(cols) > 1 else (values,))), count, weight)
+        self.n_rows[flag] += len(sub)
+        if weights is not None:
+            self.decayed_rows[flag] += float(weights.sum())
+        self._prune(flag)
+
+    def _prune(self, flag: int) -> None:
+        if self.epsilon <= 0:
+            return
+        bound = self.epsilon * self.n_rows[flag]
+        table = self.counts[flag]
+        dropped = [key for key, (count, error) in table.items() if count + error <= bound]
+        for key in dropped:
+            del table[key]
+            self.decayed[flag].pop(key, None)
+        if dropped:
+            logger.info("feedback=%d: pruned %d infrequent itemsets (ε=%.4g)", flag, len(dropped), self.epsilon)
+
+    # ----------------------------------------------------------
+    # Rules
+    # ----------------------------------------------------------
+    def rules(self, flag: int, *, min_support: float, min_confidence: float,
+              top_n: Optional[int] = TOP_N_RULES, decayed: bool = False) -> List[Dict]:
+        """
+        antecedent → suggested_plant rules of one feedback class, best lift first.
+
+        decayed=True computes support/confidence/lift from the time-decayed
+        sums, so recent feedback outweighs old feedback.
+        """
+        if decayed:
+            if not self.half_life_days:
+                raise ValueError("Counter was built without time decay (half_life_days=0)")
+            n = self.decayed_rows[flag]
+            table = {key: (weight,) for key, weight in self.decayed[flag].items()}
+            min_count = min_support * n
+        else:
+            n = self.n_rows[flag]
+            table = self.counts[flag]
+            min_count = max(min_support - self.epsilon, 0.0) * n
+        if n == 0:
+            return []
+        out: List[Dict] = []
+        for itemset, (count, *_) in table.items():
+            if len(itemset) < 2 or count < min_count:
+                continue
+            plant = [item for item in itemset if item[0] == "suggested_plant"]
+            if not plant:
+                continue
+            antecedent = tuple(item for item in itemset if item[0] != "suggested_plant")
+            a_entry, c_entry = table.get(antecedent), table.get(tuple(plant))
+            if a_entry is None or c_entry is None:
+                continue
+            confidence = count / a_entry[0]
+            if confidence < min_confidence:
+                continue
+            conditions: Dict[str, List[str]] = {}
+            for col, val in antecedent:
+                conditions.setdefault(col, []).append(val)
+            out.append({
+                "conditions": conditions,
+                "suggested_plant": plant[0][1],
+                "feedback": flag,
+                "support": count / n,
+                "confidence": confidence,
+                "lift": confidence / (c_entry[0] / n),
+            })
+        out.sort(key=_rule_sort_key)
+        return out[:top_n] if top_n else out
+
+    # ----------------------------------------------------------
+    # Persistence
+    # ----------------------------------------------------------
+    def to_dict(self) -> Dict:
+        """Plain-data form of the counter (JSON-serialisable)."""
+        vocab: Dict[Tuple[str, str], int] = {}
+        tables: Dict[str, List] = {}
+        for flag, table in self.counts.items():
+            decayed = self.decayed[flag]
+            tables[str(flag)] = [
+                [[vocab.setdefault(item, len(vocab)) for item in key], count, error, decayed.get(key)]
+                for key, (count, error) in table.items()
+            ]
+        return {
+            "format": COUNTS_FORMAT,
+            "max_len": self.max_len,
+            "epsilon": self.epsilon,
+            "half_life_days": self.half_life_days,
+            "watermark": self.watermark,
+            "n_rows": {str(flag): n for flag, n in self.n_rows.items()},
+            "decayed_rows": {str(flag): total for flag, total in self.decayed_rows.items()},
+            "landmark": self.landmark,
+            "latest": self.latest,
+            "items": [list(item) for item in vocab],
+            "counts": tables,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "ItemsetCounter":
+        if state.get("format") != COUNTS_FORMAT:
+            raise ValueError(f"Unsupported itemset count format {state.get('format')!r}")
+        counter = cls(state["max_len"], state["epsilon"], state["half_life_days"])
+        counter.watermark = state["watermark"]
+        counter.landmark = state["landmark"]
+        counter.latest = state["latest"]
+        items = [tuple(item) for item in state["items"]]
+        for flag in (0, 1):
+            counter.n_rows[flag] = state["n_rows"][str(flag)]
+            counter.decayed_rows[flag] = state["decayed_rows"][str(flag)]
+            table, decayed = counter.counts[flag], counter.decayed[flag]
+            for ids, count, error, weight in state["counts"][str(flag)]:
+                key = tuple(items[i] for i in ids)
+                if len(key) > counter.max_conditions and key[-1][0] != "suggested_plant":
+                    continue                           # eski durum: hiçbir kuralın kullanamadığı itemset
+                table[key] = [count, error]
+                if weight is not None:
+                    decayed[key] = weight
+        return counter
+
+    def save(self, path: str = COUNTS_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = COUNTS_PATH) -> "ItemsetCounter":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def summary(self) -> Dict:
+        return {
+            "watermark": self.watermark,
+            "rows": dict(self.n_rows),
+            "itemsets": {flag: len(table) for flag, table in self.counts.items()},
+            "max_len": self.max_len,
+            "epsilon": self.epsilon,
+            "half_life_days": self.half_life_days,
+            "effective_rows": {
+                flag: round(total * math.exp(-self.decay_rate * (self.latest - self.landmark)), 2)
+                for flag, total in self.decayed_rows.items()
+            } if self.landmark is not None else None,
+        }
+
+
+# --------------------------------------------------------------
+# Veri kaynağı: yalnızca watermark'tan yeni satırlar
+# --------------------------------------------------------------
+def fetch_new_feedback(since_id: int, snapshot: Optional[str] = None) -> pd.DataFrame:
+    columns = ["id"] + ITEM_COLS + ["user_feedback", "created_at"]
+    if snapshot:
+        from feedback_store import read_feedback_snapshot
+
+        return read_feedback_snapshot(snapshot, columns=columns, min_id=since_id)
+    conn = sql_connect()
+    try:
+        return pd.read_sql(
+            f"SELECT {', '.join(columns)} FROM Feedback WHERE id > ? ORDER BY id", conn, params=[since_id]
+        )
+    finally:
+        conn.close()
+
+
+def mine_incremental(
+    *,
+    snapshot: Optional[str] = None,
+    counts_path: str = COUNTS_PATH,
+    rebuild: bool = False,
+    min_support: float = 0.005,
+    min_confidence: float = 0.1,
+    output_path: str = "parsed_rules.json",
+    max_len: int = MAX_ITEMSET_LEN,
+    epsilon: float = EPSILON,
+    top_n: Optional[int] = TOP_N_RULES,
+    half_life_days: float = HALF_LIFE_DAYS,
+    decayed: bool = True,
+) -> ItemsetCounter:
+    """Fold new Feedback rows into the stored counts and rewrite parsed_rules.json."""
+    if rebuild or not Path(counts_path).exists():
+        if not rebuild and Path(LEGACY_COUNTS_PATH).exists():
+            logger.warning("Ignoring pickled counts %s (old format) – recounting the full history.",
+                           LEGACY_COUNTS_PATH)
+        counter = ItemsetCounter(max_len, epsilon, half_life_days)
+    else:
+        counter = ItemsetCounter.load(counts_path)
+
+    new_rows = counter.update(fetch_new_feedback(counter.watermark, snapshot))
+    logger.info("Itemset counts updated with %d new rows → %s", new_rows, counter.summary())
+    counter.save(counts_path)
+
+    parsed: List[Dict] = []
+    for flag in (1, 0):
+        rules = counter.rules(flag, min_support=min_support, min_confidence=min_confidence, top_n=top_n,
+                              decayed=decayed and bool(counter.half_life_days))
+        logger.info("feedback=%d → %d rules", flag, len(rules))
+        parsed.extend(rules)
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(parsed, f, ensure_ascii=False, indent=2)
+    logger.info("Saved %d parsed rules → %s", len(parsed), output_path)
+    return counter
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally mine association rules for KB")
+    parser.add_argument("--snapshot", help="Optional feedback_store snapshot directory instead of DB query")
+    parser.add_argument("--counts", default=COUNTS_PATH, help="Persistent itemset count file")
+    parser.add_argument("--rebuild", action="store_true", help="Discard stored counts and recount all rows")
+    parser.add_argument("--min-support", type=float, default=0.01)
+    parser.add_argument("--min-confidence", type=float, default=0.3)
+    parser.add_argument("--max-len", type=int, default=MAX_ITEMSET_LEN)
+    parser.add_argument("--epsilon", type=float, default=EPSILON, help="Lossy-counting error bound (0 = exact)")
+    parser.add_argument("--half-life-days", type=float, default=HALF_LIFE_DAYS,
+                        help="Decay half-life for new count files (0 = no decay)")
+    parser.add_argument("--no-decay", action="store_true", help="Write rules from raw (undecayed) counts")
+    parser.add_argument("--output", default="parsed_rules.json")
+    args = parser.parse_args()
+
+    mine_incremental(
+        snapshot=args.snapshot,
+        counts_path=args.counts,
+        rebuild=args.rebuild,
+        min_support=args.min_support,
+        min_confidence=args.min_confidence,
+        output_path=args.output,
+        max_len=args.max_len,
+        epsilon=args.epsilon,
+        half_life_days=args.half_life_days,
+        decayed=not args.no_decay,
+    )
@@ -0,0 +1,349 @@
+# kb_journal.py – Append-only journal + snapshot storage for knowledge_base.json
+# --------------------------------------------------------------
+# • knowledge_base.json stays the snapshot (same format, plus "journal_seq");
+#   rule changes are appended to knowledge_base.json.journal as JSON lines:
+#     {"seq": 12, "op": "add",    "list": "positive_rules", "rule": {...}}
+#     {"seq": 13, "op": "remove", "list": "negative_rules", "rule": {...}}
+#     {"seq": 14, "op": "update", "list": "positive_rules", "rule": {...}}
+#     {"seq": 15, "op": "replace", "list": "positive_rules", "rules": [...]}
+# • Rules are identified by rule_id() – condition set + plant. remove and
+#   update address the rule with the same id; update swaps it in place, so
+#   refreshed statistics (support / confidence / lift) are one small entry
+#   and the list order is kept
+# • A batch is written with a single write() + fsync; a torn last line (crash
+#   mid-write) is ignored on replay
+# • load_kb() = snapshot + journal entries with seq > snapshot["journal_seq"];
+#   a gap in seq (compaction ran between the two reads) triggers a re-read
+# • compact() folds the journal into a new snapshot (temp file + os.replace)
+#   and then drops the journal; maybe_compact() does it in a background
+#   thread once the journal exceeds COMPACT_AFTER entries
+# • fork_kb() starts a new KB (e.g. a release) from an existing one without
+#   rewriting it: snapshots are only ever replaced, never written in place,
+#   so the snapshot is hard-linked and only the journal is copied
+# • Writers (append / compact, and kb_updater across load → diff → append)
+#   serialise on an OS lock (flock / msvcrt) on knowledge_base.json.lock. The
+#   lock file is never deleted and the kernel drops the lock when its holder
+#   dies, so there is no stale-lock breaking to race on
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+RULE_LISTS = ("positive_rules", "negative_rules")
+COMPACT_AFTER = 500              # journal satırı
+LOCK_TIMEOUT = 30.0
+
+
+def journal_path(kb_path: str | Path) -> Path:
+    kb_path = Path(kb_path)
+    return kb_path.with_name(kb_path.name + ".journal")
+
+
+def _lock_path(kb_path: str | Path) -> Path:
+    kb_path = Path(kb_path)
+    return kb_path.with_name(kb_path.name + ".lock")
+
+
+def rule_key(rule: Dict) -> str:
+    return json.dumps(rule, sort_keys=True, ensure_ascii=False)
+
+
+def rule_id(rule: Dict) -> str:
+    """Identity of a rule inside its list: condition set + plant, statistics excluded."""
+    return json.dumps([sorted(rule.get("conditions", {}).items()), rule.get("suggested_plant")],
+                      ensure_ascii=False)
+
+
+# --------------------------------------------------------------
+# Lock
+# --------------------------------------------------------------
+_held = threading.local()                  # bu thread'in tuttuğu kilitler: yol → [fd, derinlik]
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    os.close(fd)                                        # flock kapanışla bırakılır
+
+
+class WriterLock:
+    """
+    Exclusive OS lock on the persistent <kb>.lock file. Re-entrant within a
+    thread, so a caller can hold it across load → diff → append_entries().
+    """
+
+    def __init__(self, kb_path: str | Path, timeout: float = LOCK_TIMEOUT) -> None:
+        self.path = _lock_path(kb_path)
+        self.key = os.path.abspath(self.path)
+        self.timeout = timeout
+
+    def __enter__(self) -> "WriterLock":
+        held = _held.__dict__.setdefault("locks", {})
+        if self.key in held:
+            held[self.key][1] += 1
+            return self
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        deadline = time.monotonic() + self.timeout
+        while not _try_lock(fd):
+            if time.monotonic() > deadline:
+                os.close(fd)
+                raise TimeoutError(f"KB writer lock busy: {self.path}")
+            time.sleep(0.05)
+        held[self.key] = [fd, 1]
+        return self
+
+    def __exit__(self, *exc) -> None:
+        held = _held.locks
+        held[self.key][1] -= 1
+        if not held[self.key][1]:
+            _unlock(held.pop(self.key)[0])
+
+
+# --------------------------------------------------------------
+# Okuma
+# --------------------------------------------------------------
+def _read_journal(path: Path) -> List[Dict]:
+    entries: List[Dict] = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break                                   # yarım kalmış son satır
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Corrupt KB journal line in %s – ignoring the rest", path)
+                    break
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+class _ListReplay:
+    """One rule list during replay: removes / updates go through a rule_id → positions map built on first use."""
+
+    __slots__ = ("rules", "positions", "removed")
+
+    def __init__(self, rules: List[Dict]) -> None:
+        self.rules = rules
+        self.positions: Optional[Dict[str, List[int]]] = None
+        self.removed: set = set()
+
+    def _index(self) -> Dict[str, List[int]]:
+        if self.positions is None:
+            self.positions = {}
+            for i, r in enumerate(self.rules):
+                self.positions.setdefault(rule_id(r), []).append(i)
+        return self.positions
+
+    def add(self, rule: Dict) -> None:
+        if self.positions is not None:
+            self.positions.setdefault(rule_id(rule), []).append(len(self.rules))
+        self.rules.append(rule)
+
+    def remove(self, rule: Dict) -> None:
+        self.removed.update(self._index().pop(rule_id(rule), ()))
+
+    def update(self, rule: Dict) -> None:
+        for i in self._index().get(rule_id(rule), ()):
+            self.rules[i] = rule
+
+    def result(self) -> List[Dict]:
+        if not self.removed:
+            return self.rules
+        return [r for i, r in enumerate(self.rules) if i not in self.removed]
+
+
+def apply_entries(kb: Dict, entries: List[Dict]) -> Dict:
+    """Replay journal entries onto a KB dict (in place) and return it – O(entries + rules)."""
+    lists: Dict[str, _ListReplay] = {}
+    for entry in entries:
+        name = entry["list"]
+        if entry["op"] == "replace":
+            lists[name] = _ListReplay(list(entry["rules"]))
+        else:
+            replay = lists.get(name)
+            if replay is None:
+                replay = lists[name] = _ListReplay(kb.setdefault(name, []))
+            if entry["op"] == "add":
+                replay.add(entry["rule"])
+            elif entry["op"] == "remove":
+                replay.remove(entry["rule"])
+            elif entry["op"] == "update":
+                replay.update(entry["rule"])
+        kb["journal_seq"] = entry["seq"]
+    for name, replay in lists.items():
+        kb[name] = replay.result()
+    return kb
+
+
+def load_kb(kb_path: str | Path, retries: int = 3) -> Dict:
+    """Snapshot + journal → current KB dict."""
+    kb_path = Path(kb_path)
+    for _ in range(retries):
+        with kb_path.open("r", encoding="utf-8") as f:
+            kb = json.load(f)
+        base_seq = kb.get("journal_seq", 0)
+        entries = [e for e in _read_journal(journal_path(kb_path)) if e["seq"] > base_seq]
+        if not entries or entries[0]["seq"] == base_seq + 1:
+            return apply_entries(kb, entries)
+        # arada compaction çalıştı: yeni snapshot'ı oku
+    raise RuntimeError(f"KB journal for {kb_path} kept changing during load")
+
+
+# --------------------------------------------------------------
+# Yazma
+# --------------------------------------------------------------
+def _atomic_write_json(path: Path, data: Dict) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def diff_entries(old: Dict, new: Dict) -> List[Dict]:
+    """
+    Deltas that turn *old* rule lists into *new*, matched by rule_id().
+
+    Removals, in-place updates (same rule, new statistics) and appended
+    additions reproduce the new list whenever the surviving rules keep their
+    order; otherwise the list is replaced whole.
+    """
+    entries: List[Dict] = []
+    for name in RULE_LISTS:
+        old_rules, new_rules = old.get(name, []), new.get(name, [])
+        old_by_id = {rule_id(r): r for r in old_rules}
+        new_by_id = {rule_id(r): r for r in new_rules}
+        ops = [{"op": "remove", "list": name, "rule": r} for key, r in old_by_id.items() if key not in new_by_id]
+        ops += [{"op": "update", "list": name, "rule": r}
+                for key, r in new_by_id.items() if key in old_by_id and old_by_id[key] != r]
+        ops += [{"op": "add", "list": name, "rule": r} for r in new_rules if rule_id(r) not in old_by_id]
+        if apply_entries({name: list(old_rules)}, [{**op, "seq": 0} for op in ops])[name] != new_rules:
+            ops = [{"op": "replace", "list": name, "rules": new_rules}]
+        entries.extend(ops)
+    return entries
+
+
+def append_entries(kb_path: str | Path, entries: List[Dict]) -> int:
+    """Append one batch of deltas (numbered after the current tail). Returns the last seq."""
+    kb_path = Path(kb_path)
+    if not entries:
+        return load_kb(kb_path).get("journal_seq", 0)
+    with WriterLock(kb_path):
+        tail = _read_journal(journal_path(kb_path))
+        seq = tail[-1]["seq"] if tail else load_kb(kb_path).get("journal_seq", 0)
+        lines = []
+        for entry in entries:
+            seq += 1
+            lines.append(json.dumps({"seq": seq, "ts": time.time(), **entry}, ensure_ascii=False) + "\n")
+        with journal_path(kb_path).open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+    return seq
+
+
+def compact(kb_path: str | Path) -> int:
+    """Fold the journal into a new snapshot; returns the number of entries folded."""
+    kb_path = Path(kb_path)
+    with WriterLock(kb_path):
+        entries = _read_journal(journal_path(kb_path))
+        if not entries:
+            return 0
+        kb = load_kb(kb_path)
+        _atomic_write_json(kb_path, kb)                    # önce snapshot (journal_seq ile)
+        journal_path(kb_path).unlink(missing_ok=True)      # sonra journal – arada çökme güvenli
+    logger.info("KB compacted: %d journal entries folded into %s", len(entries), kb_path)
+    return len(entries)
+
+
+def journal_length(kb_path: str | Path) -> int:
+    return len(_read_journal(journal_path(kb_path)))
+
+
+def maybe_compact(kb_path: str | Path, threshold: int = COMPACT_AFTER,
+                  background: bool = True) -> Optional[threading.Thread]:
+    """Compact once the journal has more than *threshold* entries (in a thread by default)."""
+    if journal_length(kb_path) <= threshold:
+        return None
+    if not background:
+        compact(kb_path)
+        return None
+    thread = threading.Thread(target=compact, args=(kb_path,), name="kb-compaction")
+    thread.start()
+    return thread
+
+
+def fork_kb(src: str | Path, dest: str | Path) -> None:
+    """
+    Make *dest* a KB with the current state of *src*: hard-linked snapshot
+    (copied where links are unsupported) + a copy of the journal. Deltas
+    appended to *dest* afterwards never touch *src*.
+    """
+    src, dest = Path(src), Path(dest)
+    with WriterLock(src):                              # snapshot ve journal aynı andan
+        dest.unlink(missing_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy2(src, dest)
+        if journal_path(src).exists():
+            shutil.copy2(journal_path(src), journal_path(dest))
+        else:
+            journal_path(dest).unlink(missing_ok=True)
+
+
+def export_kb(src: str | Path, dest: str | Path) -> None:
+    """Write the current state of *src* (snapshot + journal) as a fresh snapshot at *dest*."""
+    dest = Path(dest)
+    _atomic_write_json(dest, load_kb(src))
+    journal_path(dest).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Inspect / compact the knowledge-base journal")
+    parser.add_argument("command", choices=["info", "compact"])
+    parser.add_argument("--kb", default="knowledge_base.json")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Folded {compact(args.kb)} entries")
+    else:
+        state = load_kb(args.kb)
+        print(f"journal_seq={state.get('journal_seq', 0)}  journal_entries={journal_length(args.kb)}  "
+              + "  ".join(f"{name}={len(state.get(name, []))}" for name in RULE_LISTS))
@@ -0,0 +1,384 @@
+# kb_sqlite.py – Embedded, indexed SQLite store for the knowledge base
+# --------------------------------------------------------------
+# • Same content as knowledge_base.json, normalised into two tables:
+#     rules(id, list, rule_key, cond_key, suggested_plant, feedback,
+#           confidence, lift, support, n_conditions, body)
+#     rule_conditions(rule_id, attribute, value)
+#   plus kb_meta(key, value) for meta_rules / frames (small, JSON-encoded)
+#   and the schema version (SCHEMA_VERSION under SCHEMA_VERSION_KEY)
+# • A DB without the current schema version (e.g. built before cond_key
+#   existed) is never queried or written: schema_current() lets callers fall
+#   back to the JSON KB, write_kb() / import_json() rebuild it
+# • Indexes on rule_conditions(attribute, value), rules(suggested_plant) and
+#   rules(list, cond_key) – cond_key is the canonical condition set. A rule
+#   matches a profile iff its condition set is a subset of the profile's
+#   pairs, so matching probes cond_key with every subset of the profile
+#   (2^9 = 512 for the questionnaire). Questionnaire values have very low
+#   cardinality: a hits == n_conditions count over rule_conditions touches
+#   most of the KB, the subset probe reads only the matching rules. Profiles
+#   wider than MAX_SUBSET_ATTRS fall back to the hit count
+# • Only matching rules are read – the KB never has to be loaded into memory
+#   for serving
+# • rules.id follows list order, so query results keep the JSON semantics
+#   (first exact match wins, stable ordering of equal scores)
+# • Writes go through apply_entries(): the kb_journal delta format
+#   (add / remove / update / replace) applied as upserts in ONE transaction;
+#   remove / update find the rule by its identity (list, cond_key, plant)
+#   through ix_rules_list_cond, update rewrites the row in place
+#
+#   Kullanım:
+#     python kb_sqlite.py import --kb knowledge_base.json --db knowledge_base.sqlite
+#     python kb_sqlite.py export --db knowledge_base.sqlite --kb kb_export.json
+#     python kb_sqlite.py info --db knowledge_base.sqlite
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from kb_journal import RULE_LISTS, rule_key
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DB_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+SCHEMA_VERSION = 2               # 2: rules.cond_key + ix_rules_list_cond
+SCHEMA_VERSION_KEY = "_schema_version"
+MAX_SUBSET_ATTRS = 12            # 2^12 = 4096 cond_key probes
+_PARAM_CHUNK = 500               # eski SQLite sürümlerinde 999 parametre sınırı
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    id              INTEGER PRIMARY KEY,
+    list            TEXT    NOT NULL,
+    rule_key        TEXT    NOT NULL,
+    cond_key        TEXT    NOT NULL,
+    suggested_plant TEXT,
+    feedback        INTEGER NOT NULL,
+    confidence      REAL    NOT NULL,
+    lift            REAL    NOT NULL,
+    support         REAL    NOT NULL,
+    n_conditions    INTEGER NOT NULL,
+    body            TEXT    NOT NULL,
+    UNIQUE (list, rule_key)
+);
+CREATE TABLE IF NOT EXISTS rule_conditions (
+    rule_id   INTEGER NOT NULL REFERENCES rules(id) ON DELETE CASCADE,
+    attribute TEXT    NOT NULL,
+    value     TEXT    NOT NULL,
+    PRIMARY KEY (rule_id, attribute)
+);
+CREATE INDEX IF NOT EXISTS ix_conditions_attr_value ON rule_conditions (attribute, value, rule_id);
+CREATE INDEX IF NOT EXISTS ix_rules_plant ON rules (suggested_plant);
+CREATE INDEX IF NOT EXISTS ix_rules_list_size ON rules (list, n_conditions);
+CREATE INDEX IF NOT EXISTS ix_rules_list_cond ON rules (list, cond_key);
+CREATE TABLE IF NOT EXISTS kb_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SchemaVersionError(RuntimeError):
+    """The DB was built by another kb_sqlite schema; rebuild it with import_json()."""
+
+
+def is_kb_db(path: str | Path) -> bool:
+    return Path(path).suffix.lower() in DB_SUFFIXES
+
+
+def _encode_value(value) -> str:
+    # kurallar ve profiller düz string taşır; başka tipler JSON olarak saklanır
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _cond_key(items: Sequence[str]) -> str:
+    """Canonical key of a condition set; *items* are _cond_item()s sorted by attribute."""
+    return "\x1e".join(items)
+
+
+def _cond_item(attr: str, value) -> str:
+    return f"{attr}\x1f{_encode_value(value)}"
+
+
+def schema_version(conn: sqlite3.Connection) -> Optional[int]:
+    """Schema version stored in kb_meta; None for an empty file or a DB built before versioning."""
+    try:
+        row = conn.execute("SELECT value FROM kb_meta WHERE key = ?", (SCHEMA_VERSION_KEY,)).fetchone()
+    except sqlite3.OperationalError:                 # kb_meta yok: boş dosya
+        return None
+    return int(json.loads(row[0])) if row else None
+
+
+def _check_schema(conn: sqlite3.Connection, db_path: str | Path) -> None:
+    found = schema_version(conn)
+    if found != SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"{db_path}: KB schema version {found}, expected {SCHEMA_VERSION} – "
+            f"rebuild it with `python kb_sqlite.py import`"
+        )
+
+
+def schema_current(db_path: str | Path) -> bool:
+    """True if *db_path* exists and was built with SCHEMA_VERSION."""
+    if not Path(db_path).exists():
+        return False
+    conn = connect(db_path, readonly=True, check_schema=False)
+    try:
+        return schema_version(conn) == SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def connect(db_path: str | Path, readonly: bool = False, check_schema: bool = True) -> sqlite3.Connection:
+    """
+    Open a KB DB. The schema version is checked (SchemaVersionError) unless
+    check_schema=False; a writable connection to a new file creates the schema.
+    """
+    if readonly:
+        conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(str(db_path))
+    try:
+        if not readonly and not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'rules'").fetchone():
+            conn.executescript(_SCHEMA)
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO kb_meta (key, value) VALUES (?, ?)",
+                             (SCHEMA_VERSION_KEY, json.dumps(SCHEMA_VERSION)))
+        if check_schema:
+            _check_schema(conn, db_path)
+    except BaseException:
+        conn.close()
+        raise
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+# --------------------------------------------------------------
+# Yazma
+# --------------------------------------------------------------
+def _rule_cond_key(rule: Dict) -> str:
+    return _cond_key([_cond_item(attr, val) for attr, val in sorted(rule.get("conditions", {}).items())])
+
+
+def _insert_rule(conn: sqlite3.Connection, name: str, rule: Dict) -> None:
+    cur = conn.execute(
+        """
+        INSERT INTO rules (list, rule_key, cond_key, suggested_plant, feedback, confidence, lift, support,
+                           n_conditions, body)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (list, rule_key) DO NOTHING
+        """,
+        (
+            name,
+            rule_key(rule),
+            _rule_cond_key(rule),
+            rule.get("suggested_plant"),
+            int(rule.get("feedback", 1)),
+            float(rule.get("confidence", 1.0)),
+            float(rule.get("lift", 1.0)),
+            float(rule.get("support", 0.0)),
+            len(rule.get("conditions", {})),
+            json.dumps(rule, ensure_ascii=False),
+        ),
+    )
+    if cur.rowcount:
+        conn.executemany(
+            "INSERT INTO rule_conditions (rule_id, attribute, value) VALUES (?, ?, ?)",
+            [(cur.lastrowid, attr, _encode_value(val)) for attr, val in rule.get("conditions", {}).items()],
+        )
+
+
+def _update_rule(conn: sqlite3.Connection, name: str, rule: Dict) -> None:
+    """Same conditions + plant, new statistics: rewrite the row in place (id and conditions stay)."""
+    conn.execute(
+        """
+        UPDATE rules SET rule_key = ?, feedback = ?, confidence = ?, lift = ?, support = ?, body = ?
+        WHERE list = ? AND cond_key = ? AND suggested_plant IS ?
+        """,
+        (
+            rule_key(rule),
+            int(rule.get("feedback", 1)),
+            float(rule.get("confidence", 1.0)),
+            float(rule.get("lift", 1.0)),
+            float(rule.get("support", 0.0)),
+            json.dumps(rule, ensure_ascii=False),
+            name,
+            _rule_cond_key(rule),
+            rule.get("suggested_plant"),
+        ),
+    )
+
+
+def _write_meta(conn: sqlite3.Connection, kb: Dict) -> None:
+    for key, value in kb.items():
+        if key not in RULE_LISTS and key != "journal_seq":
+            conn.execute("INSERT OR REPLACE INTO kb_meta (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value, ensure_ascii=False)))
+
+
+def apply_entries(db_path: str | Path, entries: Iterable[Dict]) -> int:
+    """Apply kb_journal deltas (add / remove / update / replace) in a single transaction."""
+    conn = connect(db_path)
+    n = 0
+    try:
+        with conn:                                   # commit ya da tamamen rollback
+            for entry in entries:
+                name = entry["list"]
+                if entry["op"] == "add":
+                    _insert_rule(conn, name, entry["rule"])
+                elif entry["op"] == "remove":
+                    conn.execute("DELETE FROM rules WHERE list = ? AND cond_key = ? AND suggested_plant IS ?",
+                                 (name, _rule_cond_key(entry["rule"]), entry["rule"].get("suggested_plant")))
+                elif entry["op"] == "update":
+                    _update_rule(conn, name, entry["rule"])
+                elif entry["op"] == "replace":
+                    conn.execute("DELETE FROM rules WHERE list = ?", (name,))
+                    for rule in entry["rules"]:
+                        _insert_rule(conn, name, rule)
+                n += 1
+    finally:
+        conn.close()
+    return n
+
+
+def write_kb(kb: Dict, db_path: str | Path) -> Path:
+    """Build a fresh DB (current schema) from a KB dict; atomically replaces *db_path*."""
+    db_path = Path(db_path)
+    tmp = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    conn = connect(tmp)
+    try:
+        with conn:
+            for name in RULE_LISTS:
+                for rule in kb.get(name, []):
+                    _insert_rule(conn, name, rule)
+            _write_meta(conn, kb)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp, db_path)
+    logger.info("KB written → %s (%s)", db_path,
+                ", ".join(f"{len(kb.get(name, []))} {name}" for name in RULE_LISTS))
+    return db_path
+
+
+def import_json(kb_path: str | Path, db_path: str | Path) -> Path:
+    """Build a fresh DB from a JSON KB (snapshot + journal); atomically replaces *db_path*."""
+    from kb_journal import load_kb
+
+    return write_kb(load_kb(kb_path), db_path)
+
+
+# --------------------------------------------------------------
+# Okuma
+# --------------------------------------------------------------
+def load_kb(db_path: str | Path) -> Dict:
+    """
+    Whole KB as the JSON dict (rule lists in list order) – for offline tools.
+    Only reads rules.body, so it also works on DBs of an older schema.
+    """
+    conn = connect(db_path, readonly=True, check_schema=False)
+    try:
+        kb: Dict = {name: [] for name in RULE_LISTS}
+        for name, body in conn.execute("SELECT list, body FROM rules ORDER BY id"):
+            kb.setdefault(name, []).append(json.loads(body))
+        kb.update(load_meta(conn))
+    finally:
+        conn.close()
+    return kb
+
+
+def load_meta(conn: sqlite3.Connection) -> Dict:
+    return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM kb_meta")
+            if key != SCHEMA_VERSION_KEY}
+
+
+def rule_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    counts = {name: 0 for name in RULE_LISTS}
+    counts.update(conn.execute("SELECT list, COUNT(*) FROM rules GROUP BY list"))
+    return counts
+
+
+def match_rules(
+    conn: sqlite3.Connection,
+    user_input: Dict[str, str],
+    list_name: str = "positive_rules",
+    exact: bool = False,
+    limit: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Rules of *list_name* whose conditions are all satisfied by *user_input*
+    (exact=True: conditions equal the profile), in list order.
+    """
+    pairs = [(attr, _encode_value(val)) for attr, val in user_input.items()]
+    if exact or len(pairs) <= MAX_SUBSET_ATTRS:
+        items = [_cond_item(attr, val) for attr, val in sorted(user_input.items())]
+        sizes = [len(items)] if exact else range(len(items) + 1)
+        keys = [_cond_key(subset) for size in sizes for subset in combinations(items, size)]
+        rows: List[Tuple[int, str]] = []
+        for start in range(0, len(keys), _PARAM_CHUNK):
+            chunk = keys[start:start + _PARAM_CHUNK]
+            rows += conn.execute(
+                f"SELECT id, body FROM rules WHERE list = ? AND cond_key IN ({','.join('?' * len(chunk))})",
+                [list_name, *chunk],
+            ).fetchall()
+        rows.sort()
+        return [json.loads(body) for _, body in rows[:limit]]
+
+    size_filter = "AND r.n_conditions = ?" if exact else ""
+    params: List = []
+    branches = []
+    if pairs:
+        hit = " OR ".join("(c.attribute = ? AND c.value = ?)" for _ in pairs)
+        branches.append(f"""
+            SELECT r.id, r.body FROM rules r
+            JOIN (SELECT c.rule_id, COUNT(*) AS hits FROM rule_conditions c
+                  WHERE {hit} GROUP BY c.rule_id) m ON m.rule_id = r.id
+            WHERE r.list = ? AND m.hits = r.n_conditions {size_filter}
+        """)
+        params += [v for pair in pairs for v in pair] + [list_name]
+        if exact:
+            params.append(len(pairs))
+    if not exact or not pairs:
+        # koşulsuz kurallar her profille eşleşir
+        branches.append("SELECT r.id, r.body FROM rules r WHERE r.list = ? AND r.n_conditions = 0")
+        params.append(list_name)
+    sql = " UNION ALL ".join(branches) + " ORDER BY 1"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return [json.loads(body) for _, body in conn.execute(sql, params)]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="SQLite knowledge-base store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_imp = sub.add_parser("import")
+    p_imp.add_argument("--kb", default="knowledge_base.json")
+    p_imp.add_argument("--db", default="knowledge_base.sqlite")
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("--db", default="knowledge_base.sqlite")
+    p_exp.add_argument("--kb", required=True)
+    p_info = sub.add_parser("info")
+    p_info.add_argument("--db", default="knowledge_base.sqlite")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_json(args.kb, args.db)
+    elif args.command == "export":
+        with open(args.kb, "w", encoding="utf-8") as f:
+            json.dump(load_kb(args.db), f, indent=2, ensure_ascii=False)
+    else:
+        connection = connect(args.db, readonly=True, check_schema=False)
+        print({"schema_version": schema_version(connection), **rule_counts(connection)})
+        connection.close()
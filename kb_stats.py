@@ -0,0 +1,201 @@
+# kb_stats.py – Small statistics sidecar next to the knowledge base
+# --------------------------------------------------------------
+# • <kb>.stats.json holds, per rule list (positive_rules / negative_rules):
+#     rules, plants {plant: n}, attributes {attr: n}, sizes {n_conditions: n},
+#     confidence_hist / lift_hist (fixed bins, see *_BINS), no_stats
+# • update_knowledge_base() feeds it the same add / remove / update / replace deltas
+#   it writes to the KB, so the sidecar is maintained incrementally (O(delta))
+#   instead of being recomputed from the whole KB
+# • A missing or stale sidecar (journal_seq / rule counts do not match the
+#   KB state the merge started from) is rebuilt once from that in-memory state
+# • Readers (bar_chart.py, dashboards) only open this file
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from kb_journal import RULE_LISTS, rule_id
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STATS_VERSION = 1
+CONFIDENCE_BINS = [i / 10 for i in range(11)]                  # 0.0 … 1.0
+LIFT_BINS = [0.0, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0, 50.0]   # son kutu: ≥ 50
+
+
+def stats_path(kb_path: str | Path) -> Path:
+    kb_path = Path(kb_path)
+    return kb_path.with_name(kb_path.name + ".stats.json")
+
+
+def empty_stats() -> Dict:
+    return {
+        "version": STATS_VERSION,
+        "journal_seq": None,
+        "updated_at": None,
+        "confidence_bins": CONFIDENCE_BINS,
+        "lift_bins": LIFT_BINS,
+        "lists": {
+            name: {
+                "rules": 0,
+                "plants": {},
+                "attributes": {},
+                "sizes": {},
+                "confidence_hist": [0] * (len(CONFIDENCE_BINS) - 1),
+                "lift_hist": [0] * len(LIFT_BINS),
+                "no_stats": 0,
+            }
+            for name in RULE_LISTS
+        },
+    }
+
+
+def _bump(counter: Dict[str, int], key: str, sign: int) -> None:
+    value = counter.get(key, 0) + sign
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def add_rule(stats: Dict, list_name: str, rule: Dict, sign: int = 1) -> None:
+    """Count (*sign* = 1) or uncount (*sign* = -1) one rule."""
+    part = stats["lists"][list_name]
+    part["rules"] += sign
+    _bump(part["plants"], str(rule.get("suggested_plant")), sign)
+    conditions = rule.get("conditions", {})
+    for attr in conditions:
+        _bump(part["attributes"], attr, sign)
+    _bump(part["sizes"], str(len(conditions)), sign)
+    if "confidence" not in rule:
+        part["no_stats"] += sign
+        return
+    conf_bin = min(max(bisect_right(CONFIDENCE_BINS, float(rule["confidence"])) - 1, 0), len(CONFIDENCE_BINS) - 2)
+    part["confidence_hist"][conf_bin] += sign
+    lift_bin = max(bisect_right(LIFT_BINS, float(rule.get("lift", 1.0))) - 1, 0)
+    part["lift_hist"][lift_bin] += sign
+
+
+def compute_stats(kb: Dict) -> Dict:
+    """Full recount – only for bootstrapping a missing / stale sidecar."""
+    stats = empty_stats()
+    for name in RULE_LISTS:
+        for rule in kb.get(name, []):
+            add_rule(stats, name, rule)
+    stats["journal_seq"] = kb.get("journal_seq")
+    return stats
+
+
+def apply_entries(stats: Dict, entries: Iterable[Dict], old_lists: Dict[str, List[Dict]]) -> Dict:
+    """Apply kb_journal deltas; *old_lists* is only needed for "update" (the rule it replaces) and "replace"."""
+    old_by_id: Dict[str, Dict[str, Dict]] = {}
+    for entry in entries:
+        name = entry["list"]
+        if entry["op"] == "add":
+            add_rule(stats, name, entry["rule"])
+        elif entry["op"] == "remove":
+            add_rule(stats, name, entry["rule"], sign=-1)
+        elif entry["op"] == "update":
+            if name not in old_by_id:
+                old_by_id[name] = {rule_id(r): r for r in old_lists.get(name, [])}
+            old_rule = old_by_id[name].get(rule_id(entry["rule"]))
+            if old_rule is not None:
+                add_rule(stats, name, old_rule, sign=-1)
+                add_rule(stats, name, entry["rule"])
+        elif entry["op"] == "replace":
+            for rule in old_lists.get(name, []):
+                add_rule(stats, name, rule, sign=-1)
+            for rule in entry["rules"]:
+                add_rule(stats, name, rule)
+    return stats
+
+
+def load_stats(kb_path: str | Path) -> Optional[Dict]:
+    try:
+        with stats_path(kb_path).open("r", encoding="utf-8") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return stats if stats.get("version") == STATS_VERSION else None
+
+
+def _is_current(stats: Optional[Dict], kb: Dict) -> bool:
+    if stats is None:
+        return False
+    if kb.get("journal_seq") is not None and stats.get("journal_seq") != kb.get("journal_seq"):
+        return False
+    return all(stats["lists"][name]["rules"] == len(kb.get(name, [])) for name in RULE_LISTS)
+
+
+def save_stats(kb_path: str | Path, stats: Dict) -> None:
+    path = stats_path(kb_path)
+    stats["updated_at"] = time.time()
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(stats, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def update_stats(
+    kb_path: str | Path,
+    old_kb: Dict,
+    entries: List[Dict],
+    journal_seq: Optional[int] = None,
+) -> Dict:
+    """Bring the sidecar from *old_kb* (state the merge started from) to after *entries*."""
+    stats = load_stats(kb_path)
+    if not _is_current(stats, old_kb):
+        logger.info("KB stats sidecar missing or stale – rebuilding from the KB")
+        stats = compute_stats(old_kb)
+    apply_entries(stats, entries, old_kb)
+    stats["journal_seq"] = journal_seq
+    save_stats(kb_path, stats)
+    return stats
+
+
+def read_stats(kb_path: str | Path = "knowledge_base.json") -> Dict:
+    """Sidecar for reporting; created from the KB once if it does not exist yet."""
+    stats = load_stats(kb_path)
+    if stats is None:
+        from kb_sqlite import is_kb_db, load_kb as load_db
+
+        if is_kb_db(kb_path):
+            kb = load_db(kb_path)
+        else:
+            from kb_journal import load_kb
+
+            kb = load_kb(kb_path)
+        stats = compute_stats(kb)
+        save_stats(kb_path, stats)
+    return stats
+
+
+def plant_counts(stats: Dict) -> Dict[str, int]:
+    """Rules per plant over both lists."""
+    total: Dict[str, int] = {}
+    for part in stats["lists"].values():
+        for plant, n in part["plants"].items():
+            total[plant] = total.get(plant, 0) + n
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Show / rebuild the KB statistics sidecar")
+    parser.add_argument("command", choices=["show", "rebuild"])
+    parser.add_argument("--kb", default="knowledge_base.json")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        stats_path(args.kb).unlink(missing_ok=True)
+    print(json.dumps(read_stats(args.kb)["lists"], indent=2, ensure_ascii=False))
@@ -3,6 +3,23 @@
 # • Reads freshly parsed rules (JSON) that include a `feedback` flag
 # • Normalises condition keys/values so they match UI / RuleEngine schema
 # • Merges the rules into knowledge_base.json → positive_rules / negative_rules
+# • Only the added / removed rules are written, as one batch appended to the
+#   KB journal (kb_journal); the snapshot is rewritten atomically by
+#   compaction, never in place
+# • A *.sqlite KB (kb_sqlite) gets the same deltas as upserts in one
+#   transaction; a DB of an older kb_sqlite schema is rebuilt instead
+# • Subsumption pruning: a rule is dropped when a rule for the same plant
+#   (same polarity) has a strict subset of its conditions and at least its
+#   confidence and lift – the general rule fires on every profile the
+#   specific one does and ranks no lower among partial matches. Rules
+#   without mined statistics are never pruned, and neither are positive
+#   rules over the whole questionnaire: RuleEngine returns such a rule alone
+#   on an exact profile match (kb.exact_rule), which no general rule replaces
+# • Rules already in the KB get their support / confidence / lift refreshed
+#   from the newly mined rule, so pruning never compares stale statistics
+# • The same deltas update the statistics sidecar (kb_stats) incrementally
+# • The whole merge (load → diff → write) runs under the kb_journal writer
+#   lock, so concurrent merges are serialised instead of losing updates
 # • Designed so that `pytest` tests (e.g. test_update_kb_rules_split) pass by
 #   exposing *update_knowledge_base(parsed_path, kb_path)*
 # --------------------------------------------------------------
@@ -11,8 +28,13 @@ from __future__ import annotations
 
 import json
 import logging
+from itertools import combinations
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
+
+import kb_sqlite
+from kb_stats import update_stats
+from kb_journal import WriterLock, append_entries, compact as compact_kb, diff_entries, load_kb, maybe_compact
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -84,12 +106,66 @@ def _normalise_conditions(raw: Dict[str, List[str] | str]) -> Dict[str, str]:
     return norm
 
 
+RULE_STATS = ("support", "confidence", "lift")
+# app.render_preference_form alanları – hepsini koşul alan kural tam eşleşme olabilir
+PROFILE_ATTRS = frozenset({
+    "area_size", "sunlight_need", "environment_type", "climate_type", "watering_frequency",
+    "fertilizer_frequency", "pesticide_frequency", "has_pet", "has_child",
+})
+
+
+def _cond_items(rule: dict) -> tuple:
+    return tuple(sorted(
+        (k, tuple(v) if isinstance(v, list) else v) for k, v in rule["conditions"].items()
+    ))
+
+
+def _exact_match_rule(rule: dict) -> bool:
+    return PROFILE_ATTRS <= rule["conditions"].keys()
+
+
+def prune_subsumed(rules: List[dict], keep_exact: bool = False) -> Tuple[List[dict], int]:
+    """
+    Drop rules dominated by a more general rule for the same plant.
+
+    The index maps (plant, condition set) → best (confidence, lift); each
+    rule probes it with the proper subsets of its own conditions, so the
+    cost is 2^k lookups per rule (k = number of conditions, small).
+    keep_exact=True never drops rules that can be exact profile matches.
+    """
+    index: Dict[tuple, Tuple[float, float]] = {}
+    for rule in rules:
+        if "confidence" not in rule:
+            continue
+        key = (rule["suggested_plant"], frozenset(_cond_items(rule)))
+        score = (rule["confidence"], rule.get("lift", 1.0))
+        best = index.get(key)
+        index[key] = score if best is None else (max(best[0], score[0]), max(best[1], score[1]))
+
+    kept: List[dict] = []
+    for rule in rules:
+        items = _cond_items(rule)
+        dominated = False
+        if "confidence" in rule and not (keep_exact and _exact_match_rule(rule)):
+            conf, lift = rule["confidence"], rule.get("lift", 1.0)
+            for size in range(len(items)):
+                for subset in combinations(items, size):
+                    best = index.get((rule["suggested_plant"], frozenset(subset)))
+                    if best is not None and best[0] >= conf and best[1] >= lift:
+                        dominated = True
+                        break
+                if dominated:
+                    break
+        if not dominated:
+            kept.append(rule)
+    return kept, len(rules) - len(kept)
+
 
 # --------------------------------------------------------------
 #  Public API – used by tests & CLI
 # --------------------------------------------------------------
 
-def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
+def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path, compact: bool | None = None) -> Dict[str, int]:
     """
     Merge parsed rules into knowledge_base.json after normalising keys/values.
 
@@ -99,17 +175,30 @@ def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
         Path to JSON file produced by rule parser / learning engine. Expected format:
         [{"conditions": {...}, "suggested_plant": "...", "feedback": 1}, ...]
     kb_path : str | Path
-        Existing knowledge_base.json. Will be overwritten in-place after merge.
+        Existing knowledge_base.json. The merge is recorded as deltas in its journal
+        (or upserted in one transaction when the path is a *.sqlite KB).
+    compact : bool | None
+        True → fold the journal into the snapshot now; None → background
+        compaction once the journal is long; False → never.
+
+    Returns counts of added, pruned (subsumed) and final rules.
+
+    The KB writer lock is held from reading the KB to writing the deltas, so
+    concurrent merges never diff against a state the other one replaced.
     """
-    parsed_path = Path(parsed_path)
+    with Path(parsed_path).open("r", encoding="utf-8") as f:
+        parsed_rules = json.load(f)
+
     kb_path = Path(kb_path)
+    with WriterLock(kb_path):
+        return _merge(parsed_rules, kb_path, compact)
 
-    # --- JSON dosyalarını oku ------------------------------------------------
-    with parsed_path.open("r", encoding="utf-8") as f:
-        parsed_rules = json.load(f)
 
-    with kb_path.open("r", encoding="utf-8") as f:
-        kb = json.load(f)
+def _merge(parsed_rules: List[Dict], kb_path: Path, compact: bool | None) -> Dict[str, int]:
+    """update_knowledge_base() under the writer lock."""
+    use_db = kb_sqlite.is_kb_db(kb_path)
+    kb = kb_sqlite.load_kb(kb_path) if use_db else load_kb(kb_path)   # snapshot + journal
+    old_lists = {name: list(kb.get(name, [])) for name in ("positive_rules", "negative_rules")}
 
     # --- Hedef listelerin varlığını garanti et ------------------------------
     kb.setdefault("positive_rules", [])
@@ -127,10 +216,12 @@ def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
 
         return (cond, r["suggested_plant"])
 
-    existing_pos = {rule_hash(r) for r in kb["positive_rules"]}
-    existing_neg = {rule_hash(r) for r in kb["negative_rules"]}
+    existing = {
+        name: {rule_hash(r): i for i, r in enumerate(kb[name])}
+        for name in ("positive_rules", "negative_rules")
+    }
 
-    added_pos = added_neg = 0
+    added_pos = added_neg = refreshed = 0
 
     # --- Yeni kuralları ekle -------------------------------------------------
     for raw in parsed_rules:
@@ -143,19 +234,27 @@ def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
             "suggested_plant": plant,
             "feedback": feedback,
         }
+        rule_dict.update({stat: float(raw[stat]) for stat in RULE_STATS if stat in raw})
         rule_id = rule_hash(rule_dict)
+        name = "positive_rules" if feedback == 1 else "negative_rules"
+        rules, index = kb[name], existing[name]
 
-        if feedback == 1:                            # --- pozitif kural
-            if rule_id not in existing_pos:
-                kb["positive_rules"].append(rule_dict)
-                existing_pos.add(rule_id)
+        if rule_id not in index:
+            index[rule_id] = len(rules)
+            rules.append(rule_dict)
+            if feedback == 1:
                 added_pos += 1
-        else:                                        # --- negatif kural
-            if rule_id not in existing_neg:
-                kb["negative_rules"].append(rule_dict)
-                existing_neg.add(rule_id)
+            else:
                 added_neg += 1
-        def cond_key(rule): return tuple(sorted(rule["conditions"].items()))
+        else:
+            # --- mevcut kural: yeni madencilik istatistiklerini yerinde güncelle
+            stats = {stat: rule_dict[stat] for stat in RULE_STATS if stat in rule_dict}
+            current = rules[index[rule_id]]
+            if any(current.get(stat) != value for stat, value in stats.items()):
+                rules[index[rule_id]] = {**current, **stats}
+                refreshed += 1
+
+    def cond_key(rule): return tuple(sorted(rule["conditions"].items()))
     pos_map = {cond_key(r): r for r in kb["positive_rules"]}
     neg_map = {cond_key(r): r for r in kb["negative_rules"]}
     conflicts = set(pos_map.keys()) & set(neg_map.keys())
@@ -168,9 +267,13 @@ def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
         else:
             del pos_map[key]
 
+    # --- Subsumption: genel kural aynı bitki için özel kuralı kapsıyorsa özel olanı at
+    positive, pruned_pos = prune_subsumed(list(pos_map.values()), keep_exact=True)
+    negative, pruned_neg = prune_subsumed(list(neg_map.values()))
+
     seen_plants = set()
     unique_positive = []
-    for rule in pos_map.values():
+    for rule in positive:
         plant = rule["suggested_plant"]
         if plant not in seen_plants:
             unique_positive.append(rule)
@@ -178,18 +281,42 @@ def update_knowledge_base(parsed_path: str | Path, kb_path: str | Path) -> None:
     kb["positive_rules"] = unique_positive
 
     # --- Negatifler isteğe bağlı olarak sadeleştirilebilir
-    kb["negative_rules"] = list(neg_map.values())
-    # --- Dosyaya yaz ---------------------------------------------------------
-    with kb_path.open("w", encoding="utf-8") as f:
-        json.dump(kb, f, indent=2, ensure_ascii=False)
+    kb["negative_rules"] = negative
+    # --- Yalnızca değişiklikleri journal'a yaz --------------------------------
+    entries = diff_entries(old_lists, kb)
+    journal_seq = None
+    if use_db and kb_sqlite.schema_current(kb_path):
+        kb_sqlite.apply_entries(kb_path, entries)
+    elif use_db:
+        kb_sqlite.write_kb(kb, kb_path)
+    else:
+        journal_seq = append_entries(kb_path, entries)
+        if compact:
+            compact_kb(kb_path)
+        elif compact is None:
+            maybe_compact(kb_path)
+    update_stats(kb_path, {**old_lists, "journal_seq": kb.get("journal_seq")}, entries, journal_seq)
 
     logger.info(
-        "KB updated → +%d positive, +%d negative (total: %d pos, %d neg)",
+        "KB updated → +%d positive, +%d negative, %d refreshed, pruned %d positive + %d negative subsumed (total: %d pos, %d neg, %d journal entries)",
         added_pos,
         added_neg,
+        refreshed,
+        pruned_pos,
+        pruned_neg,
         len(kb['positive_rules']),
         len(kb['negative_rules']),
+        len(entries),
     )
+    return {
+        "added_positive": added_pos,
+        "added_negative": added_neg,
+        "refreshed": refreshed,
+        "pruned_positive": pruned_pos,
+        "pruned_negative": pruned_neg,
+        "positive_rules": len(kb["positive_rules"]),
+        "negative_rules": len(kb["negative_rules"]),
+    }
 
 
 # --------------------------------------------------------------
@@ -1,13 +1,21 @@
 # learning_engine.py
 import os
 import logging
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
 import joblib
+import numpy as np
 import pandas as pd
 import pyodbc
+from scipy import sparse
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 import json
  
+import xgboost as xgb
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
@@ -36,13 +44,26 @@ def sql_connect():
 # Data Loading
 # --------------------------------------------------------------
 
-def fetch_feedback_data():
+TRAIN_COLUMNS = [
+    "area_size", "sunlight_need", "environment_type", "climate_type",
+    "watering_frequency", "fertilizer_frequency", "pesticide_frequency",
+    "has_pet", "has_child", "suggested_plant", "user_feedback",
+]
+
+
+def fetch_feedback_data(snapshot: str | None = None, since_id: int = 0):
     """
-    Fetch all feedback records with user inputs and chosen plant.
+    Fetch feedback records (id > *since_id*) with user inputs and chosen plant.
+    If *snapshot* is given, read the local Parquet snapshot instead of ODBC.
     """
+    if snapshot:
+        from feedback_store import read_feedback_snapshot
+        return read_feedback_snapshot(snapshot, columns=["id"] + TRAIN_COLUMNS, min_id=since_id)
+
     conn = sql_connect()
     query = '''
     SELECT
+        id,
         area_size,
         sunlight_need,
         environment_type,
@@ -55,8 +76,9 @@ def fetch_feedback_data():
         suggested_plant,
         user_feedback
     FROM Feedback
+    WHERE id > ?
     '''
-    df = pd.read_sql(query, conn)
+    df = pd.read_sql(query, conn, params=[since_id])
     conn.close()
     logging.info(f"Fetched {len(df)} feedback records.")
     return df
@@ -88,87 +110,492 @@ def save_confusion_matrix(y_true, y_pred, filename="confusion_matrix.png"):
     plt.savefig(filename)
     logging.info(f" Confusion matrix saved to {filename}")
 
-def main():
-   
-
-    # 1. Model klasörü oluştur
-    os.makedirs("models", exist_ok=True)
-
-    # 2. Geri bildirim verisini yükle
-    df = fetch_feedback_data()
-    logging.info(f" {len(df)} feedback records loaded.")
-
-    # 3. Özellikleri ve hedef sütunu ayır
-    X_raw, y = preprocess_data(df)
-
-    # 4. OneHotEncoder + ColumnTransformer ile encode et
-    categorical_cols = [
+# --------------------------------------------------------------
+# Model config
+# --------------------------------------------------------------
+CATEGORICAL_COLS = [
     "area_size", "sunlight_need", "environment_type", "climate_type",
     "watering_frequency", "fertilizer_frequency", "pesticide_frequency",
     "has_pet", "has_child"
 ]
 
+XGB_PARAMS = dict(
+    n_estimators=300,         # Daha fazla ağaç → daha iyi öğrenme
+    learning_rate=0.05,       # Daha yavaş ama daha hassas öğrenme
+    max_depth=4,              # Derinlik sınırlaması ile overfit azaltılır
+    subsample=0.8,            # Overfit’i azaltmak için örnekleme
+    colsample_bytree=0.8,     # Aynı şekilde feature sampling
+    random_state=42,
+)
+DECISION_THRESHOLD = 0.45
+
+# Training backend: threads per booster (0 → all cores)
+NTHREAD = 0
+
+# tune_feedback_model.py writes the best CV config here; main() picks it up
+TUNED_PARAMS_PATH = "models/best_params.json"
 
-    column_transformer = ColumnTransformer(
+# Streaming mode: rows per chunk and the id-based hold-out share
+STREAM_CHUNKSIZE = 50_000
+STREAM_TEST_PERCENT = 30
+
+# Incremental mode: trees added per warm start and the full-rebuild schedule
+INCREMENTAL_ROUNDS = 20
+FULL_REBUILD_EVERY = 10       # incremental runs between full rebuilds
+FULL_REBUILD_DAYS = 7.0
+TRAIN_STATE_FILE = "train_state.json"
+
+
+def build_column_transformer(sparse_threshold: float = 0.3) -> ColumnTransformer:
+    return ColumnTransformer(
         transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols)
-        ]
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_COLS)
+        ],
+        sparse_threshold=sparse_threshold,
     )
-    X_encoded = column_transformer.fit_transform(X_raw)
 
-    # 5. Eğitim/test ayrımı
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_encoded, y, test_size=0.3, random_state=42, stratify=y
-    )
-    
-    negative_count = sum(y_train == 0)
-    positive_count = sum(y_train == 1)
-    scale_ratio = negative_count / positive_count
 
-    # 6. Model eğitimi (XGBoost)
-    model = XGBClassifier(
-                    n_estimators=300,         # Daha fazla ağaç → daha iyi öğrenme
-                    learning_rate=0.05,       # Daha yavaş ama daha hassas öğrenme
-                    max_depth=4,              # Derinlik sınırlaması ile overfit azaltılır
-                    subsample=0.8,            # Overfit’i azaltmak için örnekleme
-                    colsample_bytree=0.8,     # Aynı şekilde feature sampling
-                    scale_pos_weight=scale_ratio,
+class StageTimer:
+    """Collects wall-clock seconds per named training stage."""
 
-                    random_state=42
-                )
+    def __init__(self) -> None:
+        self.stages: dict = {}
 
-    model.fit(X_train, y_train)
-    logging.info(" Model training completed.")
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0.0) + time.perf_counter() - t0, 4)
 
-    # 7. Tahmin ve değerlendirme
-    y_pred = model.predict(X_test)
-    y_proba = model.predict_proba(X_test)[:, 1]
-    y_pred = (y_proba >= 0.45).astype(int)
+    def save(self, output_dir: str) -> None:
+        logging.info(" Stage timings (s): " + ", ".join(f"{k}={v:.3f}" for k, v in self.stages.items()))
+        with open(os.path.join(output_dir, "timings.json"), "w", encoding="utf-8") as f:
+            json.dump(self.stages, f, indent=2)
+
+
+def _resolve_nthread(nthread: int) -> int:
+    return nthread if nthread > 0 else (os.cpu_count() or 1)
+
+
+def train_sparse_booster(X_train, y_train, xgb_params: dict, scale_pos_weight: float,
+                         nthread: int = NTHREAD, timer: StageTimer | None = None) -> xgb.Booster:
+    """
+    Train a `hist` booster on a QuantileDMatrix built straight from CSR one-hot data.
+
+    Dense input is rejected: with hundreds of plant/profile categories a
+    densified matrix costs rows × columns instead of rows × 9 non-zeros.
+    """
+    if not sparse.issparse(X_train):
+        raise TypeError(f"Expected a sparse one-hot matrix, got {type(X_train).__name__}")
+    timer = timer or StageTimer()
+    nthread = _resolve_nthread(nthread)
+    X_train = X_train.tocsr()
+    logging.info(" Train matrix: %d × %d, nnz=%d (density %.4f), nthread=%d",
+                 X_train.shape[0], X_train.shape[1], X_train.nnz,
+                 X_train.nnz / max(X_train.shape[0] * X_train.shape[1], 1), nthread)
+
+    with timer.stage("dmatrix"):
+        dtrain = xgb.QuantileDMatrix(X_train, label=np.asarray(y_train), nthread=nthread)
+    params = native_params(scale_pos_weight, xgb_params)
+    params["nthread"] = nthread
+    with timer.stage("train"):
+        booster = xgb.train(params, dtrain, num_boost_round=xgb_params["n_estimators"])
+    return booster
+
+
+def load_model_config(params_path: str | None = TUNED_PARAMS_PATH) -> tuple[dict, float]:
+    """Return (XGB params, decision threshold), tuned values overriding the defaults."""
+    params, threshold = dict(XGB_PARAMS), DECISION_THRESHOLD
+    if params_path and os.path.exists(params_path):
+        with open(params_path, "r", encoding="utf-8") as f:
+            tuned = json.load(f)
+        params.update(tuned.get("params", {}))
+        threshold = tuned.get("threshold", threshold)
+        logging.info(f" Using tuned params from '{params_path}' (threshold={threshold}).")
+    return params, threshold
+
+
+def native_params(scale_pos_weight: float, params: dict = XGB_PARAMS) -> dict:
+    """XGBClassifier-style params translated for xgb.train (streaming / incremental / tuning)."""
+    renamed = {"learning_rate": "eta", "random_state": "seed"}
+    native = {"objective": "binary:logistic", "tree_method": "hist", "scale_pos_weight": scale_pos_weight}
+    for key, value in params.items():
+        if key != "n_estimators":
+            native[renamed.get(key, key)] = value
+    return native
+
+
+def booster_to_classifier(booster: xgb.Booster) -> XGBClassifier:
+    """Wrap a native booster so app.py can keep calling predict_proba."""
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+def load_train_state(model_dir: str) -> dict | None:
+    try:
+        with open(os.path.join(model_dir, TRAIN_STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_train_state(output_dir: str, watermark: int, mode: str, previous: dict | None = None) -> None:
+    """Record the training row watermark and the rebuild schedule next to the model."""
+    now = time.time()
+    state = {
+        "mode": mode,
+        "watermark": int(watermark),
+        "trained_at": now,
+        "full_rebuild_at": now if mode == "full" else previous["full_rebuild_at"],
+        "incremental_runs": 0 if mode == "full" else previous["incremental_runs"] + 1,
+    }
+    with open(os.path.join(output_dir, TRAIN_STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def save_report(y_test, y_pred, output_dir: str = "models", report_dir: str = ".") -> None:
     report_text = classification_report(y_test, y_pred)
     logging.info(" Classification report:\n" + report_text)
 
+    # Confusion matrix görseli oluştur
+    save_confusion_matrix(y_test, y_pred, os.path.join(report_dir, "confusion_matrix.png"))
 
-    # 8. Confusion matrix görseli oluştur
-    save_confusion_matrix(y_test, y_pred)
-
-    # 9. Rapor dosyasına yaz
-    with open("last_feedback_model_report.txt", "w", encoding="utf-8") as f:
+    # Rapor dosyasına yaz
+    report_path = os.path.join(report_dir, "last_feedback_model_report.txt")
+    with open(report_path, "w", encoding="utf-8") as f:
         f.write(report_text)
-    logging.info(" Report saved to 'last_feedback_model_report.txt'")
+    logging.info(f" Report saved to '{report_path}'")
+
+    # Metrikler (model registry manifest'i için)
+    with open(os.path.join(output_dir, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(classification_report(y_test, y_pred, output_dict=True), f, indent=2)
+
+
+def save_outputs(model, column_transformer, y_test, y_pred, output_dir: str = "models", report_dir: str = "."):
+    """Write report, confusion matrix, model, encoder and feature names (no report for an empty hold-out)."""
+    os.makedirs(output_dir, exist_ok=True)
+    if len(y_test):
+        save_report(y_test, y_pred, output_dir, report_dir)
+    else:
+        logging.warning(" Hold-out set is empty – classification report and metrics.json skipped.")
 
-    # 10. Modeli ve encode ediciyi kaydet
-    joblib.dump(model, "models/feedback_model.pkl")
-    joblib.dump(column_transformer, "models/feedback_vec.pkl")
-    logging.info(" Model saved to 'models/feedback_model.pkl'")
-    logging.info(" Features saved to 'models/feedback_vec.pkl'")
+    # Modeli ve encode ediciyi kaydet (+ hızlı yükleme için native UBJSON booster)
+    model_path = os.path.join(output_dir, "feedback_model.pkl")
+    vec_path = os.path.join(output_dir, "feedback_vec.pkl")
+    joblib.dump(model, model_path)
+    model.save_model(os.path.join(output_dir, "feedback_model.ubj"))
+    joblib.dump(column_transformer, vec_path)
+    logging.info(f" Model saved to '{model_path}'")
+    logging.info(f" Features saved to '{vec_path}'")
 
-    # 11. Özellik adlarını JSON dosyasına kaydet
-    with open("models/feature_names.json", "w") as f:
-        feature_names = column_transformer.get_feature_names_out()
+    # Özellik adlarını JSON (+ mmap'lenebilir .npy) dosyasına kaydet
+    feature_names = column_transformer.get_feature_names_out()
+    with open(os.path.join(output_dir, "feature_names.json"), "w") as f:
         json.dump(feature_names.tolist(), f)
+    np.save(os.path.join(output_dir, "feature_names.npy"), feature_names.astype(str))
     logging.info(" Feature names saved to 'feature_names.json'")
 
 
+def main(snapshot: str | None = None, output_dir: str = "models", report_dir: str = ".",
+         params_path: str | None = TUNED_PARAMS_PATH, nthread: int = NTHREAD):
+   
+
+    # 1. Model klasörü oluştur
+    os.makedirs(output_dir, exist_ok=True)
+    xgb_params, threshold = load_model_config(params_path)
+    timer = StageTimer()
+
+    # 2. Geri bildirim verisini yükle
+    with timer.stage("load"):
+        df = fetch_feedback_data(snapshot)
+    logging.info(f" {len(df)} feedback records loaded.")
+
+    # 3. Özellikleri ve hedef sütunu ayır
+    with timer.stage("preprocess"):
+        X_raw, y = preprocess_data(df)
+
+    # 4. OneHotEncoder + ColumnTransformer ile encode et (her zaman CSR)
+    with timer.stage("encode"):
+        column_transformer = build_column_transformer(sparse_threshold=1.0)
+        X_encoded = column_transformer.fit_transform(X_raw)
+
+    # 5. Eğitim/test ayrımı
+    with timer.stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_encoded, y, test_size=0.3, random_state=42, stratify=y
+        )
+    
+    negative_count = int((y_train == 0).sum())
+    positive_count = int((y_train == 1).sum())
+    scale_ratio = negative_count / positive_count
+
+    # 6. Model eğitimi (XGBoost, hist + QuantileDMatrix)
+    booster = train_sparse_booster(X_train, y_train, xgb_params, scale_ratio, nthread, timer)
+    logging.info(" Model training completed.")
+
+    # 7. Tahmin ve değerlendirme
+    with timer.stage("predict"):
+        y_proba = booster.inplace_predict(sparse.csr_matrix(X_test))
+        y_pred = (y_proba >= threshold).astype(int)
+
+    # 8-11. Rapor, confusion matrix, model ve özellik adları
+    with timer.stage("save"):
+        save_outputs(booster_to_classifier(booster), column_transformer, y_test, y_pred, output_dir, report_dir)
+        save_train_state(output_dir, df["id"].max() if len(df) else 0, "full")
+    timer.save(output_dir)
+
+
+# --------------------------------------------------------------
+# Streaming training (bounded memory)
+# --------------------------------------------------------------
+# Feedback is read chunk by chunk (read_sql(chunksize=...) or snapshot
+# batches), each chunk is one-hot encoded to CSR and handed to XGBoost
+# through a DataIter backed by an on-disk page cache. No pass ever holds
+# the whole table, so peak RSS depends on the chunk size, not the history.
+
+def iter_feedback_chunks(snapshot: str | None = None, chunksize: int = STREAM_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Yield Feedback (TRAIN_COLUMNS + id) in chunks of at most *chunksize* rows."""
+    columns = ["id"] + TRAIN_COLUMNS
+    if snapshot:
+        from feedback_store import iter_feedback_snapshot
+        yield from iter_feedback_snapshot(snapshot, columns=columns, batch_rows=chunksize)
+        return
+
+    conn = sql_connect()
+    try:
+        query = f"SELECT {', '.join(columns)} FROM Feedback ORDER BY id"
+        yield from pd.read_sql(query, conn, chunksize=chunksize)
+    finally:
+        conn.close()
+
+
+def _is_test_row(ids: pd.Series) -> np.ndarray:
+    """Deterministic hold-out split by primary key, stable across passes."""
+    return (ids.to_numpy().astype(np.int64) % 100) < STREAM_TEST_PERCENT
+
+
+def _split_chunk(chunk: pd.DataFrame, test: bool):
+    chunk = chunk[_is_test_row(chunk["id"]) == test].drop(columns=["id"])
+    return preprocess_data(chunk)
+
+
+class FeedbackChunkIter(xgb.DataIter):
+    """XGBoost external-memory iterator over encoded Feedback chunks."""
+
+    def __init__(self, chunks: Callable[[], Iterator[pd.DataFrame]], column_transformer: ColumnTransformer, cache_prefix: str):
+        self._chunks = chunks
+        self._transformer = column_transformer
+        self._it: Iterator[pd.DataFrame] | None = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self) -> None:
+        self._it = None
+
+    def next(self, input_data: Callable) -> bool:
+        if self._it is None:
+            self._it = iter(self._chunks())
+        for chunk in self._it:
+            X_raw, y = _split_chunk(chunk, test=False)
+            if X_raw.empty:
+                continue
+            input_data(data=sparse.csr_matrix(self._transformer.transform(X_raw)), label=y.to_numpy())
+            return True
+        return False
+
+
+def fit_streaming_transformer(chunks: Callable[[], Iterator[pd.DataFrame]]):
+    """One pass over the chunks: collect category sets + class counts, fit encoder."""
+    categories = {col: set() for col in CATEGORICAL_COLS}
+    negative_count = positive_count = max_id = 0
+    for chunk in chunks():
+        max_id = max(max_id, int(chunk["id"].max()))
+        X_raw, y = _split_chunk(chunk, test=False)
+        for col in CATEGORICAL_COLS:
+            categories[col].update(X_raw[col].dropna().unique().tolist())
+        positive_count += int((y == 1).sum())
+        negative_count += int((y == 0).sum())
+
+    # OneHotEncoder only needs to see every category once → fit on a tiny frame
+    width = max(len(v) for v in categories.values()) or 1
+    sample = pd.DataFrame({
+        col: [vals[i % len(vals)] for i in range(width)] if vals else [np.nan] * width
+        for col, vals in ((c, sorted(v, key=str)) for c, v in categories.items())
+    })
+    column_transformer = build_column_transformer(sparse_threshold=1.0)   # her zaman CSR
+    column_transformer.fit(sample)
+    return column_transformer, negative_count, positive_count, max_id
+
+
+def main_streaming(snapshot: str | None = None, chunksize: int = STREAM_CHUNKSIZE,
+                   output_dir: str = "models", report_dir: str = ".",
+                   params_path: str | None = TUNED_PARAMS_PATH, nthread: int = NTHREAD):
+    os.makedirs(output_dir, exist_ok=True)
+    xgb_params, threshold = load_model_config(params_path)
+    timer = StageTimer()
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        return iter_feedback_chunks(snapshot, chunksize)
+
+    # 1. Kategori sözlüğü ve sınıf dengesi (ilk geçiş)
+    with timer.stage("encode"):
+        column_transformer, negative_count, positive_count, max_id = fit_streaming_transformer(chunks)
+    logging.info(" Streaming: %d train rows (%d pos / %d neg).",
+                 negative_count + positive_count, positive_count, negative_count)
+
+    # 2. External-memory DMatrix + eğitim
+    with tempfile.TemporaryDirectory(prefix="xgb_cache_") as cache_dir:
+        with timer.stage("dmatrix"):
+            dtrain = xgb.DMatrix(FeedbackChunkIter(chunks, column_transformer, os.path.join(cache_dir, "train")))
+        params = native_params(negative_count / positive_count, xgb_params)
+        params["nthread"] = _resolve_nthread(nthread)
+        with timer.stage("train"):
+            booster = xgb.train(params, dtrain, num_boost_round=xgb_params["n_estimators"])
+        del dtrain
+    logging.info(" Streaming model training completed.")
+
+    # 3. Hold-out değerlendirmesi (yine parça parça; id % 100 seçimi boş kalabilir)
+    y_test_parts, y_pred_parts = [np.empty(0, dtype=np.int8)], [np.empty(0, dtype=np.int8)]
+    with timer.stage("predict"):
+        for chunk in chunks():
+            X_raw, y = _split_chunk(chunk, test=True)
+            if X_raw.empty:
+                continue
+            proba = booster.inplace_predict(sparse.csr_matrix(column_transformer.transform(X_raw)))
+            y_test_parts.append(y.to_numpy().astype(np.int8))
+            y_pred_parts.append((proba >= threshold).astype(np.int8))
+
+    # app.py predict_proba kullanıyor → sklearn sarmalayıcısına yükle
+    with timer.stage("save"):
+        save_outputs(booster_to_classifier(booster), column_transformer, np.concatenate(y_test_parts),
+                     np.concatenate(y_pred_parts), output_dir, report_dir)
+        save_train_state(output_dir, max_id, "full")
+    timer.save(output_dir)
+
+
+# --------------------------------------------------------------
+# Incremental training (warm start from the previous booster)
+# --------------------------------------------------------------
+# Continues boosting the previous model on feedback newer than its
+# watermark only. A full rebuild runs instead when the schedule is due or
+# the new rows contain categories the fitted OneHotEncoder has never seen
+# (their one-hot columns would not exist in the old model).
+
+def _current_model_dir() -> str:
+    from model_registry import release_paths
+    return str(release_paths()["model"].parent)
+
+
+def _full_rebuild_reason(state: dict | None, every: int, days: float) -> str | None:
+    if state is None:
+        return "no previous train state"
+    if state["incremental_runs"] >= every:
+        return f"{state['incremental_runs']} incremental runs since last full rebuild"
+    if time.time() - state["full_rebuild_at"] >= days * 86400:
+        return f"last full rebuild older than {days:g} days"
+    return None
+
+
+def _category_change(column_transformer: ColumnTransformer, X_raw: pd.DataFrame) -> str | None:
+    encoder = column_transformer.named_transformers_["cat"]
+    for col, known in zip(CATEGORICAL_COLS, encoder.categories_):
+        unseen = set(X_raw[col].dropna().unique().tolist()) - set(known.tolist())
+        if unseen:
+            return f"new categories in {col}: {sorted(map(str, unseen))[:5]}"
+    return None
+
+
+def main_incremental(snapshot: str | None = None, output_dir: str = "models", report_dir: str = ".",
+                     base_dir: str | None = None, rounds: int = INCREMENTAL_ROUNDS,
+                     full_rebuild_every: int = FULL_REBUILD_EVERY, full_rebuild_days: float = FULL_REBUILD_DAYS,
+                     params_path: str | None = TUNED_PARAMS_PATH, nthread: int = NTHREAD):
+    base_dir = base_dir or _current_model_dir()
+    state = load_train_state(base_dir)
+    reason = _full_rebuild_reason(state, full_rebuild_every, full_rebuild_days)
+
+    if reason is None:
+        prev_model = joblib.load(os.path.join(base_dir, "feedback_model.pkl"))
+        column_transformer = joblib.load(os.path.join(base_dir, "feedback_vec.pkl"))
+
+        # 1. Sadece watermark'tan yeni kayıtlar
+        df = fetch_feedback_data(snapshot, since_id=state["watermark"])
+        logging.info(f" {len(df)} new feedback records since id={state['watermark']}.")
+        X_raw, y = preprocess_data(df)
+        reason = _category_change(column_transformer, X_raw)
+
+    if reason:
+        logging.info(" Full rebuild: %s", reason)
+        return main(snapshot, output_dir, report_dir, params_path, nthread)
+
+    os.makedirs(output_dir, exist_ok=True)
+    xgb_params, threshold = load_model_config(params_path)
+    if df.empty:
+        logging.info(" No new feedback – previous model carried over unchanged.")
+        if os.path.abspath(base_dir) != os.path.abspath(output_dir):
+            for name in ("feedback_model.pkl", "feedback_model.ubj", "feedback_vec.pkl", "feature_names.json",
+                         "feature_names.npy", "metrics.json", TRAIN_STATE_FILE):
+                if os.path.exists(os.path.join(base_dir, name)):
+                    shutil.copy2(os.path.join(base_dir, name), os.path.join(output_dir, name))
+        return
+
+    # 2. Aynı encoder ile encode et, hold-out ayır (çok az kayıtta örneklem içi rapor)
+    X_encoded = column_transformer.transform(X_raw)
+    if len(y) >= 10 and y.value_counts().min() >= 2 and y.nunique() == 2:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_encoded, y, test_size=0.3, random_state=42, stratify=y
+        )
+    else:
+        X_train, X_test, y_train, y_test = X_encoded, X_encoded, y, y
+
+    # 3. Önceki booster'dan devam et (native API: yeni parti tek sınıflı olabilir)
+    prev_booster = prev_model.get_booster()
+    prev_config = json.loads(prev_booster.save_config())
+    scale_ratio = float(prev_config["learner"]["objective"]["reg_loss_param"]["scale_pos_weight"])
+    params = native_params(scale_ratio, xgb_params)
+    params["nthread"] = _resolve_nthread(nthread)
+    booster = xgb.train(
+        params,
+        xgb.DMatrix(sparse.csr_matrix(X_train), label=y_train.to_numpy(), nthread=params["nthread"]),
+        num_boost_round=rounds,
+        xgb_model=prev_booster,
+    )
+    logging.info(" Warm start: +%d trees on %d rows (total %d trees).",
+                 rounds, len(y_train), booster.num_boosted_rounds())
+
+    # 4. Değerlendirme ve kayıt
+    y_pred = (booster.inplace_predict(sparse.csr_matrix(X_test)) >= threshold).astype(int)
+    save_outputs(booster_to_classifier(booster), column_transformer, y_test, y_pred, output_dir, report_dir)
+    save_train_state(output_dir, df["id"].max(), "incremental", state)
+
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the feedback model")
+    parser.add_argument("--snapshot", help="Read Feedback from a feedback_store snapshot directory instead of ODBC")
+    parser.add_argument("--stream", action="store_true", help="Chunked external-memory training with bounded RSS")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNKSIZE, help="Rows per chunk in --stream mode")
+    parser.add_argument("--output-dir", help="Write model + report here instead of models/ and the working dir")
+    parser.add_argument("--incremental", action="store_true", help="Warm-start from the previous model on new feedback only")
+    parser.add_argument("--base-dir", help="Previous model directory for --incremental (default: current release)")
+    parser.add_argument("--rounds", type=int, default=INCREMENTAL_ROUNDS, help="Trees added per incremental run")
+    parser.add_argument("--full-rebuild-every", type=int, default=FULL_REBUILD_EVERY)
+    parser.add_argument("--full-rebuild-days", type=float, default=FULL_REBUILD_DAYS)
+    parser.add_argument("--params", default=TUNED_PARAMS_PATH,
+                        help="Tuned params JSON from tune_feedback_model.py ('' to use the defaults)")
+    parser.add_argument("--nthread", type=int, default=NTHREAD, help="XGBoost threads (0 = all cores)")
+    args = parser.parse_args()
+
+    dirs = {"output_dir": args.output_dir, "report_dir": args.output_dir} if args.output_dir else {}
+    dirs["params_path"] = args.params or None
+    dirs["nthread"] = args.nthread
+    if args.incremental:
+        main_incremental(snapshot=args.snapshot, base_dir=args.base_dir, rounds=args.rounds,
+                         full_rebuild_every=args.full_rebuild_every,
+                         full_rebuild_days=args.full_rebuild_days, **dirs)
+    elif args.stream:
+        main_streaming(snapshot=args.snapshot, chunksize=args.chunksize, **dirs)
+    else:
+        main(snapshot=args.snapshot, **dirs)
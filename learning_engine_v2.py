@@ -10,9 +10,12 @@ import json
 import logging
 import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Collection, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from mlxtend.frequent_patterns import fpgrowth, association_rules
 from pathlib import Path
 import json    
@@ -113,36 +116,212 @@ ITEM_COLS = CAT_COLS + ["suggested_plant"]   # One-hot’a girecek tüm sütunla
 # Yardımcı fonksiyonlar
 # --------------------------------------------------------------
 
-def _split_item(item: str, cat_cols: List[str]) -> Tuple[str, str]:
-    for col in cat_cols:
-        prefix = f"{col}_"
-        if item.startswith(prefix):
-            return col, item[len(prefix) :].replace("_", " ")
-    idx = item.find("_")
-    return item[:idx], item[idx + 1 :].replace("_", " ")
+def encode_transactions(df_sub: pd.DataFrame) -> Tuple[pd.DataFrame, List[Tuple[str, str]]]:
+    """
+    Integer-coded transactions for fpgrowth.
+
+    Every (column, value) item gets an integer id; the result is a sparse
+    boolean DataFrame (one True per column per row) plus the reverse lookup
+    ``items[id] -> (column, value)``, so rules never round-trip through
+    ``"col_value"`` strings.
+    """
+    ids, items = _item_ids(df_sub)
+    return _transactions(ids, len(items)), items
+
+
+def _item_ids(df_sub: pd.DataFrame) -> Tuple[np.ndarray, List[Tuple[str, str]]]:
+    """rows × ITEM_COLS matrix of global item ids (-1 = missing) + reverse lookup."""
+    ids = np.empty((len(df_sub), len(ITEM_COLS)), dtype=np.int32)
+    items: List[Tuple[str, str]] = []
+    for j, col in enumerate(ITEM_COLS):
+        # astype(str) eski pandas'ta NaN'ı "nan" yapar: eksik değer maskelenir → kod -1, item yok
+        values = df_sub[col].astype(str).where(df_sub[col].notna()).astype("category")
+        codes = values.cat.codes.to_numpy()
+        ids[:, j] = np.where(codes >= 0, codes + len(items), -1)
+        items.extend((col, val) for val in values.cat.categories)
+    return ids, items
+
+
+def _transactions(ids: np.ndarray, n_items: int) -> pd.DataFrame:
+    # eksik değer (kod -1) → o sütun için item yok, get_dummies ile aynı
+    present = ids >= 0
+    rows = np.broadcast_to(np.arange(len(ids), dtype=np.int32)[:, None], ids.shape)[present]
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, ids[present])), shape=(len(ids), n_items)
+    )
+    # mlxtend: sparse frame column names must be strings or start at 0
+    return pd.DataFrame.sparse.from_spmatrix(matrix, columns=range(n_items))
 
 
-def _parse_rules(rules_df: pd.DataFrame, feedback_flag: int) -> List[Dict]:
+def _parse_rules(rules_df: pd.DataFrame, feedback_flag: int, items: List[Tuple[str, str]], *,
+                 unique: bool = False, limit: int | None = None) -> List[Dict]:
+    """
+    Rules → KB dicts in one pass over the antecedent/consequent columns;
+    item ids (from encode_transactions) are looked up in *items*.
+
+    unique=True keeps only the first rule per (conditions, plant) – pass the
+    frame best-first – and *limit* stops as soon as that many are collected,
+    so only the rows up to the limit are ever converted.
+    """
+    resolve = items.__getitem__
+    seen = set()
     parsed: List[Dict] = []
-    for _, row in rules_df.iterrows():
+    for ante, cons, support, confidence, lift in zip(
+        rules_df["antecedents"], rules_df["consequents"],
+        rules_df["support"].to_numpy(float).tolist(),
+        rules_df["confidence"].to_numpy(float).tolist(),
+        rules_df["lift"].to_numpy(float).tolist(),
+    ):
+        plant_name = next(val for col, val in map(resolve, cons) if col == "suggested_plant")
+        if unique:
+            key = (ante, plant_name)                 # frozenset antecedent ↔ aynı koşullar
+            if key in seen:
+                continue
+            seen.add(key)
         conds: Dict[str, List[str]] = {}
-        for item in row["antecedents"]:
-            col, val = _split_item(str(item), CAT_COLS)
+        for col, val in map(resolve, ante):
             conds.setdefault(col, []).append(val)
-        plant_item = next(x for x in row["consequents"] if str(x).startswith("suggested_plant_"))
-        _, plant_name = _split_item(str(plant_item), ["suggested_plant"])
-        parsed.append(
-            {
-                "conditions": conds,
-                "suggested_plant": plant_name,
-                "feedback": feedback_flag,
-                "support": float(row["support"]),
-                "confidence": float(row["confidence"]),
-                "lift": float(row["lift"]),
-            }
-        )
+        parsed.append({
+            "conditions": conds,
+            "suggested_plant": plant_name,
+            "feedback": feedback_flag,
+            "support": support,
+            "confidence": confidence,
+            "lift": lift,
+        })
+        if limit is not None and len(parsed) >= limit:
+            break
     return parsed
 
+# --------------------------------------------------------------
+# Sonucu bitki olan kurallar (kısıtlı madencilik)
+# --------------------------------------------------------------
+
+def _antecedent_counts(ids: np.ndarray, antecedents: List[Tuple[int, ...]],
+                       item_col: np.ndarray, offsets: np.ndarray, sizes: np.ndarray) -> Dict[Tuple[int, ...], int]:
+    """Exact support counts of profile itemsets, one np.unique per distinct column combination."""
+    by_cols: Dict[Tuple[int, ...], set] = {}
+    for ante in antecedents:
+        by_cols.setdefault(tuple(item_col[list(ante)]), set()).add(ante)
+
+    counts: Dict[Tuple[int, ...], int] = {}
+    for cols, wanted in by_cols.items():
+        cols_l = list(cols)
+        local = ids[:, cols_l] - offsets[cols_l]
+        local = np.where(ids[:, cols_l] < 0, sizes[cols_l], local)   # eksik → ayrı kova
+        keys = np.ravel_multi_index(local.T, tuple(sizes[cols_l] + 1))
+        uniq, cnt = np.unique(keys, return_counts=True)
+        lookup = dict(zip(uniq.tolist(), cnt.tolist()))
+        for ante in wanted:
+            key = int(np.ravel_multi_index(tuple(np.array(ante) - offsets[cols_l]), tuple(sizes[cols_l] + 1)))
+            counts[ante] = lookup.get(key, 0)
+    return counts
+
+
+def _rule_sort_key(rule: Dict) -> Tuple:
+    """Deterministic rule order: lift, confidence, then plant and conditions as tie-breakers."""
+    return (-rule["lift"], -rule["confidence"], rule["suggested_plant"],
+            json.dumps(rule["conditions"], sort_keys=True, ensure_ascii=False))
+
+
+def _encode_class(df_sub: pd.DataFrame) -> Dict:
+    """Item ids of one feedback class + per-column offsets / sizes (computed once, shared by shards)."""
+    ids, items = _item_ids(df_sub)
+    item_col = np.array([ITEM_COLS.index(col) for col, _ in items], dtype=np.int64)
+    sizes = np.bincount(item_col, minlength=len(ITEM_COLS))
+    offsets = np.zeros(len(ITEM_COLS), dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)[:-1]
+    return {"ids": ids, "items": items, "item_col": item_col, "offsets": offsets, "sizes": sizes}
+
+
+Candidate = Tuple[Tuple[int, ...], int, int]                 # (antecedent ids, plant id, count)
+
+
+def _plant_candidates(enc: Dict, min_count: float,
+                      plant_ids: Optional[Collection[int]] = None) -> List[Candidate]:
+    """fpgrowth on each frequent plant's conditional database (optionally only *plant_ids*)."""
+    ids = enc["ids"]
+    plant_j = ITEM_COLS.index("suggested_plant")
+    profile = np.delete(ids, plant_j, axis=1)
+    all_plants, plant_counts = np.unique(ids[:, plant_j], return_counts=True)
+
+    candidates: List[Candidate] = []
+    for plant_id, plant_count in zip(all_plants.tolist(), plant_counts.tolist()):
+        if plant_id < 0 or plant_count < min_count:
+            continue
+        if plant_ids is not None and plant_id not in plant_ids:
+            continue
+        rows = profile[ids[:, plant_j] == plant_id]
+        # koşullu veritabanındaki item'ları 0..k-1 aralığına sıkıştır
+        local_items, local = np.unique(rows, return_inverse=True)
+        local = local.reshape(rows.shape)
+        if local_items[0] < 0:                                 # eksik değerler
+            local = np.where(rows < 0, -1, local - 1)
+            local_items = local_items[1:]
+        freq = fpgrowth(_transactions(local, len(local_items)),
+                        min_support=min(min_count / plant_count, 1.0), use_colnames=True)
+        for itemset, support in zip(freq["itemsets"], freq["support"]):
+            ante = tuple(sorted(local_items[list(itemset)].tolist()))
+            candidates.append((ante, plant_id, int(round(support * plant_count))))
+    return candidates
+
+
+def _rules_from_candidates(enc: Dict, candidates: List[Candidate], flag: int,
+                           min_confidence: float) -> List[Dict]:
+    """Confidence / lift of the candidates; antecedent supports are counted once over the whole class."""
+    if not candidates:
+        return []
+    ids, items = enc["ids"], enc["items"]
+    n_rows = len(ids)
+    plant_ids, plant_counts = np.unique(ids[:, ITEM_COLS.index("suggested_plant")], return_counts=True)
+    plant_total = dict(zip(plant_ids.tolist(), plant_counts.tolist()))
+    ante_counts = _antecedent_counts(ids, sorted({c[0] for c in candidates}),
+                                     enc["item_col"], enc["offsets"], enc["sizes"])
+
+    parsed: List[Dict] = []
+    for ante, plant_id, count in candidates:
+        confidence = count / ante_counts[ante]
+        if confidence < min_confidence:
+            continue
+        conds: Dict[str, List[str]] = {}
+        for item in ante:
+            col, val = items[item]
+            conds.setdefault(col, []).append(val)
+        parsed.append({
+            "conditions": conds,
+            "suggested_plant": items[plant_id][1],
+            "feedback": flag,
+            "support": count / n_rows,
+            "confidence": confidence,
+            "lift": confidence / (plant_total[plant_id] / n_rows),
+        })
+    return parsed
+
+
+def mine_plant_rules(
+    df_sub: pd.DataFrame,
+    flag: int,
+    *,
+    min_support: float,
+    min_confidence: float,
+    top_n: int | None = 20,
+) -> List[Dict]:
+    """
+    profile → suggested_plant rules without enumerating the full rule space.
+
+    For every frequent plant, fpgrowth runs only on the profile items of that
+    plant's rows (its conditional database), so every itemset found contains
+    exactly one plant. Antecedent supports are counted directly on the
+    encoded rows and confidence/lift computed from the three counts.
+    """
+    enc = _encode_class(df_sub)
+    if len(enc["ids"]) == 0:
+        return []
+    candidates = _plant_candidates(enc, min_support * len(enc["ids"]))
+    parsed = _rules_from_candidates(enc, candidates, flag, min_confidence)
+    parsed.sort(key=_rule_sort_key)
+    return parsed[:top_n] if top_n else parsed
+
 # --------------------------------------------------------------
 # Ana madencilik rutini
 # --------------------------------------------------------------
@@ -153,15 +332,29 @@ def mine_association_rules(
     min_support: float = 0.005,
     min_confidence: float = 0.1,
     output_path: str = "parsed_rules.json",
+    constrained: bool = True,
 ) -> None:
+    """
+    Mine KB rules per feedback class and write them to *output_path*.
+
+    constrained=True only enumerates profile → plant rules (mine_plant_rules);
+    False runs the original fpgrowth + association_rules over all itemsets.
+    """
     parsed: List[Dict] = []
 
     def _mine(df_sub: pd.DataFrame, flag: int):
         if df_sub.empty:
             logger.info("No records for feedback=%d", flag)
             return
+
+        if constrained:
+            rules = mine_plant_rules(df_sub, flag, min_support=min_support, min_confidence=min_confidence)
+            logger.info("feedback=%d → %d rules (plant-constrained)", flag, len(rules))
+            parsed.extend(rules)
+            return
         
-        trans = pd.get_dummies(df_sub[ITEM_COLS].astype(str))
+        trans, items = encode_transactions(df_sub)
+        plant_ids = {i for i, (col, _) in enumerate(items) if col == "suggested_plant"}
           
         freq = fpgrowth(
             trans,
@@ -178,36 +371,14 @@ def mine_association_rules(
 
        
 
-        rules = rules[
-            rules["consequents"].apply(lambda idx: any(str(x).startswith("suggested_plant_") for x in idx))
-        ]
-        rules["rule_key"] = rules.apply(lambda row: (
-            frozenset(row["antecedents"]),
-            frozenset(row["consequents"])
-        ), axis=1)
-        rules = rules.drop_duplicates(subset=["rule_key"])
-
-         # Lift’e göre sırala, ilk 20 kuralı tut
-        rules = rules.sort_values("lift", ascending=False).head(20)
-        unique_keys = set()
-        filtered_rules = []
-
-        for rule in _parse_rules(rules, flag):
-            try:
-                rule_key = (
-                    frozenset((k, tuple(v)) for k, v in rule["conditions"].items()),
-                    rule["suggested_plant"],
-                    rule["feedback"]
-                )
-                if rule_key not in unique_keys:
-                    filtered_rules.append(rule)
-                    unique_keys.add(rule_key)
-            except Exception as e:
-                logger.warning("Rule parse error: %s", e)
-
-
-        logger.info("feedback=%d → %d rules after filter", flag, len(rules))
-        parsed.extend(_parse_rules(rules, flag))
+        has_plant = np.fromiter((not plant_ids.isdisjoint(c) for c in rules["consequents"]),
+                                dtype=bool, count=len(rules))
+        # Lift’e göre sırala; tek dedup adımı (aynı koşul + bitki) → ilk 20 kural
+        rules = rules[has_plant].sort_values("lift", ascending=False, kind="stable")
+        filtered_rules = _parse_rules(rules, flag, items, unique=True, limit=20)
+
+        logger.info("feedback=%d → %d rules after filter", flag, len(filtered_rules))
+        parsed.extend(filtered_rules)
 
     _mine(df[df["user_feedback"] == 1], 1)
     _mine(df[df["user_feedback"] == 0], 0)
@@ -217,6 +388,142 @@ def mine_association_rules(
         json.dump(parsed, f, ensure_ascii=False, indent=2)
     logger.info("Saved %d parsed rules → %s", len(parsed), output_path)
 
+# --------------------------------------------------------------
+# Paralel, bölümlenmiş madencilik
+# --------------------------------------------------------------
+SHARD_KINDS = ("plant", "environment_type")
+
+# İşçi süreçlerde bir kez yüklenen veri (initializer ile): ortam parçaları için
+# ham sınıf tabloları, diğerleri için sınıf başına bir kez kodlanmış item id'leri
+_PARTITION_DF: Dict[int, pd.DataFrame] = {}
+_PARTITION_ENC: Dict[int, Dict] = {}
+
+
+def _init_partition_worker(frames: Dict[int, pd.DataFrame], encodings: Dict[int, Dict]) -> None:
+    _PARTITION_DF.update(frames)
+    _PARTITION_ENC.update(encodings)
+
+
+def _mine_partition(task: Dict) -> Tuple[int, List[Dict], List[Candidate]]:
+    """
+    One (feedback class, shard) task → (flag, rules, candidates).
+
+    Plant shards only return fpgrowth candidates; their antecedent supports
+    are counted once per class in the parent (_rules_from_candidates).
+    """
+    flag = task["flag"]
+    if task["kind"] == "plant":
+        enc = _PARTITION_ENC[flag]
+        return flag, [], _plant_candidates(enc, task["min_support"] * len(enc["ids"]), task["plants"])
+    if task["kind"] == "environment_type":
+        df_class = _PARTITION_DF[flag]
+        df_part = df_class[df_class["environment_type"].astype(str) == task["value"]]
+        scale = len(df_part) / len(df_class)
+        rules = mine_plant_rules(df_part, flag, min_support=min(task["min_support"] / scale, 1.0),
+                                 min_confidence=task["min_confidence"], top_n=None)
+        # parça içi oranlar → sınıf geneli: koşula ortam eklenir, support/lift yeniden ölçeklenir
+        for rule in rules:
+            rule["conditions"]["environment_type"] = [task["value"]]
+            rule["support"] *= scale
+            rule["lift"] = rule["confidence"] / task["plant_share"][rule["suggested_plant"]]
+        return flag, rules, []
+    enc = _PARTITION_ENC[flag]
+    candidates = _plant_candidates(enc, task["min_support"] * len(enc["ids"]))
+    return flag, _rules_from_candidates(enc, candidates, flag, task["min_confidence"]), []
+
+
+def _partition_tasks(frames: Dict[int, pd.DataFrame], encodings: Dict[int, Dict], shard_by: Optional[str],
+                     n_shards: int, min_support: float, min_confidence: float) -> List[Dict]:
+    tasks: List[Dict] = []
+    for flag in (1, 0):
+        if flag not in frames and flag not in encodings:
+            continue
+        base = {"flag": flag, "kind": shard_by or "class", "min_support": min_support,
+                "min_confidence": min_confidence}
+        if shard_by == "plant":
+            # tek süreçli yolla aynı item evreni ("nan" bitkisi dahil)
+            plant_ids = [i for i, (col, _) in enumerate(encodings[flag]["items"]) if col == "suggested_plant"]
+            for k in range(min(n_shards, len(plant_ids)) or 1):
+                tasks.append({**base, "plants": set(plant_ids[k::n_shards])})
+        elif shard_by == "environment_type":
+            df_class = frames[flag]
+            share = df_class["suggested_plant"].astype(str).value_counts(normalize=True).to_dict()
+            for value in sorted(df_class["environment_type"].dropna().astype(str).unique()):
+                tasks.append({**base, "value": value, "plant_share": share})
+        else:
+            tasks.append(base)
+    return tasks
+
+
+def mine_partitioned(
+    df: pd.DataFrame,
+    *,
+    min_support: float = 0.005,
+    min_confidence: float = 0.1,
+    output_path: str = "parsed_rules.json",
+    shard_by: Optional[str] = None,
+    n_shards: Optional[int] = None,
+    workers: Optional[int] = None,
+    top_n: int = 20,
+) -> List[Dict]:
+    """
+    Mine feedback classes (and optional shards) in a process pool.
+
+    shard_by=None   → one task per feedback class
+    shard_by="plant" → each class split into *n_shards* plant groups; the
+                       class is encoded once, shards run fpgrowth on their
+                       plants and the parent counts antecedent supports
+                       once per class. The merged result equals
+                       mine_association_rules
+    shard_by="environment_type" → one task per environment; rules are
+                       specialised with an environment_type condition
+    Results are merged in a fixed order (lift, confidence, plant,
+    conditions), so the output does not depend on completion order.
+    """
+    if shard_by is not None and shard_by not in SHARD_KINDS:
+        raise ValueError(f"shard_by must be one of {SHARD_KINDS}, got {shard_by!r}")
+    workers = workers or os.cpu_count() or 1
+    n_shards = n_shards or workers
+
+    frames = {flag: df[df["user_feedback"] == flag][ITEM_COLS] for flag in (1, 0)}
+    frames = {flag: part for flag, part in frames.items() if not part.empty}
+    if shard_by == "environment_type":
+        frames = {flag: part[part["environment_type"].notna()] for flag, part in frames.items()}
+        encodings: Dict[int, Dict] = {}
+    else:
+        encodings = {flag: _encode_class(part) for flag, part in frames.items()}
+        frames = {}
+    tasks = _partition_tasks(frames, encodings, shard_by, n_shards, min_support, min_confidence)
+    logger.info("Partitioned mining: %d tasks (shard_by=%s) on %d workers", len(tasks), shard_by, workers)
+
+    by_flag: Dict[int, Dict[Tuple, Dict]] = {flag: {} for flag in (1, 0)}
+    candidates: Dict[int, List[Candidate]] = {flag: [] for flag in (1, 0)}
+
+    def _merge(flag: int, rules: List[Dict]) -> None:
+        for rule in rules:
+            key = (json.dumps(rule["conditions"], sort_keys=True, ensure_ascii=False), rule["suggested_plant"])
+            by_flag[flag].setdefault(key, rule)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)) or 1,
+                             initializer=_init_partition_worker, initargs=(frames, encodings)) as pool:
+        for flag, rules, found in pool.map(_mine_partition, tasks):
+            _merge(flag, rules)
+            candidates[flag].extend(found)
+    for flag, found in candidates.items():
+        _merge(flag, _rules_from_candidates(encodings[flag], found, flag, min_confidence) if found else [])
+
+    parsed: List[Dict] = []
+    for flag in (1, 0):
+        rules = sorted(by_flag[flag].values(), key=_rule_sort_key)[:top_n]
+        logger.info("feedback=%d → %d rules (merged)", flag, len(rules))
+        parsed.extend(rules)
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(parsed, f, ensure_ascii=False, indent=2)
+    logger.info("Saved %d parsed rules → %s", len(parsed), output_path)
+    return parsed
+
 # --------------------------------------------------------------
 # CLI
 # --------------------------------------------------------------
@@ -225,14 +532,38 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Mine association rules for KB")
     parser.add_argument("--csv", help="Optional CSV path instead of DB query")
+    parser.add_argument("--snapshot", help="Optional feedback_store snapshot directory instead of DB query")
     parser.add_argument("--min-support", type=float, default=0.01)
     parser.add_argument("--min-confidence", type=float, default=0.3)
     parser.add_argument("--output", default="parsed_rules.json")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update persistent itemset counts with new rows only (incremental_miner)")
+    parser.add_argument("--rebuild", action="store_true", help="With --incremental: recount the full history")
+    parser.add_argument("--all-rules", action="store_true",
+                        help="Generate rules over all itemsets, then filter (slow, original behaviour)")
+    parser.add_argument("--workers", type=int, help="Mine partitions in a process pool with N workers")
+    parser.add_argument("--shard-by", choices=SHARD_KINDS, help="With --workers: also split each class by plant group or environment")
     args = parser.parse_args()
 
+    if args.incremental:
+        from incremental_miner import mine_incremental
+
+        mine_incremental(
+            snapshot=args.snapshot,
+            rebuild=args.rebuild,
+            min_support=args.min_support,
+            min_confidence=args.min_confidence,
+            output_path=args.output,
+        )
+        raise SystemExit(0)
+
     if args.csv:
         df_feedback = pd.read_csv(args.csv)
         logger.info("Loaded %d records from CSV %s", len(df_feedback), args.csv)
+    elif args.snapshot:
+        from feedback_store import read_feedback_snapshot
+
+        df_feedback = read_feedback_snapshot(args.snapshot, columns=ITEM_COLS + ["user_feedback"])
     else:
         try:
             df_feedback = fetch_feedback_from_db()
@@ -240,9 +571,21 @@ if __name__ == "__main__":
             logger.error("DB connection failed (%s). Tip: set SQLSERVER_CONN env or use --csv.", exc)
             raise SystemExit(1)
 
+    if args.workers:
+        mine_partitioned(
+            df_feedback,
+            min_support=args.min_support,
+            min_confidence=args.min_confidence,
+            output_path=args.output,
+            shard_by=args.shard_by,
+            workers=args.workers,
+        )
+        raise SystemExit(0)
+
     mine_association_rules(
         df_feedback,
         min_support=args.min_support,
         min_confidence=args.min_confidence,
         output_path=args.output,
+        constrained=not args.all_rules,
     )
@@ -0,0 +1,321 @@
+# model_registry.py – Versioned model releases + atomic "current" pointer
+# --------------------------------------------------------------
+# • Each retrain builds its artifacts (model, encoder, feature names,
+#   parsed rules, KB) in models/releases/.staging/<id>
+# • promote() writes manifest.json (sha256 per file, training row
+#   watermark, classification_report metrics, parent release), renames the
+#   directory into models/releases/<id> and atomically rewrites
+#   models/CURRENT (temp file + os.replace)
+# • Every promotion is appended to models/releases/HISTORY, so rollback()
+#   is just another pointer swap
+# • Serving reads the pointer and loads the whole release as one unit, so
+#   model, preprocessor and KB are always swapped together. The booster is
+#   loaded from native UBJSON (no unpickling), numeric encoder arrays and
+#   feature names are memory-mapped
+# • Releases also carry knowledge_base.sqlite, an indexed copy of the KB
+#   that serving prefers (RuleEngine queries it instead of loading the JSON)
+# • With no release yet, serving falls back to models/*.pkl and the
+#   repository's knowledge_base.json
+#
+#   Kullanım:
+#     python model_registry.py list
+#     python model_registry.py rollback [--steps 1]
+#     python model_registry.py promote <release_id>
+#     python model_registry.py verify [<release_id>]
+#     python model_registry.py gc --keep 5
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MODELS_DIR = Path("models")
+RELEASES_DIR = MODELS_DIR / "releases"
+STAGING_DIR = RELEASES_DIR / ".staging"
+POINTER_FILE = MODELS_DIR / "CURRENT"
+HISTORY_FILE = RELEASES_DIR / "HISTORY"
+
+LEGACY_KB_PATH = Path("knowledge_base.json")
+
+MODEL_FILE = "feedback_model.pkl"
+BOOSTER_FILE = "feedback_model.ubj"
+VEC_FILE = "feedback_vec.pkl"
+FEATURES_FILE = "feature_names.npy"
+KB_FILE = "knowledge_base.json"
+KB_DB_FILE = "knowledge_base.sqlite"
+METRICS_FILE = "metrics.json"
+TRAIN_STATE_FILE = "train_state.json"
+MANIFEST_FILE = "manifest.json"
+
+REQUIRED_FILES = (MODEL_FILE, VEC_FILE, KB_FILE)
+
+
+# --------------------------------------------------------------
+# Atomic small-file writes
+# --------------------------------------------------------------
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)                  # readers see old or new content, never a partial write
+
+
+def _read_json(path: Path, default):
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+# --------------------------------------------------------------
+# Pointer + history
+# --------------------------------------------------------------
+def current_release() -> Optional[str]:
+    """Return the id of the promoted release, or None before the first promotion."""
+    try:
+        release_id = POINTER_FILE.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return release_id or None
+
+
+def _write_pointer(release_id: str) -> None:
+    _atomic_write(POINTER_FILE, release_id)
+
+
+def release_history() -> List[str]:
+    """Promoted release ids, oldest first."""
+    return _read_json(HISTORY_FILE, [])
+
+
+def list_releases() -> List[Dict]:
+    """Manifests of all releases on disk, newest first."""
+    manifests = [
+        _read_json(path / MANIFEST_FILE, {"release_id": path.name})
+        for path in RELEASES_DIR.iterdir()
+        if path.is_dir() and not path.name.startswith(".")
+    ] if RELEASES_DIR.exists() else []
+    return sorted(manifests, key=lambda m: m.get("created_at", 0), reverse=True)
+
+
+# --------------------------------------------------------------
+# Paths
+# --------------------------------------------------------------
+def release_paths(release_id: Optional[str] = None) -> Dict[str, Path]:
+    """Artifact paths of *release_id* (default: current release, then legacy layout)."""
+    release_id = release_id or current_release()
+    if release_id is None:
+        return {
+            "model": MODELS_DIR / MODEL_FILE,
+            "booster": MODELS_DIR / BOOSTER_FILE,
+            "preprocessor": MODELS_DIR / VEC_FILE,
+            "kb": LEGACY_KB_PATH,
+        }
+    base = RELEASES_DIR / release_id
+    return {
+        "model": base / MODEL_FILE,
+        "booster": base / BOOSTER_FILE,
+        "preprocessor": base / VEC_FILE,
+        "features": base / FEATURES_FILE,
+        "kb": base / KB_FILE,
+        "kb_db": base / KB_DB_FILE,
+        "manifest": base / MANIFEST_FILE,
+    }
+
+
+def new_staging_dir() -> tuple[str, Path]:
+    """Create an empty staging directory for a new release and return (id, path)."""
+    release_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = STAGING_DIR / release_id
+    path.mkdir(parents=True, exist_ok=False)
+    return release_id, path
+
+
+# --------------------------------------------------------------
+# Manifest
+# --------------------------------------------------------------
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(release_id: str, release_dir: Path, extra: Optional[Dict] = None) -> Dict:
+    """Hash every artifact and collect watermark + metrics written by learning_engine."""
+    files = {
+        path.name: {"sha256": _sha256(path), "bytes": path.stat().st_size}
+        for path in sorted(release_dir.iterdir())
+        if path.is_file() and path.name != MANIFEST_FILE
+    }
+    train_state = _read_json(release_dir / TRAIN_STATE_FILE, {})
+    return {
+        "release_id": release_id,
+        "created_at": time.time(),
+        "parent": current_release(),
+        "watermark": train_state.get("watermark"),
+        "train_mode": train_state.get("mode"),
+        "metrics": _read_json(release_dir / METRICS_FILE, {}),
+        "files": files,
+        **(extra or {}),
+    }
+
+
+def verify_release(release_id: Optional[str] = None) -> List[str]:
+    """Return names of artifacts whose hash no longer matches the manifest."""
+    release_id = release_id or current_release()
+    if release_id is None:
+        raise FileNotFoundError("No release to verify (nothing promoted yet)")
+    base = RELEASES_DIR / release_id
+    manifest = _read_json(base / MANIFEST_FILE, None)
+    if manifest is None:
+        raise FileNotFoundError(f"Release {release_id} has no manifest")
+    return [
+        name for name, meta in manifest["files"].items()
+        if not (base / name).exists() or _sha256(base / name) != meta["sha256"]
+    ]
+
+
+# --------------------------------------------------------------
+# Promotion / rollback
+# --------------------------------------------------------------
+def promote(release_id: str, extra: Optional[Dict] = None) -> Path:
+    """
+    Publish a staging directory (or re-point to an existing release).
+
+    Staged releases get their manifest, are renamed into place and then
+    become CURRENT; the old release stays on disk for rollback.
+    """
+    src = STAGING_DIR / release_id
+    dest = RELEASES_DIR / release_id
+    if src.exists():
+        missing = [name for name in REQUIRED_FILES if not (src / name).exists()]
+        if missing:
+            raise FileNotFoundError(f"Release {release_id} is incomplete, missing: {missing}")
+        manifest = build_manifest(release_id, src, extra)
+        _atomic_write(src / MANIFEST_FILE, json.dumps(manifest, indent=2))
+        os.replace(src, dest)
+    elif not dest.exists():
+        raise FileNotFoundError(f"Unknown release {release_id}")
+
+    _write_pointer(release_id)
+    history = [r for r in release_history() if r != release_id] + [release_id]
+    _atomic_write(HISTORY_FILE, json.dumps(history))
+    logger.info("Release %s promoted → %s", release_id, dest)
+    return dest
+
+
+def rollback(steps: int = 1) -> str:
+    """Point CURRENT back *steps* promotions. Returns the restored release id."""
+    history = release_history()
+    if len(history) <= steps:
+        raise RuntimeError(f"Cannot roll back {steps} step(s): only {len(history)} release(s) in history")
+    target = history[-1 - steps]
+    if not (RELEASES_DIR / target).exists():
+        raise FileNotFoundError(f"Release {target} was garbage-collected")
+
+    _write_pointer(target)
+    # geri alınan sürümler geçmişten düşer, böylece art arda rollback geriye doğru ilerler
+    _atomic_write(HISTORY_FILE, json.dumps(history[: len(history) - steps]))
+    logger.warning("Rolled back to release %s", target)
+    return target
+
+
+def garbage_collect(keep: int = 5) -> List[str]:
+    """Delete releases outside the last *keep* history entries (never CURRENT)."""
+    keep_ids = set(release_history()[-keep:]) | {current_release()}
+    removed = []
+    for manifest in list_releases():
+        release_id = manifest["release_id"]
+        if release_id not in keep_ids:
+            shutil.rmtree(RELEASES_DIR / release_id, ignore_errors=True)
+            removed.append(release_id)
+    return removed
+
+
+# --------------------------------------------------------------
+# Loading
+# --------------------------------------------------------------
+def load_release(release_id: Optional[str] = None) -> Tuple[object, object, Path]:
+    """
+    Load (model, preprocessor, kb_path) of a release.
+
+    The booster comes from native UBJSON when present (fast, no pickle);
+    the encoder is loaded with mmap_mode so its numeric arrays are shared
+    page cache rather than private copies per serving process.
+    """
+    import joblib
+
+    paths = release_paths(release_id)
+    if paths["booster"].exists():
+        from xgboost import XGBClassifier
+
+        model = XGBClassifier()
+        model.load_model(paths["booster"])
+    else:
+        model = joblib.load(paths["model"])
+    preprocessor = joblib.load(paths["preprocessor"], mmap_mode="r")
+    kb_db = paths.get("kb_db")
+    if kb_db is not None and kb_db.exists():
+        from kb_sqlite import schema_current
+
+        if schema_current(kb_db):
+            return model, preprocessor, kb_db
+        logger.warning("%s has an outdated KB schema – serving %s", kb_db, paths["kb"])
+    return model, preprocessor, paths["kb"]
+
+
+def load_feature_names(release_id: Optional[str] = None):
+    import numpy as np
+
+    return np.load(release_paths(release_id)["features"], mmap_mode="r")
+
+
+# --------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Inspect and manage model releases")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    p_rb = sub.add_parser("rollback")
+    p_rb.add_argument("--steps", type=int, default=1)
+    p_pr = sub.add_parser("promote")
+    p_pr.add_argument("release_id")
+    p_vf = sub.add_parser("verify")
+    p_vf.add_argument("release_id", nargs="?")
+    p_gc = sub.add_parser("gc")
+    p_gc.add_argument("--keep", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_release()
+        for m in list_releases():
+            f1 = m.get("metrics", {}).get("macro avg", {}).get("f1-score")
+            print(f"{'*' if m['release_id'] == current else ' '} {m['release_id']}  "
+                  f"watermark={m.get('watermark')}  mode={m.get('train_mode')}  macro_f1={f1}")
+    elif args.command == "rollback":
+        print(rollback(args.steps))
+    elif args.command == "promote":
+        promote(args.release_id)
+    elif args.command == "verify":
+        bad = verify_release(args.release_id)
+        print("OK" if not bad else f"Hash mismatch: {bad}")
+    elif args.command == "gc":
+        print(f"Removed: {garbage_collect(args.keep)}")
@@ -0,0 +1,200 @@
+# online_learner.py – Per-feedback online scorer (FTRL-Proximal, hashed features)
+# --------------------------------------------------------------
+# • Same inputs as the XGBoost model: 9 profile columns + suggested_plant.
+#   Features are hashed (crc32, stable across processes) into a fixed
+#   2^HASH_BITS weight vector: one indicator per "col=value", one per plant
+#   and one per plant × profile value cross
+# • data_handling.add_feedback() calls update() after the INSERT commits –
+#   O(active features) work, so a "No" lowers that plant's score for similar
+#   profiles on the very next recommendation, without a retrain
+# • app.py blends predict() into the hybrid score once the learner has seen
+#   ONLINE_MIN_UPDATES examples
+# • State (z, n, update count) is snapshotted to models/online_ftrl.npz
+#   every SNAPSHOT_EVERY updates / SNAPSHOT_SECONDS (temp file + os.replace)
+#
+#   Kullanım:
+#     python online_learner.py bootstrap --snapshot data/feedback_snapshot
+#     python online_learner.py info
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STATE_PATH = os.path.join("models", "online_ftrl.npz")
+
+PROFILE_COLS = [
+    "area_size", "sunlight_need", "environment_type", "climate_type", "watering_frequency",
+    "fertilizer_frequency", "pesticide_frequency", "has_pet", "has_child",
+]
+
+HASH_BITS = 20
+FTRL_ALPHA = 0.1
+FTRL_BETA = 1.0
+FTRL_L1 = 0.5
+FTRL_L2 = 1.0
+
+SNAPSHOT_EVERY = 20
+SNAPSHOT_SECONDS = 60.0
+
+
+def _norm(value) -> str:
+    return str(value).strip().lower()
+
+
+def hash_features(record: Dict, bits: int = HASH_BITS) -> np.ndarray:
+    """Indices of the active (value 1) hashed features of one feedback record."""
+    plant = _norm(record.get("suggested_plant", ""))
+    tokens = ["bias", f"plant={plant}"]
+    for col in PROFILE_COLS:
+        value = _norm(record.get(col, ""))
+        tokens.append(f"{col}={value}")
+        tokens.append(f"plant={plant}|{col}={value}")
+    mask = (1 << bits) - 1
+    return np.unique(np.fromiter((zlib.crc32(t.encode("utf-8")) & mask for t in tokens), dtype=np.int64))
+
+
+class FTRLLearner:
+    """FTRL-Proximal logistic regression over binary hashed features."""
+
+    def __init__(self, bits: int = HASH_BITS, alpha: float = FTRL_ALPHA, beta: float = FTRL_BETA,
+                 l1: float = FTRL_L1, l2: float = FTRL_L2) -> None:
+        self.bits, self.alpha, self.beta, self.l1, self.l2 = bits, alpha, beta, l1, l2
+        self.z = np.zeros(1 << bits, dtype=np.float64)
+        self.n = np.zeros(1 << bits, dtype=np.float64)
+        self.updates = 0
+
+    def _weights(self, idx: np.ndarray) -> np.ndarray:
+        z, n = self.z[idx], self.n[idx]
+        w = -(z - np.sign(z) * self.l1) / ((self.beta + np.sqrt(n)) / self.alpha + self.l2)
+        w[np.abs(z) <= self.l1] = 0.0                 # L1 → seyrek ağırlıklar
+        return w
+
+    def _proba(self, idx: np.ndarray, w: np.ndarray) -> float:
+        margin = max(min(float(w.sum()), 35.0), -35.0)
+        return 1.0 / (1.0 + math.exp(-margin))
+
+    def predict(self, record: Dict) -> float:
+        idx = hash_features(record, self.bits)
+        return self._proba(idx, self._weights(idx))
+
+    def update(self, record: Dict, label: int) -> float:
+        """One FTRL step; returns the prediction made *before* the update."""
+        idx = hash_features(record, self.bits)
+        w = self._weights(idx)
+        p = self._proba(idx, w)
+        g = p - (1.0 if int(label) == 1 else 0.0)     # binary features → gradient = g
+        n_old = self.n[idx]
+        sigma = (np.sqrt(n_old + g * g) - np.sqrt(n_old)) / self.alpha
+        self.z[idx] += g - sigma * w
+        self.n[idx] = n_old + g * g
+        self.updates += 1
+        return p
+
+    # ----------------------------------------------------------
+    # Persistence
+    # ----------------------------------------------------------
+    def save(self, path: str = STATE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, z=self.z, n=self.n,
+                 meta=np.array([self.bits, self.updates, self.alpha, self.beta, self.l1, self.l2]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = STATE_PATH) -> "FTRLLearner":
+        with np.load(path) as data:
+            bits, updates, alpha, beta, l1, l2 = data["meta"].tolist()
+            learner = cls(int(bits), alpha, beta, l1, l2)
+            learner.z[:] = data["z"]
+            learner.n[:] = data["n"]
+        learner.updates = int(updates)
+        return learner
+
+
+# --------------------------------------------------------------
+# Process-wide instance (Streamlit sessions share one learner)
+# --------------------------------------------------------------
+_learner: Optional[FTRLLearner] = None
+_lock = threading.Lock()
+_last_snapshot = {"updates": 0, "time": time.monotonic()}
+
+
+def get_online_learner(path: str = STATE_PATH) -> FTRLLearner:
+    global _learner
+    with _lock:
+        if _learner is None:
+            try:
+                _learner = FTRLLearner.load(path)
+                logger.info("Online learner loaded (%d updates) from %s", _learner.updates, path)
+            except FileNotFoundError:
+                _learner = FTRLLearner()
+            _last_snapshot["updates"] = _learner.updates
+        return _learner
+
+
+def online_score(record: Dict) -> float:
+    learner = get_online_learner()
+    with _lock:
+        return learner.predict(record)
+
+
+def record_online_feedback(record: Dict, label: int, path: str = STATE_PATH) -> None:
+    """Apply one feedback to the shared learner and snapshot it when due."""
+    learner = get_online_learner(path)
+    with _lock:
+        learner.update(record, label)
+        due = (learner.updates - _last_snapshot["updates"] >= SNAPSHOT_EVERY
+               or time.monotonic() - _last_snapshot["time"] >= SNAPSHOT_SECONDS)
+        if due:
+            learner.save(path)
+            _last_snapshot.update(updates=learner.updates, time=time.monotonic())
+
+
+def bootstrap(snapshot: Optional[str] = None, path: str = STATE_PATH, passes: int = 1) -> FTRLLearner:
+    """Replay the stored Feedback history (oldest first) into a fresh learner."""
+    from learning_engine import fetch_feedback_data
+
+    df = fetch_feedback_data(snapshot).sort_values("id")
+    records: List[Dict] = df[PROFILE_COLS + ["suggested_plant"]].astype(str).to_dict("records")
+    labels = df["user_feedback"].astype(int).tolist()
+    learner = FTRLLearner()
+    for _ in range(passes):
+        for record, label in zip(records, labels):
+            learner.update(record, label)
+    learner.save(path)
+    logger.info("Online learner bootstrapped from %d rows → %s", len(records), path)
+    return learner
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Online FTRL feedback learner")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bs = sub.add_parser("bootstrap", help="Replay Feedback history into a new state file")
+    p_bs.add_argument("--snapshot", help="Read Feedback from a feedback_store snapshot directory instead of ODBC")
+    p_bs.add_argument("--passes", type=int, default=1)
+    sub.add_parser("info")
+    parser.add_argument("--state", default=STATE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "bootstrap":
+        bootstrap(args.snapshot, args.state, args.passes)
+    else:
+        learner = FTRLLearner.load(args.state)
+        active = int(np.count_nonzero(np.abs(learner.z) > learner.l1))
+        print(f"updates={learner.updates}  bits={learner.bits}  active_weights={active}")
@@ -0,0 +1,265 @@
+# profiling.py – Opt-in profiler hooks for the serving path
+# --------------------------------------------------------------
+# • Off by default. Turned on without a redeploy by either
+#     PLANT_PROFILE=sample[:N] | cprofile[:N]        (env, N = request window)
+#     python profiling.py on --mode sample --requests 20   (admin toggle file)
+#   The toggle file (profiles/PROFILE_ON) counts its window down and removes
+#   itself; the check is cached for CHECK_INTERVAL seconds, so the disabled
+#   cost per request is one monotonic() comparison
+# • begin_request("recommend") decides whether THIS request is profiled and
+#   consumes one slot of the window; end_request() closes it. Only hooks
+#   running inside a selected request profile anything:
+#     @profiled("get_candidates")         – RuleEngine.get_candidates
+#     start("scoring") / stop("scoring")   – the hybrid scoring loop in app.py
+#     @profiled("check_and_retrain")      – app.check_and_retrain_if_needed
+# • Output per request: profiles/<time>-<request>-<id>/<hook>.folded
+#   (sample mode: collapsed stacks for flamegraph.pl / speedscope) or
+#   <hook>.prof + <hook>.txt (cprofile mode: pstats, snakeviz / flameprof)
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PROFILE_DIR = Path(os.getenv("PLANT_PROFILE_DIR", "profiles"))
+TOGGLE_FILE = PROFILE_DIR / "PROFILE_ON"
+MODES = ("sample", "cprofile")
+SAMPLE_INTERVAL = 0.005          # saniye
+CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_local = threading.local()
+_cache: Dict = {"checked": 0.0, "config": None}
+_env_used = 0
+
+
+# --------------------------------------------------------------
+# Açma / kapama
+# --------------------------------------------------------------
+def _parse(spec: str) -> Optional[Dict]:
+    mode, _, window = spec.strip().lower().partition(":")
+    if mode in ("1", "true", "on"):
+        mode = "sample"
+    if mode not in MODES:
+        return None
+    return {"mode": mode, "remaining": int(window) if window else None, "source": "env"}
+
+
+def _config() -> Optional[Dict]:
+    now = time.monotonic()
+    if now - _cache["checked"] < CHECK_INTERVAL:
+        return _cache["config"]
+    config = _parse(os.getenv("PLANT_PROFILE", ""))
+    if config is None:
+        try:
+            config = {**json.loads(TOGGLE_FILE.read_text(encoding="utf-8")), "source": "toggle"}
+        except (FileNotFoundError, json.JSONDecodeError):
+            config = None
+    _cache.update(checked=now, config=config)
+    return config
+
+
+def turn_on(mode: str = "sample", requests: int = 10, interval: float = SAMPLE_INTERVAL) -> Path:
+    """Admin toggle: profile the next *requests* requests (all serving processes sharing PROFILE_DIR)."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = TOGGLE_FILE.with_name(f".{TOGGLE_FILE.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"mode": mode, "remaining": requests, "interval": interval}), encoding="utf-8")
+    os.replace(tmp, TOGGLE_FILE)
+    _cache["checked"] = 0.0
+    return TOGGLE_FILE
+
+
+def turn_off() -> None:
+    TOGGLE_FILE.unlink(missing_ok=True)
+    _cache["checked"] = 0.0
+
+
+def _take_slot(config: Dict) -> bool:
+    """Consume one request of the window; False once it is used up."""
+    global _env_used
+    with _lock:
+        if config["source"] == "env":
+            if config["remaining"] is not None and _env_used >= config["remaining"]:
+                return False
+            _env_used += 1
+            return True
+        try:
+            current = json.loads(TOGGLE_FILE.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            _cache["config"] = None
+            return False
+        remaining = current.get("remaining")
+        if remaining is not None:
+            if remaining <= 1:
+                TOGGLE_FILE.unlink(missing_ok=True)
+                _cache["config"] = None
+            else:
+                current["remaining"] = remaining - 1
+                tmp = TOGGLE_FILE.with_name(f".{TOGGLE_FILE.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(current), encoding="utf-8")
+                os.replace(tmp, TOGGLE_FILE)
+        return True
+
+
+# --------------------------------------------------------------
+# İstek oturumu
+# --------------------------------------------------------------
+class _Session:
+    def __init__(self, request: str, config: Dict) -> None:
+        self.mode = config["mode"]
+        self.interval = float(config.get("interval", SAMPLE_INTERVAL))
+        self.dir = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{request}-{uuid.uuid4().hex[:6]}"
+        self.active: Dict[str, object] = {}
+
+
+def begin_request(request: str) -> bool:
+    """Select this request for profiling if a window is open. Returns True when selected."""
+    _local.session = None
+    config = _config()
+    if config is None or not _take_slot(config):
+        return False
+    _local.session = _Session(request, config)
+    _local.session.dir.mkdir(parents=True, exist_ok=True)
+    logger.info("Profiling request %s (%s) → %s", request, config["mode"], _local.session.dir)
+    return True
+
+
+def end_request() -> None:
+    session = getattr(_local, "session", None)
+    if session is not None:
+        for name in list(session.active):
+            stop(name)
+    _local.session = None
+
+
+# --------------------------------------------------------------
+# Profiler'lar
+# --------------------------------------------------------------
+class _Sampler:
+    """Samples the calling thread's stack from a helper thread (collapsed stacks)."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, path: Path) -> None:
+        self._stop.set()
+        self._thread.join()
+        with path.with_suffix(".folded").open("w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class _Deterministic:
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self, path: Path) -> None:
+        self.profile.disable()
+        self.profile.dump_stats(str(path.with_suffix(".prof")))
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(40)
+        path.with_suffix(".txt").write_text(out.getvalue(), encoding="utf-8")
+
+
+def start(name: str) -> None:
+    session = getattr(_local, "session", None)
+    if session is None or name in session.active:
+        return
+    if session.mode == "cprofile" and any(isinstance(p, _Deterministic) for p in session.active.values()):
+        return                                        # cProfile iç içe açılamaz; dıştaki kapsar
+    profiler = _Sampler(session.interval) if session.mode == "sample" else _Deterministic()
+    session.active[name] = profiler
+    profiler.start()
+
+
+def stop(name: str) -> None:
+    session = getattr(_local, "session", None)
+    if session is None or name not in session.active:
+        return
+    profiler = session.active.pop(name)
+    path = session.dir / name
+    n = len(list(session.dir.glob(f"{name}*.folded")) + list(session.dir.glob(f"{name}*.prof")))
+    if n:
+        path = session.dir / f"{name}-{n}"
+    profiler.stop(path)
+
+
+def profiled(name: str) -> Callable:
+    """Decorator: profile every call made inside a selected request."""
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if getattr(_local, "session", None) is None:
+                return fn(*args, **kwargs)
+            start(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stop(name)
+        return inner
+    return wrap
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Toggle / inspect serving-path profiling")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_on = sub.add_parser("on")
+    p_on.add_argument("--mode", choices=MODES, default="sample")
+    p_on.add_argument("--requests", type=int, default=10, help="Window: number of requests to profile")
+    p_on.add_argument("--interval-ms", type=float, default=SAMPLE_INTERVAL * 1e3)
+    sub.add_parser("off")
+    sub.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "on":
+        print(f"Profiling on → {turn_on(args.mode, args.requests, args.interval_ms / 1e3)}")
+    elif args.command == "off":
+        turn_off()
+        print("Profiling off")
+    else:
+        print(_config() or "off")
+        for run in sorted(PROFILE_DIR.glob("*-*-*"))[-10:]:
+            print(f"  {run.name}: {', '.join(sorted(p.name for p in run.iterdir()))}")
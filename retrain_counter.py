@@ -0,0 +1,165 @@
+# retrain_counter.py – Incremental "new feedback since last train" counter
+# --------------------------------------------------------------
+# • One row per model version in FeedbackCounters; the ingestion path
+#   (data_handling.add_feedback) bumps the newest row in the same
+#   transaction as the Feedback INSERT
+# • check_and_retrain_if_needed reads that single row by primary key
+#   instead of running COUNT(*) over Feedback on every submission
+# • Retrain fires on "N new positive feedback since last train" (>=, not
+#   % threshold == 0), so a trigger can no longer be skipped
+# • Every RECONCILE_EVERY reads the counter is recounted from Feedback,
+#   but only over rows newer than the version's watermark (PK range scan)
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+COUNTER_TABLE = "FeedbackCounters"
+RECONCILE_EVERY = 50
+
+_CREATE_SQL = f"""
+IF OBJECT_ID('{COUNTER_TABLE}', 'U') IS NULL
+CREATE TABLE {COUNTER_TABLE} (
+    model_version     INT      NOT NULL PRIMARY KEY,
+    trained_watermark INT      NOT NULL DEFAULT 0,
+    new_feedback      INT      NOT NULL DEFAULT 0,
+    new_positive      INT      NOT NULL DEFAULT 0,
+    created_at        DATETIME NOT NULL DEFAULT GETDATE()
+)
+"""
+
+_table_ready = False
+_reads_since_reconcile = 0
+
+
+class CounterState(NamedTuple):
+    model_version: int
+    trained_watermark: int
+    new_feedback: int
+    new_positive: int
+
+
+# --------------------------------------------------------------
+# Setup / reconciliation
+# --------------------------------------------------------------
+def ensure_counter_table(conn) -> None:
+    """Create the counters table once per process; seed version 0 if empty."""
+    global _table_ready
+    if _table_ready:
+        return
+    cur = conn.cursor()
+    cur.execute(_CREATE_SQL)
+    cur.execute(f"SELECT COUNT(*) FROM {COUNTER_TABLE}")
+    if cur.fetchone()[0] == 0:
+        cur.execute(f"INSERT INTO {COUNTER_TABLE} (model_version, trained_watermark) VALUES (0, 0)")
+        conn.commit()
+        reconcile_counter(conn)
+    conn.commit()
+    cur.close()
+    _table_ready = True
+
+
+def reconcile_counter(conn, model_version: Optional[int] = None) -> CounterState:
+    """Recount new rows since the version's watermark and overwrite the counter."""
+    cur = conn.cursor()
+    if model_version is None:
+        cur.execute(f"SELECT MAX(model_version) FROM {COUNTER_TABLE}")
+        model_version = cur.fetchone()[0]
+    cur.execute(f"SELECT trained_watermark FROM {COUNTER_TABLE} WHERE model_version = ?", model_version)
+    watermark = cur.fetchone()[0]
+
+    cur.execute(
+        "SELECT COUNT(*), COALESCE(SUM(CASE WHEN user_feedback = 1 THEN 1 ELSE 0 END), 0) "
+        "FROM Feedback WHERE id > ?",
+        watermark,
+    )
+    new_feedback, new_positive = cur.fetchone()
+    cur.execute(
+        f"UPDATE {COUNTER_TABLE} SET new_feedback = ?, new_positive = ? WHERE model_version = ?",
+        new_feedback, new_positive, model_version,
+    )
+    conn.commit()
+    cur.close()
+    logger.info("Counter v%d reconciled → %d new (%d positive)", model_version, new_feedback, new_positive)
+    return CounterState(model_version, watermark, new_feedback, new_positive)
+
+
+# --------------------------------------------------------------
+# Hot path
+# --------------------------------------------------------------
+def record_feedback(cursor, user_feedback: int) -> None:
+    """
+    Bump the newest counter row. Call with the cursor of the Feedback INSERT,
+    before its commit, so both writes land in the same transaction.
+    """
+    cursor.execute(
+        f"UPDATE {COUNTER_TABLE} "
+        "SET new_feedback = new_feedback + 1, new_positive = new_positive + ? "
+        f"WHERE model_version = (SELECT MAX(model_version) FROM {COUNTER_TABLE})",
+        1 if int(user_feedback) == 1 else 0,
+    )
+
+
+def pending_feedback(conn, reconcile_every: int = RECONCILE_EVERY) -> CounterState:
+    """Return the newest counter row (PK lookup); periodically reconcile it."""
+    global _reads_since_reconcile
+    ensure_counter_table(conn)
+
+    _reads_since_reconcile += 1
+    if reconcile_every and _reads_since_reconcile >= reconcile_every:
+        _reads_since_reconcile = 0
+        return reconcile_counter(conn)
+
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT TOP 1 model_version, trained_watermark, new_feedback, new_positive "
+        f"FROM {COUNTER_TABLE} ORDER BY model_version DESC"
+    )
+    row = cur.fetchone()
+    cur.close()
+    return CounterState(*row)
+
+
+# --------------------------------------------------------------
+# Version bookkeeping
+# --------------------------------------------------------------
+def start_model_version(conn, current: CounterState) -> Optional[int]:
+    """
+    Claim the next model version at train start.
+
+    The new row's watermark is the current MAX(Feedback.id), so feedback
+    arriving while training runs is counted towards the *next* retrain.
+    Returns None if another process already claimed the version.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM Feedback")
+    watermark = cur.fetchone()[0]
+    new_version = current.model_version + 1
+    try:
+        cur.execute(
+            f"INSERT INTO {COUNTER_TABLE} (model_version, trained_watermark) VALUES (?, ?)",
+            new_version, watermark,
+        )
+        conn.commit()
+    except Exception as exc:  # PK ihlali → başka bir süreç önce davrandı
+        conn.rollback()
+        logger.info("Model version %d already claimed (%s)", new_version, exc)
+        return None
+    finally:
+        cur.close()
+    logger.info("Model version %d started (watermark id=%d)", new_version, watermark)
+    return new_version
+
+
+def abandon_model_version(conn, model_version: int) -> None:
+    """Drop a claimed version after a failed retrain and restore the previous counter."""
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {COUNTER_TABLE} WHERE model_version = ?", model_version)
+    conn.commit()
+    cur.close()
+    reconcile_counter(conn)
@@ -0,0 +1,263 @@
+# retrain_worker.py – Background retraining worker with a file-based job queue
+# --------------------------------------------------------------
+# • app.py only calls enqueue_retrain() and returns; the fit happens here,
+#   in a separate process, never inside the Streamlit request
+# • The queue holds at most one *pending* job: every retrain trains on the
+#   full history, so a second pending job would do the same work twice
+# • A job builds model + encoder + parsed rules + KB into a staging
+#   directory and promotes it with model_registry.promote()
+# • The staged KB is the parent release's KB forked with kb_journal.fork_kb
+#   (hard-linked snapshot + journal copy); the merge appends only its deltas
+#   and the snapshot is rewritten only when maybe_compact() says the journal
+#   is long enough. knowledge_base.sqlite is the parent's DB copied and
+#   updated with the same merge (transactional upserts of the deltas); it is
+#   built from scratch only for the first release or an outdated schema
+# • An OS lock (flock / msvcrt) on jobs/worker.lock keeps a single worker;
+#   the kernel drops it when the worker dies, so there is no stale-lock
+#   cleanup to race on. jobs/worker.heartbeat tells app.py whether a worker
+#   is running; it starts one (`--once`) when none is
+#
+#   Kullanım:
+#     python retrain_worker.py            # sürekli çalışan worker
+#     python retrain_worker.py --once     # kuyruk boşalınca çık
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import model_registry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+JOBS_DIR = Path("jobs")
+PENDING_FILE = JOBS_DIR / "pending.json"
+RUNNING_FILE = JOBS_DIR / "running.json"
+LOCK_FILE = JOBS_DIR / "worker.lock"               # kalıcı; asla silinmez
+HEARTBEAT_FILE = JOBS_DIR / "worker.heartbeat"
+
+POLL_SECONDS = 2.0
+HEARTBEAT_SECONDS = 10.0
+STALE_AFTER_SECONDS = 60.0
+
+TRAIN_ARGS = ["--incremental"]          # learning_engine decides when a full rebuild is due
+MINER_ARGS = ["--incremental", "--min-support", "0.01", "--min-confidence", "0.01"]   # yalnızca yeni satırlar sayılır
+
+
+# --------------------------------------------------------------
+# Queue (producer side – called from app.py)
+# --------------------------------------------------------------
+def enqueue_retrain(reason: Optional[Dict] = None) -> bool:
+    """
+    Queue a retrain job. Returns False if one is already pending (de-dup).
+
+    The job file is written under a temp name and hard-linked into place,
+    which fails atomically if pending.json already exists.
+    """
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    job = {"job_id": uuid.uuid4().hex, "enqueued_at": time.time(), "reason": reason or {}}
+    tmp = JOBS_DIR / f".job-{job['job_id']}.tmp"
+    tmp.write_text(json.dumps(job), encoding="utf-8")
+    try:
+        os.link(tmp, PENDING_FILE)
+    except FileExistsError:
+        logger.info("Retrain already pending – job de-duplicated.")
+        return False
+    finally:
+        tmp.unlink(missing_ok=True)
+    logger.info("Retrain job %s queued.", job["job_id"])
+    return True
+
+
+def worker_alive() -> bool:
+    try:
+        return time.time() - HEARTBEAT_FILE.stat().st_mtime < STALE_AFTER_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def spawn_worker() -> None:
+    """Start a detached `--once` worker if none is alive."""
+    if worker_alive():
+        return
+    kwargs: Dict = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "--once"], **kwargs)
+    logger.info("Retrain worker spawned.")
+
+
+# --------------------------------------------------------------
+# Worker side
+# --------------------------------------------------------------
+_lock_fd: Optional[int] = None
+
+
+def _acquire_lock() -> bool:
+    """Non-blocking exclusive lock on LOCK_FILE; held until _release_lock() or process exit."""
+    global _lock_fd
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(LOCK_FILE, os.O_CREAT | os.O_RDWR)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return False
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _lock_fd = fd
+    HEARTBEAT_FILE.touch()
+    return True
+
+
+def _release_lock() -> None:
+    global _lock_fd
+    HEARTBEAT_FILE.unlink(missing_ok=True)
+    if _lock_fd is None:
+        return
+    if fcntl is None:
+        os.lseek(_lock_fd, 0, os.SEEK_SET)
+        msvcrt.locking(_lock_fd, msvcrt.LK_UNLCK, 1)
+    os.close(_lock_fd)                                  # flock kapanışla bırakılır
+    _lock_fd = None
+
+
+def _heartbeat(stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_SECONDS):
+        HEARTBEAT_FILE.touch()
+
+
+def _claim_job() -> Optional[Dict]:
+    try:
+        os.replace(PENDING_FILE, RUNNING_FILE)
+    except FileNotFoundError:
+        return None
+    with RUNNING_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_release_kb(parsed_path: Path, staging: Path) -> Dict:
+    """
+    Staged KB (JSON + SQLite) = the current release's KB plus the merge of
+    *parsed_path*, written as deltas. Returns update_knowledge_base()'s counts.
+    """
+    from kb_journal import fork_kb, maybe_compact
+    from kb_sqlite import import_json, schema_current
+    from kb_stats import stats_path
+    from kb_updater import update_knowledge_base
+
+    parent = model_registry.release_paths()
+    # release'ler değişmez: yeni KB = ebeveynin snapshot'ı (hard link) + journal kopyası + bu işin delta'ları
+    staged_kb = staging / model_registry.KB_FILE
+    fork_kb(parent["kb"], staged_kb)
+    if stats_path(parent["kb"]).exists():
+        shutil.copy2(stats_path(parent["kb"]), stats_path(staged_kb))
+    kb_stats = update_knowledge_base(parsed_path, staged_kb, compact=False)
+    maybe_compact(staged_kb, background=False)
+
+    # SQLite: ebeveynin DB'si kopyalanır, aynı birleştirme tek transaction'da upsert edilir
+    staged_db = staging / model_registry.KB_DB_FILE
+    if parent.get("kb_db") is not None and schema_current(parent["kb_db"]):
+        shutil.copy2(parent["kb_db"], staged_db)
+        if stats_path(parent["kb_db"]).exists():
+            shutil.copy2(stats_path(parent["kb_db"]), stats_path(staged_db))
+        update_knowledge_base(parsed_path, staged_db)
+    else:
+        import_json(staged_kb, staged_db)                # ilk release ya da eski şema
+    return kb_stats
+
+
+def run_retrain_job(job: Dict) -> str:
+    """Build a full release in staging and promote it. Returns the release id."""
+    from data_handling import sql_connect
+    from retrain_counter import abandon_model_version, pending_feedback, start_model_version
+
+    # Feedback arriving from now on counts towards the next retrain
+    conn = sql_connect()
+    model_version = start_model_version(conn, pending_feedback(conn))
+
+    release_id, staging = model_registry.new_staging_dir()
+    logger.info("Job %s → building release %s (model v%s)", job["job_id"], release_id, model_version)
+    try:
+        subprocess.run([sys.executable, "learning_engine.py", *TRAIN_ARGS, "--output-dir", str(staging)], check=True)
+        subprocess.run(
+            [sys.executable, "learning_engine_v2.py", *MINER_ARGS, "--output", str(staging / "parsed_rules.json")],
+            check=True,
+        )
+        kb_stats = build_release_kb(staging / "parsed_rules.json", staging)
+        model_registry.promote(release_id, extra={"job_id": job["job_id"], "model_version": model_version,
+                                                  "kb_update": kb_stats})
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        if model_version is not None:
+            abandon_model_version(conn, model_version)
+        raise
+    finally:
+        conn.close()
+    return release_id
+
+
+def run_worker(once: bool = False, poll_seconds: float = POLL_SECONDS) -> None:
+    if not _acquire_lock():
+        logger.info("Another retrain worker is alive – exiting.")
+        return
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(stop,), daemon=True).start()
+    try:
+        while True:
+            job = _claim_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            try:
+                run_retrain_job(job)
+            except Exception as exc:
+                logger.error("Retrain job %s failed: %s", job.get("job_id"), exc)
+            finally:
+                RUNNING_FILE.unlink(missing_ok=True)
+    finally:
+        stop.set()
+        _release_lock()
+
+
+# --------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Background retraining worker")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="Queue poll interval (seconds)")
+    args = parser.parse_args()
+
+    # Göreli yollar (models/, jobs/, knowledge_base.json) proje köküne göre
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    run_worker(once=args.once, poll_seconds=args.poll)
@@ -10,6 +10,12 @@
 #    Negative rules  → "ÖNERME"        (feedback == 0)
 #    Meta‑rules      → frame ekleme/çıkarma (örn. "succulent" tipi bitkileri ekle)
 #
+# B) STORAGE
+#    knowledge_base.json (+ journal) is loaded whole into memory; a *.sqlite
+#    KB (kb_sqlite) is queried per profile through its (attribute, value)
+#    index instead, so only the matching rules are ever read. A DB of an
+#    older kb_sqlite schema is skipped for the sibling knowledge_base.json.
+#
 
 # --------------------------------------------------------------
 
@@ -18,10 +24,16 @@ from __future__ import annotations
 import json
 import logging
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Dict, List, Set
 
 import pandas as pd
 
+import kb_sqlite
+import profiling
+import tracing
+from kb_journal import load_kb
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -54,8 +66,8 @@ class KnowledgeBase:
     """Load & organise rules / meta‑rules / frames from JSON."""
 
     def __init__(self, kb_path: str = "knowledge_base.json") -> None:
-        with open(kb_path, "r", encoding="utf-8") as f:
-            kb = json.load(f)
+        with tracing.span("kb_load"):
+            kb = load_kb(kb_path)                  # snapshot + journal
 
         def _strip(rule_dict: dict) -> dict:
             return {
@@ -83,6 +95,64 @@ class KnowledgeBase:
             len(self.positive_rules), len(self.negative_rules)
         )
 
+    def _rules(self, list_name: str) -> List[Rule]:
+        return self.positive_rules if list_name == "positive_rules" else self.negative_rules
+
+    def exact_rule(self, user_input: Dict[str, str]) -> Rule | None:
+        """First positive rule whose conditions equal the profile."""
+        return next((r for r in self.positive_rules if r.matches(user_input, exact=True)), None)
+
+    def matching_rules(self, user_input: Dict[str, str], list_name: str = "positive_rules") -> List[Rule]:
+        """Rules whose conditions are a subset of the profile, in KB order."""
+        return [r for r in self._rules(list_name) if r.matches(user_input)]
+
+
+class SqliteKnowledgeBase:
+    """Same interface as KnowledgeBase, answered by indexed queries on a kb_sqlite DB."""
+
+    def __init__(self, kb_path: str) -> None:
+        with tracing.span("kb_open"):
+            self.conn = kb_sqlite.connect(kb_path, readonly=True)
+            meta = kb_sqlite.load_meta(self.conn)
+        self.meta_rules: List[dict] = meta.get("meta_rules", [])
+        self.frames: Dict[str, List[str]] = meta.get("frames", {})
+        logger.info("KB opened (sqlite) – %s", kb_sqlite.rule_counts(self.conn))
+
+    @staticmethod
+    def _to_rule(rule_dict: dict) -> Rule:
+        return Rule(
+            conditions=rule_dict["conditions"],
+            suggested_plant=rule_dict["suggested_plant"],
+            feedback=rule_dict.get("feedback", 1),
+            confidence=rule_dict.get("confidence", 1.0),
+            lift=rule_dict.get("lift", 1.0),
+            support=rule_dict.get("support", 0.0),
+        )
+
+    def exact_rule(self, user_input: Dict[str, str]) -> Rule | None:
+        found = kb_sqlite.match_rules(self.conn, user_input, exact=True, limit=1)
+        return self._to_rule(found[0]) if found else None
+
+    def matching_rules(self, user_input: Dict[str, str], list_name: str = "positive_rules") -> List[Rule]:
+        return [self._to_rule(r) for r in kb_sqlite.match_rules(self.conn, user_input, list_name)]
+
+
+def open_knowledge_base(kb_path: str = "knowledge_base.json") -> KnowledgeBase | SqliteKnowledgeBase:
+    """
+    JSON KB (snapshot + journal) or an indexed SQLite KB, chosen by file suffix.
+    A SQLite KB of another schema version falls back to the JSON KB next to it.
+    """
+    if not kb_sqlite.is_kb_db(kb_path):
+        return KnowledgeBase(kb_path)
+    try:
+        return SqliteKnowledgeBase(kb_path)
+    except kb_sqlite.SchemaVersionError as exc:
+        json_path = Path(kb_path).with_suffix(".json")
+        if not json_path.exists():
+            raise
+        logger.warning("%s – falling back to %s", exc, json_path)
+        return KnowledgeBase(str(json_path))
+
 
 # --------------------------------------------------------------
 #  Rule Engine
@@ -92,7 +162,7 @@ class RuleEngine:
 
     def __init__(self, plants_df: pd.DataFrame, kb_path: str = "knowledge_base.json") -> None:
         self.plants_df = plants_df.copy()
-        self.kb = KnowledgeBase(kb_path)
+        self.kb = open_knowledge_base(kb_path)
 
     # ----------------------------------------------------------
     # Public API
@@ -102,6 +172,7 @@ class RuleEngine:
 
     logger = logging.getLogger(__name__)
 
+    @profiling.profiled("get_candidates")
     def get_candidates(self, user_input: Dict[str, str], top_n: int = 5) -> List[str]:
         """Return up to *top_n* plant names matching the rule logic."""
 
@@ -111,16 +182,17 @@ class RuleEngine:
         #     return []
 
         # Step 2 – exact positive match first (highest precision)
-        for rule in self.kb.positive_rules:
-            if rule.matches(user_input, exact=True):  # Eğer exact match kontrolü varsa
-                logger.info(" Exact positive rule match → %s", rule.suggested_plant)
-                return [rule.suggested_plant]
+        with tracing.span("rule_exact_match"):
+            rule = self.kb.exact_rule(user_input)
+        if rule is not None:
+            tracing.count("rule_exact_hits")
+            logger.info(" Exact positive rule match → %s", rule.suggested_plant)
+            return [rule.suggested_plant]
 
         # Step 3 – collect partial positive matches (recall)
-        matches = []
-        for rule in self.kb.positive_rules:
-            if rule.matches(user_input):
-                matches.append(rule)
+        with tracing.span("rule_partial_match"):
+            matches = self.kb.matching_rules(user_input)
+        tracing.count("rules_matched", len(matches))
 
         # Güvenilirliğe göre sırala: confidence ve lift yüksek olanlar öne alınır
         matches.sort(key=lambda r: (getattr(r, 'confidence', 0), getattr(r, 'lift', 0)), reverse=True)
@@ -138,7 +210,8 @@ class RuleEngine:
 
         # Step 4 – meta-rules (eğer varsa etkili olsun)
         if hasattr(self, '_apply_meta_rules'):
-            self._apply_meta_rules(user_input, candidates, top_n)
+            with tracing.span("meta_rules"):
+                self._apply_meta_rules(user_input, candidates, top_n)
 
         # Step 5 – yetersizse genel bitki listesinden tamamla
         if len(candidates) < top_n and hasattr(self, 'plants_df'):
@@ -156,15 +229,14 @@ class RuleEngine:
     # ----------------------------------------------------------
     def _is_forbidden(self, user_input: Dict[str, str]) -> bool:
         """Return True if ANY negative rule fully matches the profile."""
-        return any(r.matches(user_input) for r in self.kb.negative_rules)
+        return bool(self.kb.matching_rules(user_input, "negative_rules"))
 
     def _collect_partial_matches(self, user_input: Dict[str, str]) -> List[str]:
         """Add suggested_plant for every positive rule whose *subset* matches."""
         cands: List[str] = []
-        for rule in self.kb.positive_rules:
-            if rule.conditions.items() <= user_input.items():  # subset match
-                if rule.suggested_plant not in cands:
-                    cands.append(rule.suggested_plant)
+        for rule in self.kb.matching_rules(user_input):  # subset match
+            if rule.suggested_plant not in cands:
+                cands.append(rule.suggested_plant)
         return cands
 
     def _apply_meta_rules(self, user_input: Dict[str, str], cands: List[str], top_n: int) -> None:
@@ -200,7 +272,7 @@ if __name__ == "__main__":
     import pandas as pd
 
     parser = argparse.ArgumentParser(description="RuleEngine demo runner")
-    parser.add_argument("--kb", default="knowledge_base.json", help="Path to KB JSON")
+    parser.add_argument("--kb", default="knowledge_base.json", help="Path to KB JSON (or *.sqlite)")
     parser.add_argument("--csv", required=True, help="plants.csv (must have plant_name column)")
     args = parser.parse_args()
 
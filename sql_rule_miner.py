@@ -0,0 +1,170 @@
+# sql_rule_miner.py – profile → plant rule statistics computed inside the database
+# --------------------------------------------------------------
+# • Support, confidence and lift of a rule A → plant are ratios of three
+#   counts: |A ∧ plant|, |A| and |plant| within one feedback class. All of
+#   them are computed with GROUP BY in the database; only aggregated rows
+#   (already filtered by min_support / min_confidence) reach Python
+# • One query per condition-column subset (up to MAX_CONDITIONS columns):
+#   GROUP BY subset + suggested_plant gives |A ∧ plant|, a window
+#   SUM(COUNT(*)) OVER (PARTITION BY subset) gives |A|
+# • Works on SQL Server (pyodbc) and SQLite ≥ 3.25 (window functions); for a
+#   local stand-in, `export-sqlite` copies a feedback_store snapshot into a
+#   SQLite Feedback table
+#
+#   Kullanım:
+#     python sql_rule_miner.py mine --min-support 0.01 --min-confidence 0.3
+#     python sql_rule_miner.py export-sqlite --snapshot data/feedback_snapshot --db data/feedback.sqlite
+#     python sql_rule_miner.py mine --sqlite data/feedback.sqlite
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from learning_engine_v2 import CAT_COLS, ITEM_COLS, _rule_sort_key, sql_connect
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+TABLE = "Feedback"
+MAX_CONDITIONS = 3
+
+
+def _rule_count_sql(cols: Sequence[str]) -> str:
+    group = ", ".join(cols)
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in (*cols, "suggested_plant"))
+    return f"""
+        SELECT {group}, suggested_plant, n, n_ante FROM (
+            SELECT {group}, suggested_plant, COUNT(*) AS n,
+                   SUM(COUNT(*)) OVER (PARTITION BY {group}) AS n_ante
+            FROM {TABLE}
+            WHERE user_feedback = ? AND {not_null}
+            GROUP BY {group}, suggested_plant
+        ) AS t
+        WHERE n >= ? AND n >= ? * n_ante
+    """
+
+
+def _params(cur, *values) -> tuple:
+    # pyodbc: execute(sql, *params) · sqlite3: execute(sql, params)
+    return (values,) if isinstance(cur, sqlite3.Cursor) else values
+
+
+def mine_class_rules(
+    conn,
+    flag: int,
+    *,
+    min_support: float,
+    min_confidence: float,
+    max_conditions: int = MAX_CONDITIONS,
+    top_n: Optional[int] = 20,
+) -> List[Dict]:
+    """Rules of one feedback class from GROUP BY aggregates only."""
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT suggested_plant, COUNT(*) FROM {TABLE} WHERE user_feedback = ? GROUP BY suggested_plant",
+        *_params(cur, flag),
+    )
+    plant_counts = {str(plant): int(n) for plant, n in cur.fetchall() if plant is not None}
+    cur.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE user_feedback = ?", *_params(cur, flag))
+    n_rows = int(cur.fetchone()[0])
+    if n_rows == 0:
+        logger.info("No records for feedback=%d", flag)
+        return []
+    min_count = max(min_support * n_rows, 1)
+
+    rules: List[Dict] = []
+    for k in range(1, max_conditions + 1):
+        for cols in combinations(CAT_COLS, k):
+            cur.execute(_rule_count_sql(cols), *_params(cur, flag, min_count, min_confidence))
+            for row in cur.fetchall():
+                *values, plant, n, n_ante = row
+                confidence = n / n_ante
+                plant = str(plant)
+                rules.append({
+                    "conditions": {col: [str(val)] for col, val in zip(cols, values)},
+                    "suggested_plant": plant,
+                    "feedback": flag,
+                    "support": n / n_rows,
+                    "confidence": confidence,
+                    "lift": confidence / (plant_counts[plant] / n_rows),
+                })
+    cur.close()
+    rules.sort(key=_rule_sort_key)
+    logger.info("feedback=%d → %d rules from %d aggregate queries", flag, len(rules),
+                sum(len(list(combinations(CAT_COLS, k))) for k in range(1, max_conditions + 1)))
+    return rules[:top_n] if top_n else rules
+
+
+def mine_rules_sql(
+    conn=None,
+    *,
+    min_support: float = 0.005,
+    min_confidence: float = 0.1,
+    max_conditions: int = MAX_CONDITIONS,
+    output_path: str = "parsed_rules.json",
+) -> List[Dict]:
+    """Both feedback classes → parsed_rules.json (same format as learning_engine_v2)."""
+    own_conn = conn is None
+    conn = conn or sql_connect()
+    try:
+        parsed: List[Dict] = []
+        for flag in (1, 0):
+            parsed.extend(mine_class_rules(conn, flag, min_support=min_support,
+                                           min_confidence=min_confidence, max_conditions=max_conditions))
+    finally:
+        if own_conn:
+            conn.close()
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(parsed, f, ensure_ascii=False, indent=2)
+    logger.info("Saved %d parsed rules → %s", len(parsed), output_path)
+    return parsed
+
+
+# --------------------------------------------------------------
+# Yerel SQLite kopyası
+# --------------------------------------------------------------
+def export_sqlite(snapshot: str, db_path: str) -> int:
+    """Copy the Feedback columns of a feedback_store snapshot into SQLite (with a class index)."""
+    from feedback_store import read_feedback_snapshot
+
+    df = read_feedback_snapshot(snapshot, columns=["id"] + ITEM_COLS + ["user_feedback"])
+    for col in ITEM_COLS:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    with sqlite3.connect(db_path) as conn:
+        df.to_sql(TABLE, conn, if_exists="replace", index=False)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_feedback_class ON {TABLE} (user_feedback, suggested_plant)")
+    logger.info("Exported %d rows → %s", len(df), db_path)
+    return len(df)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mine profile → plant rules with GROUP BY pushdown")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_mine = sub.add_parser("mine")
+    p_mine.add_argument("--sqlite", help="SQLite database instead of the SQL Server connection")
+    p_mine.add_argument("--min-support", type=float, default=0.01)
+    p_mine.add_argument("--min-confidence", type=float, default=0.3)
+    p_mine.add_argument("--max-conditions", type=int, default=MAX_CONDITIONS)
+    p_mine.add_argument("--output", default="parsed_rules.json")
+    p_exp = sub.add_parser("export-sqlite")
+    p_exp.add_argument("--snapshot", required=True)
+    p_exp.add_argument("--db", required=True)
+    args = parser.parse_args()
+
+    if args.command == "export-sqlite":
+        export_sqlite(args.snapshot, args.db)
+    else:
+        connection = sqlite3.connect(args.sqlite) if args.sqlite else None
+        mine_rules_sql(connection, min_support=args.min_support, min_confidence=args.min_confidence,
+                       max_conditions=args.max_conditions, output_path=args.output)
@@ -0,0 +1,18 @@
+# test_data_handling.py – Ordinal encoding of columns without any value
+# --------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from data_handling import ENC_COLS, encode_categorical
+
+
+def test_encode_column_without_categories(tmp_path):
+    df = pd.DataFrame({col: ["b", "a", "b"] for col in ENC_COLS})
+    df[ENC_COLS[0]] = np.nan                                  # geçerli ama boş sütun
+
+    encoded = encode_categorical(df, encoder_path=str(tmp_path / "encoder.pkl"))
+
+    assert encoded[ENC_COLS[0]].tolist() == [-1, -1, -1]
+    assert encoded[ENC_COLS[1]].tolist() == [1, 0, 1]
+    assert (tmp_path / "encoder.pkl").exists()
@@ -0,0 +1,40 @@
+# test_dbye_ekle.py – Synthetic feedback output never deletes a foreign directory
+# --------------------------------------------------------------
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from dbye_ekle import generate_feedback, write_feedback
+from feedback_store import META_FILE, read_feedback_snapshot
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_snapshot_only_with_explicit_format(tmp_path):
+    target = tmp_path / "data"
+    target.mkdir()
+    (target / "keep.txt").write_text("x", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        write_feedback(str(target), generate_feedback(100, seed=1))
+    with pytest.raises(FileExistsError):
+        write_feedback(str(target), generate_feedback(100, seed=1), fmt="snapshot")
+    assert (target / "keep.txt").exists()
+
+
+def test_snapshot_is_replaced(tmp_path):
+    snapshot = tmp_path / "snapshot"
+    assert write_feedback(str(snapshot), generate_feedback(100, seed=1), fmt="snapshot") == 100
+    assert (snapshot / META_FILE).exists()
+    assert write_feedback(str(snapshot), generate_feedback(50, seed=2), fmt="snapshot") == 50
+    assert len(read_feedback_snapshot(snapshot)) == 50
+
+
+def test_cli_requires_output_with_rows():
+    proc = subprocess.run([sys.executable, str(ROOT / "dbye_ekle.py"), "--rows", "10"],
+                          capture_output=True, text=True, cwd=ROOT)
+    assert proc.returncode == 2
+    assert "--output is required" in proc.stderr
@@ -0,0 +1,57 @@
+# test_incremental_miner.py – Itemset counts must survive a change of entry point
+# --------------------------------------------------------------
+# `python incremental_miner.py --rebuild` runs the module as __main__, while
+# the retrain worker reaches the same counts through learning_engine_v2
+# --incremental → mine_incremental → ItemsetCounter.load.
+# --------------------------------------------------------------
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from dbye_ekle import generate_feedback
+from feedback_store import write_feedback_snapshot
+from incremental_miner import ItemsetCounter, mine_incremental
+
+ROOT = Path(__file__).resolve().parents[1]
+N_ROWS = 3000
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    root = tmp_path / "snapshot"
+    write_feedback_snapshot(generate_feedback(N_ROWS, [f"Plant {i}" for i in range(10)], chunk_rows=1000), root)
+    return root
+
+
+def test_counts_saved_by_cli_load_in_worker(snapshot, tmp_path):
+    counts = tmp_path / "itemset_counts.json"
+    cli_rules = tmp_path / "cli_rules.json"
+    subprocess.run(
+        [sys.executable, str(ROOT / "incremental_miner.py"), "--rebuild", "--snapshot", str(snapshot),
+         "--counts", str(counts), "--output", str(cli_rules)],
+        check=True, cwd=tmp_path,
+    )
+
+    worker_rules = tmp_path / "worker_rules.json"
+    counter = mine_incremental(snapshot=str(snapshot), counts_path=str(counts), output_path=str(worker_rules),
+                               min_support=0.01, min_confidence=0.3)
+
+    assert counter.watermark == N_ROWS
+    assert sum(counter.n_rows.values()) == N_ROWS            # hiçbir satır iki kez sayılmadı
+    assert json.loads(worker_rules.read_text(encoding="utf-8")) == json.loads(cli_rules.read_text(encoding="utf-8"))
+
+
+def test_plain_data_round_trip(snapshot, tmp_path):
+    from feedback_store import read_feedback_snapshot
+
+    counter = ItemsetCounter(max_len=3)
+    counter.update(read_feedback_snapshot(str(snapshot)))
+    counter.save(str(tmp_path / "counts.json"))
+    loaded = ItemsetCounter.load(str(tmp_path / "counts.json"))
+
+    for attr in ("counts", "decayed", "n_rows", "decayed_rows", "watermark", "landmark", "latest", "max_len"):
+        assert getattr(loaded, attr) == getattr(counter, attr), attr
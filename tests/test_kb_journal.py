@@ -0,0 +1,61 @@
+# test_kb_journal.py – Journal deltas (stats refreshes are in-place updates), forked release KBs
+# --------------------------------------------------------------
+
+import json
+
+import kb_sqlite
+from kb_journal import append_entries, apply_entries, compact, diff_entries, fork_kb, journal_path, load_kb
+from kb_stats import apply_entries as apply_stats, compute_stats
+
+
+def _rule(area, plant, confidence):
+    return {"conditions": {"area_size": area}, "suggested_plant": plant, "feedback": 1,
+            "support": 0.01, "confidence": confidence, "lift": 1.5}
+
+
+OLD = {"positive_rules": [_rule(f"v{i}", f"Plant {i}", 0.5) for i in range(5)], "negative_rules": []}
+
+
+def _new():
+    rules = [dict(r) for r in OLD["positive_rules"]]
+    rules[2]["confidence"] = 0.9                    # tazelenen istatistik
+    del rules[3]                                    # silinen kural
+    rules.append(_rule("v9", "Plant 9", 0.7))       # yeni kural
+    return {"positive_rules": rules, "negative_rules": []}
+
+
+def test_stats_change_is_an_update_entry():
+    entries = diff_entries(OLD, _new())
+    assert sorted(e["op"] for e in entries) == ["add", "remove", "update"]
+    replayed = apply_entries(json.loads(json.dumps(OLD)), [{**e, "seq": i + 1} for i, e in enumerate(entries)])
+    assert replayed["positive_rules"] == _new()["positive_rules"]
+
+
+def test_sqlite_and_stats_follow_the_update(tmp_path):
+    kb = tmp_path / "knowledge_base.json"
+    kb.write_text(json.dumps(OLD), encoding="utf-8")
+    db = kb_sqlite.import_json(kb, tmp_path / "knowledge_base.sqlite")
+    entries = diff_entries(OLD, _new())
+
+    kb_sqlite.apply_entries(db, entries)
+    assert kb_sqlite.load_kb(db)["positive_rules"] == _new()["positive_rules"]
+
+    stats = apply_stats(compute_stats(OLD), entries, OLD)
+    expected = compute_stats(_new())
+    assert stats["lists"] == expected["lists"]
+
+
+def test_fork_shares_the_snapshot_and_never_touches_the_parent(tmp_path):
+    parent, child = tmp_path / "parent.json", tmp_path / "child.json"
+    parent.write_text(json.dumps(OLD), encoding="utf-8")
+    append_entries(parent, [{"op": "add", "list": "positive_rules", "rule": _rule("v7", "Plant 7", 0.4)}])
+
+    fork_kb(parent, child)
+    assert child.stat().st_ino == parent.stat().st_ino              # hard link, snapshot yeniden yazılmadı
+    append_entries(child, diff_entries(load_kb(child), {**load_kb(child), **_new()}))
+    compact(child)
+
+    assert load_kb(child)["positive_rules"] == _new()["positive_rules"]
+    assert len(load_kb(parent)["positive_rules"]) == 6
+    assert json.loads(parent.read_text(encoding="utf-8")) == OLD
+    assert len(journal_path(parent).read_text(encoding="utf-8").splitlines()) == 1
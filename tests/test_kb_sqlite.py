@@ -0,0 +1,67 @@
+# test_kb_sqlite.py – Schema versioning: old DBs are never queried, only rebuilt
+# --------------------------------------------------------------
+
+import json
+import sqlite3
+
+import kb_sqlite
+from kb_updater import update_knowledge_base
+from rule_engine import KnowledgeBase, SqliteKnowledgeBase, open_knowledge_base
+
+RULE = {"conditions": {"area_size": "Small"}, "suggested_plant": "Aloe", "feedback": 1,
+        "support": 0.01, "confidence": 0.8, "lift": 2.0}
+
+
+def _old_db(path):
+    """DB as built before cond_key / schema versioning existed."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE rules (id INTEGER PRIMARY KEY, list TEXT NOT NULL, rule_key TEXT NOT NULL,
+                            suggested_plant TEXT, feedback INTEGER NOT NULL, confidence REAL NOT NULL,
+                            lift REAL NOT NULL, support REAL NOT NULL, n_conditions INTEGER NOT NULL,
+                            body TEXT NOT NULL, UNIQUE (list, rule_key));
+        CREATE TABLE rule_conditions (rule_id INTEGER NOT NULL, attribute TEXT NOT NULL, value TEXT NOT NULL,
+                                      PRIMARY KEY (rule_id, attribute));
+        CREATE TABLE kb_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """)
+    conn.execute("INSERT INTO rules VALUES (1, 'positive_rules', 'k', 'Aloe', 1, 0.8, 2.0, 0.01, 1, ?)",
+                 (json.dumps(RULE),))
+    conn.execute("INSERT INTO rule_conditions VALUES (1, 'area_size', 'Small')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_import_stores_schema_version(tmp_path):
+    kb = tmp_path / "knowledge_base.json"
+    kb.write_text(json.dumps({"positive_rules": [RULE], "negative_rules": []}), encoding="utf-8")
+    db = kb_sqlite.import_json(kb, tmp_path / "knowledge_base.sqlite")
+
+    assert kb_sqlite.schema_current(db)
+    assert kb_sqlite.SCHEMA_VERSION_KEY not in kb_sqlite.load_kb(db)
+    engine_kb = open_knowledge_base(str(db))
+    assert isinstance(engine_kb, SqliteKnowledgeBase)
+    assert engine_kb.exact_rule({"area_size": "Small"}) is not None
+
+
+def test_old_db_falls_back_to_json(tmp_path):
+    (tmp_path / "knowledge_base.json").write_text(
+        json.dumps({"positive_rules": [RULE], "negative_rules": []}), encoding="utf-8")
+    db = _old_db(tmp_path / "knowledge_base.sqlite")
+
+    assert not kb_sqlite.schema_current(db)
+    engine_kb = open_knowledge_base(str(db))
+    assert isinstance(engine_kb, KnowledgeBase)
+    assert engine_kb.exact_rule({"area_size": "Small"}) is not None
+
+
+def test_updater_rebuilds_old_db(tmp_path):
+    db = _old_db(tmp_path / "knowledge_base.sqlite")
+    parsed = tmp_path / "parsed.json"
+    parsed.write_text(json.dumps([{**RULE, "suggested_plant": "Fern", "conditions": {"has_pet": "Yes"}}]),
+                      encoding="utf-8")
+    update_knowledge_base(parsed, db, compact=True)
+
+    assert kb_sqlite.schema_current(db)
+    plants = {r["suggested_plant"] for r in kb_sqlite.load_kb(db)["positive_rules"]}
+    assert plants == {"Aloe", "Fern"}
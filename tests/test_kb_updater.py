@@ -0,0 +1,67 @@
+# test_kb_updater.py – Subsumption pruning vs. exact matches, stats refresh, locking
+# --------------------------------------------------------------
+
+import json
+import threading
+import time
+
+import pandas as pd
+
+import kb_updater
+from kb_journal import load_kb
+from kb_updater import PROFILE_ATTRS, update_knowledge_base
+from rule_engine import RuleEngine
+
+PROFILE = {attr: "x" for attr in sorted(PROFILE_ATTRS)}
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def _rule(conditions, plant, confidence, lift, feedback=1):
+    return {"conditions": conditions, "suggested_plant": plant, "feedback": feedback,
+            "support": 0.01, "confidence": confidence, "lift": lift}
+
+
+def test_exact_match_rule_is_not_pruned(tmp_path):
+    kb = _write(tmp_path / "knowledge_base.json", {"positive_rules": [], "negative_rules": []})
+    parsed = _write(tmp_path / "parsed.json", [
+        _rule(dict(PROFILE), "Aloe", 0.5, 1.5),                # tam profil → exact match
+        _rule({"area_size": "x"}, "Aloe", 0.9, 3.0),          # genel kural, her açıdan daha iyi
+    ])
+    stats = update_knowledge_base(parsed, kb, compact=True)
+    assert stats["pruned_positive"] == 0
+
+    engine = RuleEngine(pd.DataFrame({"plant_name": ["Aloe"]}), kb_path=str(kb))
+    assert engine.kb.exact_rule(PROFILE) is not None
+
+
+def test_existing_rule_stats_are_refreshed(tmp_path):
+    kb = _write(tmp_path / "knowledge_base.json", {"positive_rules": [], "negative_rules": []})
+    update_knowledge_base(_write(tmp_path / "p1.json", [_rule({"area_size": "x"}, "Aloe", 0.2, 1.1)]), kb, compact=True)
+    stats = update_knowledge_base(_write(tmp_path / "p2.json", [_rule({"area_size": "x"}, "Aloe", 0.7, 2.5)]), kb, compact=True)
+
+    rules = json.loads(kb.read_text(encoding="utf-8"))["positive_rules"]
+    assert stats["refreshed"] == 1
+    assert [(r["confidence"], r["lift"]) for r in rules] == [(0.7, 2.5)]
+
+
+def test_concurrent_merges_keep_every_rule(tmp_path, monkeypatch):
+    diff = kb_updater.diff_entries
+    monkeypatch.setattr(kb_updater, "diff_entries", lambda old, new: time.sleep(0.05) or diff(old, new))
+    kb = _write(tmp_path / "knowledge_base.json",
+                {"positive_rules": [_rule({"area_size": "x"}, "Aloe", 0.2, 1.1)], "negative_rules": []})
+    # her birleştirme ortak kuralın istatistiğini tazeler ve kendi kuralını ekler
+    parsed = [_write(tmp_path / f"p{i}.json", [_rule({"area_size": "x"}, "Aloe", 0.3 + i / 100, 1.1),
+                                               _rule({"area_size": f"v{i}"}, f"Plant {i}", 0.5, 1.5)])
+              for i in range(8)]
+    threads = [threading.Thread(target=update_knowledge_base, args=(p, kb), kwargs={"compact": False}) for p in parsed]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    plants = sorted(r["suggested_plant"] for r in load_kb(kb)["positive_rules"])
+    assert plants == ["Aloe"] + [f"Plant {i}" for i in range(8)]           # kayıp yok, çift kopya yok
@@ -0,0 +1,24 @@
+# test_learning_engine.py – Streaming training on snapshots without hold-out rows
+# --------------------------------------------------------------
+
+import json
+
+import numpy as np
+
+from dbye_ekle import generate_feedback
+from feedback_store import write_feedback_snapshot
+from learning_engine import STREAM_TEST_PERCENT, main_streaming
+
+
+def test_streaming_without_holdout_rows(tmp_path):
+    df = next(generate_feedback(60, seed=7))
+    df["id"] = np.arange(STREAM_TEST_PERCENT, STREAM_TEST_PERCENT + len(df))    # hiçbir id % 100 test dilimine düşmez
+    write_feedback_snapshot([df], tmp_path / "snapshot")
+
+    models = tmp_path / "models"
+    main_streaming(str(tmp_path / "snapshot"), output_dir=str(models), report_dir=str(tmp_path), params_path=None)
+
+    assert (models / "feedback_model.ubj").exists()
+    assert not (models / "metrics.json").exists()
+    timings = json.loads((models / "timings.json").read_text(encoding="utf-8"))
+    assert {"encode", "dmatrix", "train", "predict", "save"} <= set(timings)
@@ -0,0 +1,34 @@
+# test_learning_engine_v2.py – Item coding and rule extraction
+# --------------------------------------------------------------
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from dbye_ekle import FORM_OPTIONS, generate_feedback
+from learning_engine_v2 import ITEM_COLS, encode_transactions, mine_association_rules
+
+
+def test_missing_values_produce_no_item():
+    df = pd.DataFrame({col: ["a", "b", "a"] for col in ITEM_COLS})
+    df.loc[1, "has_pet"] = np.nan
+    df.loc[2, "suggested_plant"] = None
+
+    trans, items = encode_transactions(df)
+
+    assert ("has_pet", "nan") not in items and ("suggested_plant", "None") not in items
+    assert trans.sum(axis=1).tolist() == [len(ITEM_COLS), len(ITEM_COLS) - 1, len(ITEM_COLS) - 1]
+
+
+def test_unconstrained_rules_resolve_item_ids(tmp_path):
+    df = next(generate_feedback(2000, [f"Plant {i}" for i in range(3)], seed=11))
+    output = tmp_path / "parsed_rules.json"
+    mine_association_rules(df, min_support=0.02, min_confidence=0.1, output_path=str(output), constrained=False)
+
+    rules = json.loads(output.read_text(encoding="utf-8"))
+    assert rules
+    for rule in rules:
+        assert rule["suggested_plant"] in {"Plant 0", "Plant 1", "Plant 2"}
+        assert set(rule["conditions"]) <= set(FORM_OPTIONS)
+        assert all(v in FORM_OPTIONS[attr] for attr, vals in rule["conditions"].items() for v in vals)
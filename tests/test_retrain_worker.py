@@ -0,0 +1,41 @@
+# test_retrain_worker.py – Release KB is the parent's KB plus deltas, never a rebuild
+# --------------------------------------------------------------
+
+import json
+
+import kb_sqlite
+import model_registry
+from kb_journal import load_kb
+from retrain_worker import build_release_kb
+
+
+def _rule(area, plant, confidence):
+    return {"conditions": {"area_size": area}, "suggested_plant": plant, "feedback": 1,
+            "support": 0.01, "confidence": confidence, "lift": 1.5}
+
+
+def test_release_kb_is_forked_and_upserted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parent = model_registry.RELEASES_DIR / "r1"
+    parent.mkdir(parents=True)
+    kb = {"positive_rules": [_rule(f"v{i}", f"Plant {i}", 0.5) for i in range(3)], "negative_rules": []}
+    (parent / model_registry.KB_FILE).write_text(json.dumps(kb), encoding="utf-8")
+    kb_sqlite.import_json(parent / model_registry.KB_FILE, parent / model_registry.KB_DB_FILE)
+    model_registry.POINTER_FILE.write_text("r1", encoding="utf-8")
+    before = {p.name: p.read_bytes() for p in parent.iterdir() if p.suffix != ".lock"}
+
+    def no_rebuild(*args):
+        raise AssertionError("SQLite KB rebuilt from scratch")
+
+    monkeypatch.setattr(kb_sqlite, "import_json", no_rebuild)
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    parsed = staging / "parsed_rules.json"
+    parsed.write_text(json.dumps([_rule("v1", "Plant 1", 0.9), _rule("v7", "Plant 7", 0.6)]), encoding="utf-8")
+    stats = build_release_kb(parsed, staging)
+
+    assert stats["refreshed"] == 1 and stats["added_positive"] == 1
+    staged = load_kb(staging / model_registry.KB_FILE)["positive_rules"]
+    assert staged == kb_sqlite.load_kb(staging / model_registry.KB_DB_FILE)["positive_rules"]
+    assert [r["confidence"] for r in staged] == [0.5, 0.9, 0.5, 0.6]
+    assert {p.name: p.read_bytes() for p in parent.iterdir() if p.name in before} == before
@@ -0,0 +1,225 @@
+# tracing.py – Lightweight per-stage timers + counters for the serving paths
+# --------------------------------------------------------------
+# • Off by default; PLANT_TRACING=1 (or enable()) turns it on. When off,
+#   span() returns one shared no-op context manager and count() returns
+#   immediately – a flag check per call, nothing is allocated or recorded
+# • A trace is one request (recommend / feedback): start_trace() …
+#   end_trace(). Spans opened in between are summed per stage into the
+#   trace and, on end_trace(), emitted as ONE structured JSON log line:
+#     {"trace": "recommend", "trace_id": "…", "status": "ok", "total_ms": 41.2,
+#      "stages": {"get_candidates": {"ms": 3.1, "calls": 1}, …}, "counters": {…}}
+# • Every span also feeds process-wide histograms; render_prometheus()
+#   returns them in Prometheus text exposition format:
+#     plant_stage_seconds_bucket{stage="predict_proba",le="0.005"} 12
+#     plant_events_total{event="ml_fallback"} 3
+#   end_trace() rewrites PLANT_TRACING_PROM_FILE (node_exporter textfile
+#   collector) and PLANT_TRACING_PORT, when set, serves /metrics from a
+#   daemon thread
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "plant"
+
+_enabled = os.getenv("PLANT_TRACING", "0").lower() in ("1", "true", "yes", "on")
+_lock = threading.Lock()
+_local = threading.local()
+_histograms: Dict[str, List] = {}          # stage → [bucket counts…, +Inf], sum
+_counters: Dict[str, float] = {}
+_server: Optional[threading.Thread] = None
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+# --------------------------------------------------------------
+# Kayıt
+# --------------------------------------------------------------
+def _observe(stage: str, seconds: float) -> None:
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0]
+        hist[0][bisect_left(BUCKETS, seconds)] += 1
+        hist[1] += seconds
+
+
+class _Trace:
+    __slots__ = ("name", "trace_id", "started", "stages", "counters", "fields")
+
+    def __init__(self, name: str, fields: Dict) -> None:
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.fields = fields
+
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.t0
+        _observe(self.stage, elapsed)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            total = trace.stages.setdefault(self.stage, [0.0, 0])
+            total[0] += elapsed
+            total[1] += 1
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage: str):
+    """Time a stage: `with tracing.span("get_candidates"): ...`"""
+    return _Span(stage) if _enabled else _NOOP
+
+
+def count(event: str, value: float = 1) -> None:
+    if not _enabled:
+        return
+    with _lock:
+        _counters[event] = _counters.get(event, 0) + value
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.counters[event] = trace.counters.get(event, 0) + value
+
+
+def start_trace(name: str, **fields) -> None:
+    """Begin a request trace on this thread (an unfinished previous one is dropped)."""
+    if _enabled:
+        _local.trace = _Trace(name, fields)
+
+
+def end_trace(status: str = "ok", **fields) -> Optional[Dict]:
+    """Finish the current trace: JSON log line, end-to-end histogram, Prometheus export."""
+    trace = getattr(_local, "trace", None)
+    if not _enabled or trace is None:
+        return None
+    _local.trace = None
+    total = time.perf_counter() - trace.started
+    _observe(f"{trace.name}_total", total)
+    count(f"{trace.name}_{status}")
+    record = {
+        "trace": trace.name,
+        "trace_id": trace.trace_id,
+        "status": status,
+        "total_ms": round(total * 1e3, 3),
+        "stages": {stage: {"ms": round(ms * 1e3, 3), "calls": calls} for stage, (ms, calls) in trace.stages.items()},
+        "counters": trace.counters,
+        **trace.fields,
+        **fields,
+    }
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+    _export()
+    return record
+
+
+# --------------------------------------------------------------
+# Prometheus
+# --------------------------------------------------------------
+def render_prometheus() -> str:
+    lines = [
+        f"# HELP {METRIC_PREFIX}_stage_seconds Wall time per serving stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+    ]
+    with _lock:
+        histograms = {stage: (list(h[0]), h[1]) for stage, h in _histograms.items()}
+        counters = dict(_counters)
+    for stage, (buckets, total) in sorted(histograms.items()):
+        cumulative = 0
+        for le, n in zip([*map(str, BUCKETS), "+Inf"], buckets):
+            cumulative += n
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+    lines += [
+        f"# HELP {METRIC_PREFIX}_events_total Serving events.",
+        f"# TYPE {METRIC_PREFIX}_events_total counter",
+    ]
+    lines += [f'{METRIC_PREFIX}_events_total{{event="{event}"}} {value:g}' for event, value in sorted(counters.items())]
+    return "\n".join(lines) + "\n"
+
+
+def _export() -> None:
+    prom_file = os.getenv("PLANT_TRACING_PROM_FILE")
+    if prom_file:
+        path = Path(prom_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(render_prometheus(), encoding="utf-8")
+        os.replace(tmp, path)                      # scraper hiçbir zaman yarım dosya görmez
+    port = os.getenv("PLANT_TRACING_PORT")
+    if port and _server is None:
+        serve_metrics(int(port))
+
+
+def serve_metrics(port: int) -> threading.Thread:
+    """Serve render_prometheus() on http://0.0.0.0:<port>/metrics (daemon thread, once per process)."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = render_prometheus().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    with _lock:
+        if _server is None:
+            httpd = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            _server = threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True)
+            _server.start()
+            logger.info("Prometheus metrics on :%d/metrics", port)
+    return _server
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,201 @@
+# tune_feedback_model.py – Parallel CV / hyperparameter search for the feedback model
+# --------------------------------------------------------------
+# • Encodes Feedback once (same ColumnTransformer as learning_engine) into
+#   ONE DMatrix in this process; the CSR it was built from is freed, so the
+#   data exists exactly once (XGBoost's own copy)
+# • Configs run one after another, each on all cores (XGBoost nthread);
+#   a config = k stratified folds, a fold is selected by zeroing the weights
+#   of its test rows (no per-fold row copies) and out-of-fold probabilities
+#   pick the decision threshold for that config
+# • A training callback stops boosting at the wall-clock deadline; the
+#   config cut short is dropped and reported with the count never started
+# • The best config is written to models/best_params.json, which
+#   learning_engine.main() loads automatically
+#
+#   Kullanım:
+#     python tune_feedback_model.py --budget 600 --folds 5
+#     python tune_feedback_model.py --snapshot data/feedback_snapshot --workers 16
+# --------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+import xgboost as xgb
+from scipy import sparse
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from learning_engine import (
+    DECISION_THRESHOLD,
+    TUNED_PARAMS_PATH,
+    XGB_PARAMS,
+    build_column_transformer,
+    fetch_feedback_data,
+    native_params,
+    preprocess_data,
+)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------------------
+# Search space
+# --------------------------------------------------------------
+SEARCH_SPACE = {
+    "n_estimators": [100, 200, 300, 500, 800],
+    "learning_rate": [0.02, 0.05, 0.1, 0.2],
+    "max_depth": [3, 4, 5, 6, 8],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 3, 5, 10],
+}
+THRESHOLDS = np.round(np.arange(0.20, 0.81, 0.05), 2)
+
+
+def sample_configs(n: int, seed: int = 42) -> List[Dict]:
+    """Current defaults first, then *n* - 1 random configs from SEARCH_SPACE."""
+    rng = np.random.default_rng(seed)
+    configs = [{k: v for k, v in XGB_PARAMS.items() if k != "random_state"}]
+    while len(configs) < n:
+        configs.append({k: values[rng.integers(len(values))] for k, values in SEARCH_SPACE.items()})
+    return [{k: (v.item() if hasattr(v, "item") else v) for k, v in c.items()} for c in configs]
+
+
+# --------------------------------------------------------------
+# Cross-validation
+# --------------------------------------------------------------
+class _Deadline(xgb.callback.TrainingCallback):
+    """Stop boosting once the wall-clock budget is spent."""
+
+    def __init__(self, deadline: float) -> None:
+        super().__init__()
+        self.deadline = deadline
+
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+def _evaluate(dmat: xgb.DMatrix, y: np.ndarray, folds: np.ndarray, config: Dict, n_folds: int,
+              nthread: int, deadline: float) -> Dict | None:
+    """
+    k-fold CV of one config; picks the best threshold on OOF scores.
+    Returns None when the deadline stopped training before the config finished.
+
+    Test rows of fold k get weight 0, so they add nothing to gradients,
+    hessians or quantile sketches – training sees only the k-1 train folds.
+    """
+    oof = np.zeros(len(y), dtype=np.float32)
+    t0 = time.perf_counter()
+    for k in range(n_folds):
+        train, test = folds != k, folds == k
+        y_train = y[train]
+        scale = float((y_train == 0).sum()) / max(int((y_train == 1).sum()), 1)
+        params = native_params(scale, {**config, "random_state": XGB_PARAMS["random_state"]})
+        params["nthread"] = nthread
+        dmat.set_weight(train.astype(np.float32))
+        booster = xgb.train(params, dmat, num_boost_round=config["n_estimators"], callbacks=[_Deadline(deadline)])
+        if booster.num_boosted_rounds() < config["n_estimators"]:
+            return None
+        oof[test] = booster.predict(dmat)[test]
+
+    scores = {float(t): f1_score(y, oof >= t, average="macro") for t in THRESHOLDS}
+    best_t = max(scores, key=scores.get)
+    return {
+        "params": config,
+        "threshold": best_t,
+        "cv_macro_f1": round(scores[best_t], 5),
+        "cv_macro_f1_default_threshold": round(f1_score(y, oof >= DECISION_THRESHOLD, average="macro"), 5),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+# --------------------------------------------------------------
+# Driver
+# --------------------------------------------------------------
+def tune(
+    snapshot: str | None = None,
+    *,
+    n_folds: int = 5,
+    n_configs: int = 200,
+    budget_seconds: float = 600.0,
+    workers: int | None = None,
+    output_path: str = TUNED_PARAMS_PATH,
+) -> Dict:
+    nthread = workers or os.cpu_count() or 1
+
+    # 1. Veriyi bir kez encode et – tek DMatrix, ara kopyalar bırakılır
+    df = fetch_feedback_data(snapshot)
+    X_raw, y = preprocess_data(df)
+    del df
+    column_transformer = build_column_transformer(sparse_threshold=1.0)
+    X = sparse.csr_matrix(column_transformer.fit_transform(X_raw), dtype=np.float32)
+    del X_raw
+    y = y.to_numpy().astype(np.int8)
+    folds = np.empty(len(y), dtype=np.int8)
+    for k, (_, test_idx) in enumerate(StratifiedKFold(n_folds, shuffle=True, random_state=42).split(np.zeros(len(y)), y)):
+        folds[test_idx] = k
+    logger.info("Encoded %d rows × %d features (nnz=%d); %d folds, %d threads, budget %.0fs",
+                X.shape[0], X.shape[1], X.nnz, n_folds, nthread, budget_seconds)
+    dmat = xgb.DMatrix(X, label=y, nthread=nthread)
+    del X
+
+    # 2. Config'ler sırayla, her biri tüm çekirdeklerde
+    results: List[Dict] = []
+    dropped: List[Dict] = []
+    deadline = time.monotonic() + budget_seconds
+    configs = sample_configs(n_configs)
+    for config in configs:
+        if time.monotonic() >= deadline:
+            break
+        res = _evaluate(dmat, y, folds, config, n_folds, nthread, deadline)
+        if res is None:
+            dropped.append(config)
+            break
+        results.append(res)
+        logger.info("macro-F1 %.4f @ t=%.2f  %s (%.1fs)",
+                    res["cv_macro_f1"], res["threshold"], res["params"], res["seconds"])
+
+    if dropped:
+        logger.warning("Budget spent – config cut short and dropped: %s", dropped[0])
+    if not results:
+        raise RuntimeError("No configuration finished within the time budget")
+
+    best = max(results, key=lambda r: r["cv_macro_f1"])
+    out = {
+        **best,
+        "folds": n_folds,
+        "evaluated": len(results),
+        "dropped": dropped,
+        "not_started": len(configs) - len(results) - len(dropped),
+        "rows": int(len(y)),
+        "tuned_at": time.time(),
+    }
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    logger.info("Best macro-F1 %.4f (threshold %.2f) from %d configs → %s",
+                best["cv_macro_f1"], best["threshold"], len(results), output_path)
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel k-fold hyperparameter search for the feedback model")
+    parser.add_argument("--snapshot", help="Read Feedback from a feedback_store snapshot directory instead of ODBC")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--configs", type=int, default=200, help="Max configs to try (defaults are always first)")
+    parser.add_argument("--budget", type=float, default=600.0, help="Wall-clock budget in seconds")
+    parser.add_argument("--workers", type=int, help="XGBoost threads per config (default: all cores)")
+    parser.add_argument("--output", default=TUNED_PARAMS_PATH)
+    args = parser.parse_args()
+
+    tune(args.snapshot, n_folds=args.folds, n_configs=args.configs, budget_seconds=args.budget,
+         workers=args.workers, output_path=args.output)